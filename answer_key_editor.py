@@ -0,0 +1,97 @@
+"""Редактор ключа ответов: таблица "вопрос x вариант" на модели Qt вместо сетки чекбоксов.
+
+Для каждой клетки не создается виджет: QTableView рисует только видимые строки и запрашивает данные
+у модели, поэтому ключ на сотни вопросов открывается так же быстро, как на пять.
+"""
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import QAbstractItemView, QHeaderView, QTableView
+
+# Вопрос без выбранного правильного ответа
+UNSET = -1
+SELECTED_MARK = "●"
+SELECTED_COLOR = QColor("#A3BE8C")
+
+
+class AnswerKeyModel(QAbstractTableModel):
+    """Ключ ответов: строка на вопрос, столбец на вариант, в строке выбран не больше чем один вариант."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.choices = 0
+        self.key = []  # Выбранный вариант каждого вопроса (с 0) или UNSET
+
+    def set_grid(self, questions, choices, answers=()):
+        """Перестраивает таблицу под сетку; ответы answers, подходящие к сетке, остаются выбранными."""
+        self.beginResetModel()
+        self.choices = choices
+        self.key = [UNSET] * questions
+        for question, answer in enumerate(list(answers)[:questions]):
+            if 0 <= answer < choices:
+                self.key[question] = answer
+        self.endResetModel()
+
+    def set_answer(self, question, answer):
+        if self.key[question] == answer:
+            return
+        self.key[question] = answer
+        self.dataChanged.emit(self.index(question, 0), self.index(question, self.choices - 1))
+
+    def answers(self):
+        """Ключ в виде списка индексов; если у вопроса не выбран ответ, выбрасывает ValueError."""
+        for question, answer in enumerate(self.key):
+            if answer == UNSET:
+                raise ValueError(f"Вопрос {question + 1} должен иметь ровно один правильный ответ.")
+        return list(self.key)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.key)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.choices
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or self.key[index.row()] != index.column():
+            return None
+        if role == Qt.DisplayRole:
+            return SELECTED_MARK
+        if role == Qt.BackgroundRole:
+            return SELECTED_COLOR
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Vertical:
+            return f"Вопрос {section + 1}"
+        return str(section + 1)  # Варианты нумеруются с 1, как на бланке
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled if index.isValid() else Qt.NoItemFlags
+
+
+class AnswerKeyEditor(QTableView):
+    """Таблица ключа ответов: щелчок (или Enter) по клетке делает вариант правильным ответом вопроса."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.key_model = AnswerKeyModel(self)
+        self.setModel(self.key_model)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        # Высота строк одинаковая: с ResizeToContents вид измерял бы каждую строку ключа
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.clicked.connect(self.select_answer)
+        self.activated.connect(self.select_answer)
+
+    def set_grid(self, questions, choices, answers=()):
+        self.key_model.set_grid(questions, choices, answers)
+
+    def answers(self):
+        return self.key_model.answers()
+
+    def select_answer(self, index):
+        self.key_model.set_answer(index.row(), index.column())
@@ -0,0 +1,207 @@
+import dataclasses
+import threading
+
+import cv2
+import numpy as np
+
+from video_processing import SheetNotFoundError, answer_key, grade_at_corners, grade_sheet, locate_sheet, render_overlay
+
+
+class AnswerStabilizer:
+    """Накапливает доли закрашивания по кадрам видео и фиксирует ответы, когда они перестают меняться.
+
+    После фиксации бланк на каждом кадре только ищется, а проверяется заново раз в verify_interval кадров
+    и сразу после резкого скачка его углов. Фиксация снимается, когда бланк пропадает из кадра на release_frames
+    кадров или когда на двух проверках подряд ответы на бланке в кадре отличаются от зафиксированных хотя бы
+    в доле swap_share вопросов: бланк заменили другим, не убирая из кадра.
+    """
+
+    def __init__(self, alpha=0.4, min_confidence=0.5, stable_frames=5, release_frames=8, verify_interval=5,
+                 max_jump=0.1, swap_share=0.2, swap_checks=3):
+        self.alpha = alpha  # Вес нового кадра в скользящем среднем
+        self.min_confidence = min_confidence  # Минимальный отрыв лучшего варианта от второго (0..1) по всем вопросам
+        self.stable_frames = stable_frames  # Сколько кадров подряд ответы не должны меняться
+        self.release_frames = release_frames  # Сколько кадров без бланка нужно, чтобы начать новый
+        self.verify_interval = verify_interval  # Раз во сколько кадров сверять зафиксированные ответы с бланком в кадре
+        self.max_jump = max_jump  # Смещение углов за кадр (в долях диагонали бланка), после которого бланк сверяется сразу
+        self.swap_share = swap_share  # Доля вопросов с другими ответами, при которой бланк считается другим
+        self.swap_checks = swap_checks  # Сколько проверок подряд (на соседних кадрах) должны найти другой бланк
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает накопленные данные, например после изменения настроек сетки или ключа."""
+        with self._lock:
+            self.fill = None
+            self.index = None
+            self.run = 0
+            self.misses = 0
+            self.confidence = 0.0
+            self.committed = None
+            self.committed_image = None
+            self.corners = None  # Углы бланка на прошлом кадре после фиксации
+            self.locked_frames = 0
+            self.mismatches = 0  # Сколько проверок подряд ответы отличались от зафиксированных
+
+    @property
+    def locked(self):
+        return self.committed is not None
+
+    def update(self, result, correct_answers):
+        """Добавляет результат очередного кадра. Возвращает True, если ответы только что зафиксированы."""
+        with self._lock:
+            self.misses = 0
+            if self.committed is not None:
+                return False
+            if self.fill is None or self.fill.shape != result.fill_ratios.shape:
+                self.fill = result.fill_ratios.astype(np.float64)
+            else:
+                self.fill += self.alpha * (result.fill_ratios - self.fill)
+            index = np.argmax(self.fill, axis=1)
+            self.run = self.run + 1 if self.index is not None and np.array_equal(index, self.index) else 1
+            self.index = index
+
+            # Уверенность по вопросу - относительный отрыв самого закрашенного варианта от следующего
+            top2 = np.sort(self.fill, axis=1)[:, -2:] if self.fill.shape[1] > 1 else np.pad(self.fill, ((0, 0), (1, 0)))
+            self.confidence = float(np.min((top2[:, 1] - top2[:, 0]) / np.maximum(top2[:, 1], 1e-6)))
+            # Незаполненный вопрос не дает высокой уверенности, поэтому долго неизменные ответы тоже фиксируются
+            stable = self.run >= self.stable_frames and (
+                self.confidence >= self.min_confidence or self.run >= 3 * self.stable_frames)
+            if not stable:
+                return False
+            grading = (answer_key(correct_answers, len(index)) == index).astype(np.uint8)
+            correct = int(grading.sum())
+            self.committed = dataclasses.replace(
+                result, index=index, fill_ratios=self.fill.copy(), grading=grading,
+                correct=correct, score=correct / len(index) * 100)
+            return True
+
+    def hit(self, corners=None):
+        """Бланк по-прежнему в кадре. Возвращает True, если пора сверить его ответы с зафиксированными."""
+        with self._lock:
+            self.misses = 0
+            if self.committed is None or corners is None:
+                return False
+            previous, self.corners = self.corners, corners
+            self.locked_frames += 1
+            if self.mismatches or self.locked_frames % self.verify_interval == 0:
+                return True
+            if previous is None:
+                return False
+            # Бланк, переложенный рукой, смещается плавно; скачок углов означает, что в кадре, скорее всего, другой бланк
+            diagonal = np.linalg.norm(corners[3] - corners[0])
+            return np.abs(corners - previous).max() > self.max_jump * diagonal
+
+    def matches(self, result):
+        """Ответы result совпадают с зафиксированными, с поправкой на шум одного кадра."""
+        committed = self.committed
+        # Ответы одного кадра шумнее накопленных: один-два вопроса расходятся и на том же бланке
+        return (committed is not None and result.index.shape == committed.index.shape and
+                np.mean(result.index != committed.index) < self.swap_share)
+
+    def verify(self, result):
+        """Сверяет ответы бланка в кадре с зафиксированными. Возвращает True, если фиксация снята."""
+        with self._lock:
+            if self.committed is None:
+                return False
+            if self.matches(result):
+                self.mismatches = 0
+                return False
+            # Расхождение на одном кадре бывает из-за блика: бланк проверяется еще раз на следующем кадре,
+            # и только второе расхождение подряд снимает фиксацию
+            self.mismatches += 1
+            if self.mismatches < self.swap_checks:
+                return False
+            self._release()
+            return True
+
+    def miss(self):
+        """Бланк не найден на кадре. Возвращает True, если зафиксированный бланк покинул кадр."""
+        with self._lock:
+            self.misses += 1
+            if self.misses < self.release_frames:
+                return False
+            released = self.committed is not None
+            self._release()
+            return released
+
+    def _release(self):
+        self.fill = None
+        self.index = None
+        self.run = 0
+        self.committed = None
+        self.committed_image = None
+        self.corners = None
+        self.locked_frames = 0
+        self.mismatches = 0
+
+
+@dataclasses.dataclass(frozen=True)
+class FrameSettings:
+    """Настройки проверки кадров видео.
+
+    Собираются в потоке интерфейса при каждом их изменении; поток обработки читает только этот снимок,
+    а не поля и флажки окна, которые интерфейс может поменять посреди кадра.
+    """
+    questions: int
+    choices: int
+    correct_answers: tuple  # Номера правильных вариантов, начиная с 0
+    image_size: int
+    detect_size: int = None
+    id_digits: int = 0  # Цифр в блоке номера ученика; 0 - блока на бланке нет
+    qr: bool = False  # Читать номер ученика из QR-кода
+    multi_sheet: bool = False  # Проверять все бланки кадра
+
+    @property
+    def identifies(self):
+        """Нужно ли читать номер ученика с бланка."""
+        return bool(self.id_digits or self.qr)
+
+
+def grade_stable_frame(img, stabilizer, questions, choices, correct_answers, image_size, tracker=None, detect_size=None,
+                       buffers=None, profiler=None):
+    """Проверяет кадр видео с накоплением результата.
+
+    Возвращает (изображение, результат или None, признак только что зафиксированных ответов).
+    Пока ответы зафиксированы, на кадре только ищется бланк, а изображение результата не перерисовывается;
+    бланк проверяется, только когда стабилизатор просит сверить его с зафиксированным. Буферы из buffers используются только для промежуточных изображений: возвращаемое изображение уходит
+    в поток интерфейса и поэтому всегда создается заново.
+    """
+    result = None
+    if stabilizer.locked:
+        try:
+            corners = locate_sheet(img, image_size, tracker, detect_size, buffers, profiler)
+        except SheetNotFoundError:
+            stabilizer.miss()
+        else:
+            committed = stabilizer.committed  # Интерфейс может сбросить стабилизатор в любой момент
+            if stabilizer.hit(corners) and committed is not None:
+                # Сначала бланк читается по углам, на которых ответы были зафиксированы: лежащий на месте бланк
+                # сверяется без поиска, и неточно найденные на этом кадре углы не выдают его за другой
+                result = grade_at_corners(img, committed.corners, questions, choices, correct_answers, image_size,
+                                          buffers, profiler)
+                if not stabilizer.matches(result):
+                    # Бланк сдвинули или заменили: читаем его по углам, найденным на этом кадре
+                    try:
+                        result = grade_sheet(img, questions, choices, correct_answers, image_size, tracker,
+                                             detect_size, buffers, profiler)
+                    except SheetNotFoundError:
+                        result = None  # Бланк найден, но не выровнен: сверим на следующем кадре
+                if result is not None:
+                    stabilizer.verify(result)
+        committed, image = stabilizer.committed, stabilizer.committed_image
+        if committed is not None:
+            return image, committed, False
+    if result is None:
+        try:
+            result = grade_sheet(img, questions, choices, correct_answers, image_size, tracker, detect_size, buffers,
+                                 profiler)
+        except SheetNotFoundError:
+            stabilizer.miss()
+            return cv2.resize(img, (image_size, image_size)), None, False
+    committed_now = stabilizer.update(result, correct_answers)
+    if committed_now:
+        result = stabilizer.committed
+        stabilizer.committed_image = render_overlay(img, result, correct_answers, profiler)
+        return stabilizer.committed_image, result, True
+    return render_overlay(img, result, correct_answers, profiler), result, False
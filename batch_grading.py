@@ -0,0 +1,239 @@
+"""Пакетная проверка отсканированных бланков без графического интерфейса.
+
+Пример запуска:
+    python batch_grading.py scans/ --questions 5 --choices 5 --answers 2,3,1,3,5 --output results.csv
+
+С номерами учеников (QR-код или блок из 6 цифр) и добавлением в отчет приложения; повторная проверка тех же
+сканов заменяет результаты учеников, а не дублирует их:
+    python batch_grading.py scans/ --answers 2,3,1,3,5 --qr --id-digits 6 --report report.jsonl --exam "Контрольная 1"
+
+Те же настройки из профиля теста, сохраненного в приложении:
+    python batch_grading.py scans/ --profile profiles/default.json --report report.jsonl
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from exam_profiles import DEFAULT_PROFILE, load_profile, parse_answers
+from report_store import exam_name, open_report_store
+from sheet_identity import grade_identified_sheets, identify_sheets
+from video_processing import grade_sheet
+
+# Расширения файлов, которые считаются изображениями бланков (страницы PDF предварительно экспортируются в картинки)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+CSV_FIELDS = ["file", "status", "correct", "total", "score", "error", "student", "answers"]
+# В режиме --multi у каждого бланка файла своя строка с его номером в порядке чтения
+MULTI_CSV_FIELDS = ["file", "sheet", "status", "correct", "total", "score", "error", "student", "answers"]
+
+
+def find_images(directory, recursive=False):
+    """Возвращает отсортированный список путей к изображениям в каталоге."""
+    paths = []
+    if recursive:
+        for root, _dirs, files in os.walk(directory):
+            paths.extend(os.path.join(root, name) for name in files)
+    else:
+        paths = [os.path.join(directory, name) for name in os.listdir(directory)]
+    return sorted(path for path in paths if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def read_image(path):
+    """Читает изображение; np.fromfile + imdecode корректно работает с кириллицей в путях."""
+    data = np.fromfile(path, dtype=np.uint8)
+    img = cv2.imdecode(data, cv2.IMREAD_COLOR) if data.size else None
+    if img is None:
+        raise ValueError("Не удалось прочитать изображение.")
+    return img
+
+
+def grade_file(path, questions, choices, correct_answers, image_size, detect_size=None, id_digits=0, qr=False):
+    """Проверяет один файл. Ошибки возвращаются в результате, а не выводятся в консоль.
+
+    id_digits и qr включают чтение номера ученика (sheet_identity); непрочитанный номер - пустая строка.
+    """
+    result = {"file": path, "status": "ok", "correct": 0, "total": questions, "score": 0.0, "error": "",
+              "student": "", "answers": ""}
+    try:
+        img = read_image(path)
+        # Только подсчет, без отрисовки
+        grading = grade_sheet(img, questions, choices, correct_answers, image_size, detect_size=detect_size)
+        result["correct"] = grading.correct
+        result["score"] = round(grading.score, 2)
+        result["answers"] = _format_answers(grading.index)
+        if id_digits or qr:
+            result["student"] = identify_sheets(img, [grading], id_digits, qr)[0] or ""
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    return result
+
+
+def grade_file_sheets(path, questions, choices, correct_answers, image_size, detect_size=None, id_digits=0, qr=False):
+    """Проверяет все бланки в одном файле. Возвращает по строке на бланк или одну строку с ошибкой."""
+    try:
+        img = read_image(path)
+        sheets = grade_identified_sheets(img, questions, choices, correct_answers, image_size, detect_size=detect_size,
+                                         id_digits=id_digits, qr=qr)
+    except Exception as e:
+        return [{"file": path, "sheet": 0, "status": "error", "correct": 0, "total": questions, "score": 0.0,
+                 "error": str(e), "student": "", "answers": ""}]
+    return [{"file": path, "sheet": number, "status": "ok", "correct": sheet.correct, "total": questions,
+             "score": round(sheet.score, 2), "error": "", "student": sheet.student or "",
+             "answers": _format_answers(sheet.index)}
+            for number, sheet in enumerate(sheets, 1)]
+
+
+def _format_answers(index):
+    # Выбранные варианты в том же виде, что и ключ: через запятую, начиная с 1
+    return ",".join(str(int(answer) + 1) for answer in index)
+
+
+def _grade_file_task(args):
+    *args, multi = args
+    return grade_file_sheets(*args) if multi else grade_file(*args)
+
+
+def _init_worker():
+    # Каждый процесс работает в один поток OpenCV, иначе потоки процессов конкурируют за ядра
+    cv2.setNumThreads(1)
+
+
+def grade_files(paths, questions, choices, correct_answers, image_size, workers=None, chunksize=None,
+                detect_size=None, multi=False, id_digits=0, qr=False):
+    """Проверяет файлы в пуле процессов и выдает результаты в порядке исходного списка.
+
+    При multi=True для каждого файла выдается список строк, по одной на каждый найденный бланк.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        # Крупные порции снижают накладные расходы на передачу задач между процессами
+        chunksize = max(1, min(32, len(paths) // (workers * 4)))
+    tasks = ((path, questions, choices, correct_answers, image_size, detect_size, id_digits, qr, multi)
+             for path in paths)
+    if workers == 1:
+        _init_worker()
+        yield from map(_grade_file_task, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        yield from executor.map(_grade_file_task, tasks, chunksize=chunksize)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Пакетная проверка отсканированных бланков.")
+    parser.add_argument("directory", help="каталог с изображениями бланков")
+    parser.add_argument("--profile", default=None,
+                        help="файл профиля теста (profiles/*.json): сетка, ключ, номер ученика и название теста; "
+                             "параметры, указанные явно, заменяют значения профиля")
+    parser.add_argument("--questions", type=int, default=None, help="количество вопросов")
+    parser.add_argument("--choices", type=int, default=None, help="количество вариантов ответа")
+    parser.add_argument("--answers", default=None, help="правильные варианты через запятую, начиная с 1")
+    parser.add_argument("--image-size", type=int, default=None, help="размер изображения для обработки")
+    parser.add_argument("--detect-size", type=int, default=0,
+                        help="длинная сторона уменьшенной копии для поиска бланка (например, 320); "
+                             "0 - искать на изображении image-size")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию - все ядра)")
+    parser.add_argument("--chunksize", type=int, default=None, help="число файлов в одной порции для процесса")
+    parser.add_argument("--multi", action="store_true",
+                        help="проверять все бланки (или блоки ответов) на изображении, по строке CSV на бланк")
+    parser.add_argument("--id-digits", type=int, default=None,
+                        help="цифр в блоке номера ученика на бланке; 0 - блока нет")
+    parser.add_argument("--qr", action="store_true", help="читать номер ученика из QR-кода на бланке")
+    parser.add_argument("--report", default=None,
+                        help="добавить результаты в отчет приложения (например, report.jsonl); результат ученика, "
+                             "уже проверенного по этому тесту, заменяется")
+    parser.add_argument("--exam", default=None, help="название теста в отчете (по умолчанию - по сетке и ключу)")
+    parser.add_argument("--recursive", action="store_true", help="искать изображения во вложенных каталогах")
+    parser.add_argument("--output", default=None, help="CSV-файл для результатов (по умолчанию - стандартный вывод)")
+    return parser
+
+
+def apply_profile_args(args):
+    """Дополняет параметры, не указанные в командной строке, значениями профиля (или профиля по умолчанию)."""
+    profile = load_profile(args.profile) if args.profile else DEFAULT_PROFILE
+    if args.questions is None:
+        args.questions = profile.questions
+    if args.choices is None:
+        args.choices = profile.choices
+    if args.answers is None:
+        args.answers = ",".join(str(answer + 1) for answer in profile.answers)
+    if args.image_size is None:
+        args.image_size = profile.image_size
+    if args.id_digits is None:
+        args.id_digits = profile.id_digits
+    if args.profile:
+        args.qr = args.qr or profile.qr
+        args.exam = args.exam or profile.name
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        apply_profile_args(args)
+    except (OSError, ValueError) as e:
+        parser.error(f"Не удалось загрузить профиль {args.profile}: {e}")
+    if args.questions <= 0 or args.choices <= 0:
+        parser.error("Количество вопросов и вариантов должно быть положительным целым числом.")
+    if args.id_digits < 0:
+        parser.error("Количество цифр в номере ученика не может быть отрицательным.")
+    try:
+        correct_answers = parse_answers(args.answers, args.questions, args.choices)
+    except ValueError as e:
+        parser.error(str(e))
+    if not os.path.isdir(args.directory):
+        parser.error(f"Каталог не найден: {args.directory}")
+    paths = find_images(args.directory, args.recursive)
+    if not paths:
+        print("Изображения бланков не найдены.", file=sys.stderr)
+        return 2
+
+    output = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    store = open_report_store(args.report) if args.report else None
+    exam = args.exam or exam_name(args.questions, args.choices, correct_answers)
+    errors = 0
+    sheets = 0
+    replaced = 0
+    start = time.perf_counter()
+    try:
+        writer = csv.DictWriter(output, fieldnames=MULTI_CSV_FIELDS if args.multi else CSV_FIELDS)
+        writer.writeheader()
+        for result in grade_files(paths, args.questions, args.choices, correct_answers, args.image_size,
+                                  args.workers, args.chunksize, args.detect_size or None, args.multi,
+                                  args.id_digits, args.qr):
+            rows = result if args.multi else [result]
+            for row in rows:
+                if row["status"] != "ok":
+                    errors += 1
+                    continue
+                sheets += 1
+                if store is not None:
+                    record = store.upsert(exam, row["student"] or None, row["total"], row["correct"], row["score"],
+                                          [int(answer) - 1 for answer in row["answers"].split(",")], correct_answers)
+                    replaced += bool(record.get("replaces"))
+            writer.writerows(rows)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    # Итоговая статистика производительности
+    if store is not None:
+        print(f"В отчет {args.report}: новых работ {sheets - replaced}, заменено результатов {replaced}",
+              file=sys.stderr)
+    if args.multi:
+        print(f"Файлов: {len(paths)}, найдено бланков: {sheets}, ошибок: {errors}", file=sys.stderr)
+        print(f"Время: {elapsed:.2f} с, скорость: {sheets / elapsed:.1f} бланков/с", file=sys.stderr)
+        return 1 if errors else 0
+    print(f"Проверено бланков: {len(paths)}, ошибок: {errors}", file=sys.stderr)
+    print(f"Время: {elapsed:.2f} с, скорость: {len(paths) / elapsed:.1f} бланков/с", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
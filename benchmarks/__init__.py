@@ -0,0 +1 @@
+"""Замеры производительности. Запускаются из корня проекта, например: python -m benchmarks.bench_contours"""
@@ -0,0 +1,46 @@
+"""Выделение памяти на кадр видео с пулом буферов и без него.
+
+Запуск: python -m benchmarks.bench_buffers --frames 60 --size 960
+"""
+import argparse
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_contours import make_cluttered_frame
+from frame_buffers import FrameBufferPool, measure_allocations
+from sheet_tracking import SheetTracker
+from video_processing import grade_sheet
+
+
+def run(frames, size, questions, choices, image_size, detect_size):
+    rng = np.random.default_rng(0)
+    video = [cv2.cvtColor(make_cluttered_frame(rng, size=size, clutter=500), cv2.COLOR_GRAY2BGR) for _ in range(frames)]
+    correct_answers = [0] * questions
+    print(f"Кадров: {frames}, кадр {size}x{size}, холст {image_size}, поиск на {detect_size or image_size}")
+    print(f"{'режим':>12} | {'пик, КБ/кадр':>13} | {'остаток, КБ/кадр':>16} | {'мс/кадр':>8} | {'буферов создано':>15}")
+    for name, buffers in (("без пула", None), ("пул буферов", FrameBufferPool())):
+        tracker = SheetTracker()
+        stats = measure_allocations(
+            lambda frame: grade_sheet(frame, questions, choices, correct_answers, image_size, tracker, detect_size, buffers),
+            video)
+        created = buffers.allocations if buffers is not None else "-"
+        print(f"{name:>12} | {stats['peak_bytes'] / 1024:13.1f} | {stats['retained_bytes'] / 1024:16.1f} | "
+              f"{stats['ms']:8.2f} | {created:>15}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер выделения памяти при обработке кадров видео.")
+    parser.add_argument("--frames", type=int, default=60, help="количество синтетических кадров")
+    parser.add_argument("--size", type=int, default=960, help="размер стороны кадра")
+    parser.add_argument("--questions", type=int, default=20, help="количество вопросов")
+    parser.add_argument("--choices", type=int, default=5, help="количество вариантов")
+    parser.add_argument("--image-size", type=int, default=700, help="размер выровненного бланка")
+    parser.add_argument("--detect-size", type=int, default=0,
+                        help="размер кадра для поиска бланка, 0 - без уменьшения (как в приложении)")
+    args = parser.parse_args(argv)
+    run(args.frames, args.size, args.questions, args.choices, args.image_size, args.detect_size or None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Сравнение поиска бланка: прежний rectContour + getCornerPoints и новый biggestQuadrilateral.
+
+Кадры содержат бланк и множество посторонних мелких контуров (текст, шум, предметы на столе).
+Запуск: python -m benchmarks.bench_contours --frames 50 --clutter 2000
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+import utils
+from video_processing import MIN_SHEET_AREA
+
+
+def _draw_clutter(frame, rng, count, low, high, quad=None):
+    for _ in range(count):
+        x, y = (int(v) for v in rng.integers(low, high, 2))
+        # Фигуры не касаются края бланка, иначе его контур перестает быть четырехугольником
+        if quad is not None and abs(cv2.pointPolygonTest(quad, (x, y), True)) < 12:
+            continue
+        r = int(rng.integers(2, 6))
+        color = int(rng.integers(0, 255))
+        if rng.random() < 0.5:
+            cv2.circle(frame, (x, y), r, color, -1)
+        else:
+            cv2.rectangle(frame, (x, y), (x + r, y + r), color, -1)
+
+
+def make_cluttered_frame(rng, size=700, clutter=2000):
+    """Синтетический кадр: светлый четырехугольник бланка и clutter мелких фигур вокруг и внутри него."""
+    frame = np.full((size, size), 60, np.uint8)
+    margin = size // 8
+    jitter = rng.integers(-margin // 2, margin // 2, (4, 2))
+    quad = np.int32([[margin, margin], [size - margin, margin],
+                     [size - margin, size - margin], [margin, size - margin]]) + jitter
+    cv2.fillConvexPoly(frame, quad, 230)
+    _draw_clutter(frame, rng, clutter, 0, size, quad)  # Предметы на столе вокруг бланка и отметки на нем
+    return frame
+
+
+def old_select(contours, imgShape):
+    rectCon = utils.rectContour(contours)
+    return utils.getCornerPoints(rectCon[0]) if rectCon else None
+
+
+def new_select(contours, imgShape):
+    return utils.biggestQuadrilateral(contours, imgShape[0] * imgShape[1] * MIN_SHEET_AREA)
+
+
+DETECTORS = (
+    ("rectContour", cv2.CHAIN_APPROX_NONE, old_select),
+    ("biggestQuadrilateral", cv2.CHAIN_APPROX_SIMPLE, new_select),
+)
+
+
+def _best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def run(frames, clutter, repeat):
+    rng = np.random.default_rng(0)
+    cannies = [cv2.Canny(cv2.GaussianBlur(make_cluttered_frame(rng, clutter=clutter), (5, 5), 1), 10, 70)
+               for _ in range(frames)]
+
+    corners = {}
+    print(f"Кадров: {frames}, посторонних фигур: {clutter}")
+    print(f"{'алгоритм':>22} | {'точек':>7} | {'findContours':>12} | {'выбор':>8} | {'всего, мс/кадр':>14}")
+    totals = {}
+    for name, method, select in DETECTORS:
+        findTime, contours = _best_time(
+            lambda: [cv2.findContours(canny, cv2.RETR_EXTERNAL, method)[0] for canny in cannies], repeat)
+        selectTime, corners[name] = _best_time(
+            lambda: [select(cons, canny.shape) for cons, canny in zip(contours, cannies)], repeat)
+        points = np.mean([sum(len(cont) for cont in cons) for cons in contours])
+        totals[name] = (findTime + selectTime) / frames * 1000
+        print(f"{name:>22} | {points:7.0f} | {findTime / frames * 1000:12.3f} | "
+              f"{selectTime / frames * 1000:8.3f} | {totals[name]:14.3f}")
+
+    same = sum(old is not None and new is not None and np.array_equal(utils.reorder(old), utils.reorder(new))
+               for old, new in zip(corners["rectContour"], corners["biggestQuadrilateral"]))
+    print(f"Ускорение: {totals['rectContour'] / totals['biggestQuadrilateral']:.2f}x, "
+          f"совпадение углов: {same}/{frames}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение алгоритмов поиска бланка на кадре.")
+    parser.add_argument("--frames", type=int, default=50, help="количество синтетических кадров")
+    parser.add_argument("--clutter", type=int, default=2000, help="количество посторонних фигур на кадре")
+    parser.add_argument("--repeat", type=int, default=3, help="число повторов, берется лучшее время")
+    args = parser.parse_args(argv)
+    run(args.frames, args.clutter, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
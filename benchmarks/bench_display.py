@@ -0,0 +1,62 @@
+"""Стоимость вывода кадра в QLabel: прежний путь через RGB и новый FrameDisplay.
+
+Запуск: python -m benchmarks.bench_display --frames 300
+Без дисплея: QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_display
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtWidgets import QApplication, QLabel
+
+from frame_display import FrameDisplay
+
+
+def show_rgb(label, img):
+    # Прежний путь: перевод в RGB, новый QImage и новый QPixmap на каждом кадре
+    imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    h, w, ch = imgRGB.shape
+    label.setPixmap(QPixmap.fromImage(QImage(imgRGB.data, w, h, ch * w, QImage.Format_RGB888)))
+
+
+def _mean_ms(show, frames):
+    start = time.perf_counter()
+    for frame in frames:
+        show(frame)
+    return (time.perf_counter() - start) / len(frames) * 1000
+
+
+def run(count, size, label_size):
+    app = QApplication.instance() or QApplication([])
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (size, size, 3), np.uint8) for _ in range(8)]
+    frames = [frames[i % len(frames)].copy() for i in range(count)]
+    label = QLabel()
+    if label_size:
+        label.setMaximumSize(label_size, label_size)
+    print(f"Кадров: {count}, изображение {size}x{size}, метка {label_size or 'по размеру кадра'}")
+    print(f"{'путь':>26} | {'мс/кадр':>8}")
+    print(f"{'RGB + новый QPixmap':>26} | {_mean_ms(lambda f: show_rgb(label, f), frames):8.3f}")
+    display = FrameDisplay(label)
+    print(f"{'FrameDisplay (BGRA)':>26} | {_mean_ms(display.show, frames):8.3f}")
+    # Зафиксированный бланк: одно и то же изображение приходит много кадров подряд
+    display = FrameDisplay(label)
+    same = [frames[0]] * count
+    print(f"{'FrameDisplay, тот же кадр':>26} | {_mean_ms(display.show, same):8.3f}  "
+          f"(выведено {display.shown}, пропущено {display.skipped})")
+    app.processEvents()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер стоимости вывода кадра в интерфейс.")
+    parser.add_argument("--frames", type=int, default=300, help="количество кадров")
+    parser.add_argument("--size", type=int, default=700, help="размер стороны изображения")
+    parser.add_argument("--label-size", type=int, default=0, help="максимальный размер метки, 0 - без ограничения")
+    args = parser.parse_args(argv)
+    run(args.frames, args.size, args.label_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Проверка записанной сессии (файл .frames из кнопки "Записать видео") без камеры.
+
+Каждый кадр записи по порядку проходит тот же путь, что и в видеопотоке приложения (трекер углов,
+накопление ответов, буферы), поэтому результат и скорость воспроизводимы. С --realtime кадры выдаются
+с исходной частотой, и видно, успевает ли обработка за камерой.
+
+Запуск: python -m benchmarks.bench_replay recordings/session.frames --questions 5 --answers 2,3,1,3,5 --csv frames.csv
+Кадр для разбора ошибки: python -m benchmarks.bench_replay recordings/session.frames --export 120 --output frame.png
+"""
+import argparse
+import csv
+import time
+
+import cv2
+import numpy as np
+
+from answer_tracking import AnswerStabilizer, grade_stable_frame
+from frame_buffers import FrameBufferPool
+from frame_recording import FrameRecording, ReplayCapture
+from sheet_tracking import SheetTracker
+from video_processing import process_video_frame
+
+
+def replay(path, questions, choices, correct_answers, image_size, detect_size, engine="video", realtime=False,
+           tracker=None):
+    """Обрабатывает все кадры записи. Возвращает список строк с результатом каждого кадра и общее время."""
+    capture = ReplayCapture(path, realtime=realtime)
+    stabilizer, buffers = AnswerStabilizer(), FrameBufferPool()
+    tracker = tracker if tracker is not None else SheetTracker()
+    rows = []
+    start = time.perf_counter()
+    while True:
+        success, frame = capture.read()
+        if not success:
+            break
+        begin = time.perf_counter()
+        if engine == "video":
+            _, result, committed = grade_stable_frame(frame, stabilizer, questions, choices, correct_answers, image_size,
+                                                      tracker, detect_size, buffers)
+            answers = "" if result is None else ",".join(str(int(i) + 1) for i in result.index)
+            correct = None if result is None else result.correct
+        else:
+            _, correct, _ = process_video_frame(frame, questions, choices, correct_answers, image_size)
+            answers, committed = "", False
+        rows.append({"frame": len(rows), "ms": (time.perf_counter() - begin) * 1000, "found": correct is not None,
+                     "correct": correct, "answers": answers, "committed": committed})
+    return rows, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка записанной сессии без камеры.")
+    parser.add_argument("recording", help="файл записи .frames")
+    parser.add_argument("--questions", type=int, default=5, help="количество вопросов")
+    parser.add_argument("--choices", type=int, default=5, help="количество вариантов")
+    parser.add_argument("--answers", default=None, help="правильные ответы через запятую, начиная с 1")
+    parser.add_argument("--image-size", type=int, default=700, help="размер выровненного бланка")
+    parser.add_argument("--detect-size", type=int, default=0,
+                        help="размер кадра для поиска бланка, 0 - без уменьшения (как в приложении)")
+    parser.add_argument("--engine", choices=("video", "process_video_frame"), default="video",
+                        help="путь обработки: видеопоток приложения или покадровая проверка")
+    parser.add_argument("--realtime", action="store_true", help="выдавать кадры с частотой записи")
+    parser.add_argument("--csv", help="сохранить результат каждого кадра в CSV")
+    parser.add_argument("--export", type=int, default=None, help="только сохранить кадр с этим номером в --output")
+    parser.add_argument("--output", default="frame.png", help="файл для --export")
+    args = parser.parse_args(argv)
+
+    recording = FrameRecording(args.recording)
+    width, height = recording.frame_size
+    print(f"Запись: {len(recording)} кадров {width}x{height}, {recording.fps():.1f} кадр/с")
+    if args.export is not None:
+        cv2.imwrite(args.output, np.asarray(recording.frame(args.export)))
+        print(f"Кадр {args.export} сохранен в {args.output}")
+        return
+    correct_answers = ([int(a) - 1 for a in args.answers.split(",")] if args.answers
+                       else [0] * args.questions)  # Без ключа точность не считается, но скорость и ответы видны
+    tracker = SheetTracker()
+    rows, total = replay(args.recording, args.questions, args.choices, correct_answers, args.image_size,
+                         args.detect_size or None, args.engine, args.realtime, tracker)
+    if not rows:
+        print("В записи нет кадров.")
+        return
+    times = np.array([row["ms"] for row in rows])
+    found = sum(row["found"] for row in rows)
+    print(f"Обработано {len(rows)} кадров за {total:.2f} с: {len(rows) / total:.1f} кадр/с, "
+          f"p50 {np.percentile(times, 50):.2f} мс, p99 {np.percentile(times, 99):.2f} мс")
+    print(f"Бланк найден на {found} кадрах ({found / len(rows):.1%}), ответы зафиксированы "
+          f"{sum(row['committed'] for row in rows)} раз")
+    if args.engine == "video":
+        # Расхождения - плановый полный поиск нашел углы дальше окна трекера от отслеживаемых: трекер уплывал
+        print(f"Трекер: отслежено {tracker.tracked_frames} кадров, полных поисков {tracker.full_detections}, "
+              f"расхождений с полным поиском {tracker.disagreements}")
+    if args.csv:
+        with open(args.csv, "w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Пересчет архива отчета после исправления ключа: по одной работе и матрицей ответов.
+
+Запуск: python -m benchmarks.bench_scoring --works 100000 --questions 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from report_aggregates import ReportAggregates
+from scoring import GradeScale, answer_matrix, score_batch, suspicious_items
+
+
+def make_records(rng, works, questions, choices):
+    """Записи отчета со случайными ответами: сильные ученики чаще совпадают с ключом.
+
+    Работы проверены по ключу с опечаткой в первом вопросе; возвращаются верный ключ и записи.
+    """
+    key = rng.integers(0, choices, questions)
+    skill = rng.uniform(0.2, 0.95, (works, 1))
+    answers = np.where(rng.random((works, questions)) < skill, key, rng.integers(0, choices, (works, questions)))
+    mistyped = key.copy()
+    mistyped[0] = (mistyped[0] + 1) % choices
+    records = [{"work": work, "exam": "bench", "answers": row, "key": mistyped.tolist(), "score": 0.0,
+                "timestamp": None} for work, row in enumerate(answers.tolist(), 1)]
+    return key.tolist(), records
+
+
+def regrade_loop(records, key, criteria):
+    # Прежний способ: список правильности и цепочка порогов для каждой работы
+    grades = []
+    for record in records:
+        answers = record["answers"]
+        grading = [1 if key[i] == answers[i] else 0 for i in range(len(key))]
+        score = sum(grading) / len(key) * 100
+        grade = 1
+        for candidate, threshold in zip((5, 4, 3, 2), criteria):
+            if score >= threshold:
+                grade = candidate
+                break
+        grades.append(grade)
+    return grades
+
+
+def run(works, questions, choices):
+    rng = np.random.default_rng(0)
+    key, records = make_records(rng, works, questions, choices)
+    criteria = (90, 75, 50, 0)
+    print(f"Работ: {works}, вопросов: {questions}, вариантов: {choices}")
+    # Опечатка в ключе видна по показателям вопросов: на вопрос 1 чаще "верно" отвечают слабые ученики
+    aggregates = ReportAggregates()
+    aggregates.add(records)
+    start = time.perf_counter()
+    _, stats = aggregates.item_statistics("bench")
+    print(f"Показатели вопросов: {(time.perf_counter() - start) * 1000:.1f} мс, различающая способность "
+          f"вопроса 1: {stats.discrimination[0]:.2f}, остальных не ниже {stats.discrimination[1:].min():.2f}; "
+          f"подозрение на ошибку в ключе: {[int(question) + 1 for question in suspicious_items(stats)]}")
+    # Пересчет всех работ по исправленному ключу
+    print(f"{'этап':>24} | {'мс':>9}")
+    start = time.perf_counter()
+    expected = regrade_loop(records, key, criteria)
+    print(f"{'по одной работе':>24} | {(time.perf_counter() - start) * 1000:9.1f}")
+    start = time.perf_counter()
+    _, matrix = answer_matrix(records, questions)
+    built = time.perf_counter()
+    grades = GradeScale(criteria).grades(score_batch(matrix, key).scores)
+    done = time.perf_counter()
+    print(f"{'сборка матрицы ответов':>24} | {(built - start) * 1000:9.1f}")
+    print(f"{'проверка и оценки':>24} | {(done - built) * 1000:9.1f}")
+    assert grades.tolist() == expected, "Оценки не совпали"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер пересчета отчета после исправления ключа.")
+    parser.add_argument("--works", type=int, default=100000, help="количество работ в отчете")
+    parser.add_argument("--questions", type=int, default=20, help="количество вопросов")
+    parser.add_argument("--choices", type=int, default=5, help="количество вариантов")
+    args = parser.parse_args(argv)
+    run(args.works, args.questions, args.choices)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Скорость и точность проверки на воспроизводимом наборе синтетических бланков.
+
+Для каждого способа проверки из ENGINES выводятся бланков/с, задержка p50/p99, пик выделенной памяти
+на бланк, доля найденных бланков и точность считывания ответов. Набор бланков создается заранее
+из seed (см. benchmarks.synthetic_sheets) и одинаков для всех способов и всех запусков.
+
+Запуск: python -m benchmarks.bench_sheets --sheets 200 --questions 20 --preset camera
+Сравнение двух версий: --json before.json, затем --json after.json на другой ветке.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import time
+from dataclasses import asdict, replace
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic_sheets import PRESETS, make_sheets, parse_size
+from frame_buffers import FrameBufferPool, measure_allocations
+from video_processing import grade_sheet, grade_sheets, process_video_frame
+
+
+def _process_video_frame(questions, choices, image_size, detect_size):
+    # Прежний путь интерфейса: проверка и отрисовка результата
+    return lambda frame, answers: process_video_frame(frame, questions, choices, answers, image_size, strict=True)[1]
+
+
+def _grade_sheet(questions, choices, image_size, detect_size):
+    # Только проверка, как в пакетном режиме
+    return lambda frame, answers: grade_sheet(frame, questions, choices, answers, image_size).correct
+
+
+def _grade_sheet_multiscale(questions, choices, image_size, detect_size):
+    # Поиск на уменьшенной копии кадра и буферы промежуточных изображений, как в видеопотоке
+    buffers = FrameBufferPool()
+    return lambda frame, answers: grade_sheet(frame, questions, choices, answers, image_size,
+                                              detect_size=detect_size, buffers=buffers).correct
+
+
+def _grade_sheets(questions, choices, image_size, detect_size):
+    # Режим нескольких бланков в кадре на кадрах с одним бланком: цена поиска всех четырехугольников
+    buffers = FrameBufferPool()
+    return lambda frame, answers: grade_sheets(frame, questions, choices, answers, image_size,
+                                               detect_size=detect_size, buffers=buffers)[0].correct
+
+
+# Способы проверки: имя -> фабрика(questions, choices, image_size, detect_size), которая возвращает
+# функцию (кадр, верные ответы) -> количество правильно считанных ответов. Новый способ проверки
+# добавляется сюда и сразу попадает в сравнение.
+ENGINES = {
+    "process_video_frame": _process_video_frame,
+    "grade_sheet": _grade_sheet,
+    "grade_sheet_multiscale": _grade_sheet_multiscale,
+    "grade_sheets": _grade_sheets,
+}
+
+
+def bench_engine(grade, sheets, questions, memory_sheets=20):
+    """Проверяет все бланки функцией grade и возвращает словарь показателей."""
+    # Прогрев: кэши геометрии и буферы создаются до замера; ненайденный первый бланк не прерывает замер
+    _try(grade, sheets[0])
+    times, correct, found = [], 0, 0
+    start = time.perf_counter()
+    for frame, answers in sheets:
+        begin = time.perf_counter()
+        try:
+            correct += grade(frame, answers)
+            found += 1
+        except Exception:
+            pass  # Ненайденный бланк считается полностью неверно прочитанным
+        times.append(time.perf_counter() - begin)
+    total = time.perf_counter() - start
+    # Память замеряется отдельным проходом: трассировка tracemalloc замедляет обработку
+    memory = measure_allocations(lambda sheet: _try(grade, sheet), sheets[:memory_sheets], warmup=1)
+    times = np.array(times) * 1000
+    return {
+        "sheets_per_second": len(sheets) / total,
+        "p50_ms": float(np.percentile(times, 50)),
+        "p99_ms": float(np.percentile(times, 99)),
+        "peak_kb": memory["peak_bytes"] / 1024,
+        "found": found / len(sheets),
+        "accuracy": correct / (len(sheets) * questions),
+    }
+
+
+def _try(grade, sheet):
+    try:
+        grade(*sheet)
+    except Exception:
+        pass
+
+
+def run(args):
+    if args.threads:
+        cv2.setNumThreads(args.threads)
+    distortion = PRESETS[args.preset]
+    if args.frame_size:
+        distortion = replace(distortion, frame_size=args.frame_size)
+    start = time.perf_counter()
+    sheets = make_sheets(args.sheets, args.questions, args.choices, args.seed, distortion)
+    print(f"Бланков: {args.sheets} ({args.questions}x{args.choices}, {args.preset}, кадр "
+          f"{distortion.frame_size[0]}x{distortion.frame_size[1]}, seed {args.seed}), "
+          f"создано за {time.perf_counter() - start:.1f} с; потоков OpenCV: {cv2.getNumThreads()}")
+    print(f"{'способ':>24} | {'бланк/с':>8} | {'p50, мс':>8} | {'p99, мс':>8} | {'пик, КБ':>8} | "
+          f"{'найдено':>7} | {'точность':>8}")
+    results = {}
+    for name in args.engines:
+        grade = ENGINES[name](args.questions, args.choices, args.image_size, args.detect_size)
+        stats = results[name] = bench_engine(grade, sheets, args.questions)
+        print(f"{name:>24} | {stats['sheets_per_second']:8.1f} | {stats['p50_ms']:8.2f} | {stats['p99_ms']:8.2f} | "
+              f"{stats['peak_kb']:8.0f} | {stats['found']:7.1%} | {stats['accuracy']:8.2%}")
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # В Linux ru_maxrss в КБ
+    print(f"Пик памяти процесса: {max_rss:.0f} МБ")
+    if args.json:
+        report = {
+            "config": {"sheets": args.sheets, "questions": args.questions, "choices": args.choices,
+                       "preset": args.preset, "seed": args.seed, "image_size": args.image_size,
+                       "detect_size": args.detect_size, "distortion": asdict(distortion)},
+            "environment": {"python": platform.python_version(), "opencv": cv2.__version__, "numpy": np.__version__,
+                            "machine": platform.machine(), "cpus": os.cpu_count(), "opencv_threads": cv2.getNumThreads()},
+            "max_rss_mb": max_rss,
+            "engines": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер скорости и точности проверки синтетических бланков.")
+    parser.add_argument("--sheets", type=int, default=200, help="количество бланков")
+    parser.add_argument("--questions", type=int, default=20, help="количество вопросов")
+    parser.add_argument("--choices", type=int, default=5, help="количество вариантов")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="camera", help="условия съемки")
+    parser.add_argument("--frame-size", type=parse_size, default=None, help="размер кадра, например 1920x1080")
+    parser.add_argument("--seed", type=int, default=0, help="начальное значение генератора случайных чисел")
+    parser.add_argument("--image-size", type=int, default=700, help="размер выровненного бланка")
+    parser.add_argument("--detect-size", type=int, default=320, help="размер кадра для поиска бланка (многомасштабный режим)")
+    parser.add_argument("--engines", type=lambda text: text.split(","), default=list(ENGINES),
+                        help=f"способы проверки через запятую: {','.join(ENGINES)}")
+    parser.add_argument("--threads", type=int, default=1, help="потоков OpenCV, 0 - как настроено по умолчанию")
+    parser.add_argument("--json", help="сохранить результаты и условия замера в JSON")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.engines if name not in ENGINES]
+    if unknown:
+        parser.error(f"неизвестные способы проверки: {', '.join(unknown)}")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
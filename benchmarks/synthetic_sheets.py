@@ -0,0 +1,177 @@
+"""Синтетические бланки ответов для замеров скорости и точности проверки.
+
+Бланк повторяет таблицу из "Образец бланка.docx": рамка таблицы и по кружку с номером варианта в каждой клетке,
+кружки рисуются шрифтом OMRBubbles.ttf (если установлен Pillow, иначе окружностями OpenCV). Выбранный вариант
+закрашивается "карандашом", затем бланк кладется на стол с перспективой и поворотом, размывается,
+зашумляется и неравномерно освещается. Все случайные величины берутся из генератора numpy с заданным seed,
+поэтому набор бланков воспроизводится на любой машине.
+
+Пример: python -m benchmarks.synthetic_sheets --questions 20 --preset camera --output sheet.png
+"""
+import argparse
+import os
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # Без Pillow кружки рисуются OpenCV, номера вариантов не выводятся
+    Image = None
+
+# Шрифт кружков бланка; символы 0xF031..0xF039 - кружки с цифрами 1..9, 0xF041.. - с буквами
+FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "OMRBubbles.ttf")
+PAPER_COLOR = 235
+INK_COLOR = 30
+# Размер клетки таблицы на листе до переноса в кадр, пиксели
+CELL_SIZE = 120
+
+
+@dataclass(frozen=True)
+class Distortion:
+    """Параметры съемки и заполнения бланка. Величины с диапазоном выбираются случайно для каждого бланка."""
+    frame_size: tuple = (1280, 720)  # Размер кадра (ширина, высота)
+    coverage: tuple = (0.75, 0.9)  # Доля меньшей стороны кадра, которую занимает бланк
+    perspective: float = 0.0  # Смещение углов бланка в долях его размера
+    rotation: float = 0.0  # Наибольший поворот бланка, градусы
+    blur: tuple = (0.0, 0.0)  # Сигма гауссова размытия (расфокус)
+    noise: float = 0.0  # СКО шума сенсора, уровни яркости
+    lighting: float = 0.0  # Перепад освещения по бланку: 0.3 - одна сторона на 30% темнее другой
+    fill: tuple = (0.8, 0.95)  # Доля кружка, закрашенная карандашом
+    darkness: tuple = (20, 60)  # Яркость карандаша
+    erased: float = 0.0  # Вероятность стертой (светлой) пометки в другой клетке вопроса
+    jpeg: int = 0  # Качество JPEG-сжатия кадра, 0 - без сжатия
+
+
+# Наборы условий съемки от идеального скана до плохой камеры
+PRESETS = {
+    "clean": Distortion(),
+    "camera": Distortion(perspective=0.04, rotation=4, blur=(0.5, 1.2), noise=4, lighting=0.25, jpeg=85),
+    "hard": Distortion(coverage=(0.55, 0.8), perspective=0.08, rotation=10, blur=(1.0, 2.0), noise=8, lighting=0.45,
+                       fill=(0.55, 0.85), darkness=(40, 100), erased=0.15, jpeg=70),
+}
+
+
+@lru_cache(maxsize=8)
+def blank_sheet(questions, choices):
+    """Пустой бланк (серое изображение) и центры кружков; результат общий, изменять его нельзя."""
+    width, height = choices * CELL_SIZE, questions * CELL_SIZE
+    sheet = np.full((height, width), PAPER_COLOR, np.uint8)
+    radius = int(CELL_SIZE * 0.32)
+    centers = np.stack(np.meshgrid((np.arange(choices) + 0.5) * CELL_SIZE, (np.arange(questions) + 0.5) * CELL_SIZE),
+                       axis=-1)  # вопросы x варианты x (x, y)
+    if Image is not None and os.path.exists(FONT_PATH):
+        font = ImageFont.truetype(FONT_PATH, radius * 2, encoding="symb")
+        image = Image.fromarray(sheet)
+        draw = ImageDraw.Draw(image)
+        for choice in range(choices):
+            glyph = chr(0xF031 + choice) if choice < 9 else chr(0xF041 + choice - 9)
+            for question in range(questions):
+                x, y = centers[question, choice]
+                draw.text((x, y), glyph, font=font, fill=INK_COLOR, anchor="mm")
+        sheet = np.array(image)
+    else:
+        for x, y in centers.reshape(-1, 2):
+            cv2.circle(sheet, (int(x), int(y)), radius, INK_COLOR, 3, cv2.LINE_AA)
+    cv2.rectangle(sheet, (0, 0), (width - 1, height - 1), INK_COLOR, 6)  # Рамка таблицы
+    sheet.flags.writeable = False
+    return sheet, centers, radius
+
+
+def make_sheet(questions, choices, rng, distortion=PRESETS["clean"], answers=None):
+    """Создает кадр (BGR) с заполненным бланком. Возвращает (кадр, выбранные варианты)."""
+    d = distortion
+    if answers is None:
+        answers = rng.integers(0, choices, questions)
+    blank, centers, radius = blank_sheet(questions, choices)
+    sheet = blank.copy()
+    for question, answer in enumerate(answers):
+        _pencil(sheet, centers[question, answer], radius * rng.uniform(*d.fill), rng.uniform(*d.darkness), rng)
+        if d.erased and rng.random() < d.erased:
+            # Исправленный ответ: стертая пометка заметно светлее настоящей
+            other = (answer + rng.integers(1, choices)) % choices
+            _pencil(sheet, centers[question, other], radius * 0.8, rng.uniform(150, 190), rng)
+    frame = _photograph(sheet, d, rng)
+    return frame, [int(answer) for answer in answers]
+
+
+def make_sheets(count, questions, choices, seed=0, distortion=PRESETS["clean"]):
+    """Список из count пар (кадр, ответы); один и тот же seed дает один и тот же набор."""
+    rng = np.random.default_rng(seed)
+    return [make_sheet(questions, choices, rng, distortion) for _ in range(count)]
+
+
+def _pencil(sheet, center, radius, darkness, rng):
+    # Закрашенный круг с неровным краем и неравномерным нажимом карандаша
+    size = int(radius) * 2 + 3
+    yy, xx = np.mgrid[:size, :size] - size / 2
+    angle = np.arctan2(yy, xx)
+    edge = radius * (1 + 0.06 * np.sin(3 * angle + rng.uniform(0, 2 * np.pi)))
+    mask = np.hypot(xx, yy) <= edge
+    x0, y0 = int(center[0] - size / 2), int(center[1] - size / 2)
+    region = sheet[y0:y0 + size, x0:x0 + size]
+    stroke = np.clip(darkness + rng.normal(0, 12, mask.shape), 0, 255)
+    region[mask] = np.minimum(region[mask], stroke[mask]).astype(np.uint8)
+
+
+def _photograph(sheet, d, rng):
+    """Переносит бланк на стол в кадре: поворот, перспектива, освещение, размытие, шум и сжатие."""
+    frame_width, frame_height = d.frame_size
+    height, width = sheet.shape
+    scale = min(frame_width, frame_height) * rng.uniform(*d.coverage) / max(width, height)
+    w, h = width * scale, height * scale
+    corners = np.float32([[-w, -h], [w, -h], [-w, h], [w, h]]) / 2
+    angle = np.deg2rad(rng.uniform(-d.rotation, d.rotation))
+    rotation = np.float32([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    corners = corners @ rotation.T + np.float32([frame_width, frame_height]) / 2
+    corners += rng.uniform(-d.perspective, d.perspective, (4, 2)).astype(np.float32) * np.float32([w, h])
+    source = np.float32([[0, 0], [width, 0], [0, height], [width, height]])
+    matrix = cv2.getPerspectiveTransform(source, corners)
+    desk = rng.uniform(60, 110)
+    frame = np.full((frame_height, frame_width), desk, np.float32)
+    cv2.warpPerspective(sheet.astype(np.float32), matrix, (frame_width, frame_height), frame,
+                        flags=cv2.INTER_AREA, borderMode=cv2.BORDER_TRANSPARENT)
+    if d.lighting:
+        # Линейный перепад освещенности в случайном направлении
+        direction = rng.uniform(0, 2 * np.pi)
+        xx = np.linspace(-0.5, 0.5, frame_width, dtype=np.float32)[None, :]
+        yy = np.linspace(-0.5, 0.5, frame_height, dtype=np.float32)[:, None]
+        ramp = xx * np.cos(direction) + yy * np.sin(direction)
+        frame *= 1 - d.lighting * (ramp + 0.5)
+    sigma = rng.uniform(*d.blur)
+    if sigma > 0:
+        frame = cv2.GaussianBlur(frame, (0, 0), sigma)
+    if d.noise:
+        frame += rng.normal(0, d.noise, frame.shape).astype(np.float32)
+    frame = cv2.cvtColor(np.clip(frame, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+    if d.jpeg:
+        frame = cv2.imdecode(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, d.jpeg])[1], cv2.IMREAD_COLOR)
+    return frame
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сохраняет синтетический бланк в файл.")
+    parser.add_argument("--questions", type=int, default=20, help="количество вопросов")
+    parser.add_argument("--choices", type=int, default=5, help="количество вариантов")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="camera", help="условия съемки")
+    parser.add_argument("--frame-size", type=parse_size, default=None, help="размер кадра, например 1920x1080")
+    parser.add_argument("--seed", type=int, default=0, help="начальное значение генератора случайных чисел")
+    parser.add_argument("--output", default="sheet.png", help="файл изображения")
+    args = parser.parse_args(argv)
+    distortion = PRESETS[args.preset]
+    if args.frame_size:
+        distortion = replace(distortion, frame_size=args.frame_size)
+    frame, answers = make_sheet(args.questions, args.choices, np.random.default_rng(args.seed), distortion)
+    cv2.imwrite(args.output, frame)
+    print(f"{args.output}: ответы {','.join(str(answer + 1) for answer in answers)}")
+
+
+if __name__ == "__main__":
+    main()
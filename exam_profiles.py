@@ -0,0 +1,158 @@
+"""Профили тестов: сетка бланка, ключ ответов и критерии оценок в JSON-файлах каталога profiles/.
+
+Пример файла:
+    {"name": "Контрольная 1", "questions": 5, "choices": 5, "answers": [2, 3, 1, 3, 5],
+     "criteria": [90, 75, 50, 0], "image_size": 700, "id_digits": 0, "qr": true}
+
+Варианты в ключе нумеруются с 1, как на бланке и в поле ключа; внутри программы - с 0. Профиль один раз
+превращается в шаблон (ExamTemplate) с разобранными критериями оценок; шаблоны кэшируются по пути и времени
+изменения файла, поэтому переключение профилей не перечитывает файлы. Ключ и сетка шаблона только заполняют
+поля экрана: ключ там можно исправить, поэтому проверка берет ключ из полей, а геометрию сетки - из кэша
+grid_geometry.get_geometry.
+"""
+import json
+import os
+import re
+from dataclasses import asdict, dataclass
+
+from scoring import DEFAULT_THRESHOLDS, GRADES, GradeScale
+
+# Каталог с файлами профилей
+PROFILES_DIR = "profiles"
+PROFILE_EXTENSION = ".json"
+
+# Кэш шаблонов: путь -> ((время изменения, размер файла), шаблон)
+_templates = {}
+
+
+@dataclass(frozen=True)
+class ExamProfile:
+    """Настройки одного теста в том виде, в каком они хранятся в файле."""
+    name: str
+    questions: int
+    choices: int
+    answers: tuple  # Правильный вариант каждого вопроса (с 0)
+    criteria: tuple = DEFAULT_THRESHOLDS  # Минимальный процент для оценок 5, 4, 3 и 2
+    image_size: int = 700  # Размер выровненного бланка
+    id_digits: int = 0  # Цифр в блоке номера ученика; 0 - блока нет
+    qr: bool = True  # Читать номер ученика из QR-кода
+
+    @classmethod
+    def from_dict(cls, data):
+        """Профиль из словаря файла; при ошибке в настройках выбрасывает ValueError."""
+        try:
+            name = str(data["name"]).strip()
+            questions, choices = int(data["questions"]), int(data["choices"])
+            answers = [int(answer) - 1 for answer in data["answers"]]
+            criteria = tuple(float(value) for value in data.get("criteria", DEFAULT_THRESHOLDS))
+            image_size = int(data.get("image_size", 700))
+            id_digits = int(data.get("id_digits", 0))
+            qr = data.get("qr", True)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Неверный формат профиля: {e}")
+        if not name:
+            raise ValueError("У профиля нет названия.")
+        if questions <= 0 or choices <= 0:
+            raise ValueError("Количество вопросов и вариантов должно быть положительным целым числом.")
+        check_answers(answers, questions, choices)
+        if len(criteria) != len(GRADES):
+            raise ValueError(f"Критериев должно быть {len(GRADES)}: минимальные проценты для оценок 5, 4, 3 и 2.")
+        if image_size <= 0 or id_digits < 0:
+            raise ValueError("Размер бланка и количество цифр номера не могут быть отрицательными.")
+        if not isinstance(qr, bool):
+            # Строка "false" иначе включила бы чтение QR-кода
+            raise ValueError("Поле qr должно быть true или false.")
+        return cls(name, questions, choices, tuple(answers), criteria, image_size, id_digits, qr)
+
+    def to_dict(self):
+        data = asdict(self)
+        data["answers"] = [answer + 1 for answer in self.answers]
+        data["criteria"] = list(self.criteria)
+        return data
+
+
+# Профиль, с которым приложение работает, пока в каталоге profiles/ нет ни одного файла
+DEFAULT_PROFILE = ExamProfile("Тест 5x5", 5, 5, (1, 2, 0, 2, 4))
+
+
+class ExamTemplate:
+    """Профиль, подготовленный к работе: критерии оценок разобраны один раз."""
+
+    def __init__(self, profile, path=None):
+        self.profile = profile
+        self.path = path  # Файл профиля; None - профиль по умолчанию
+        self.scale = GradeScale(profile.criteria)
+
+    @property
+    def name(self):
+        return self.profile.name
+
+    def grade(self, score):
+        """Оценка за процент выполнения по критериям профиля."""
+        return self.scale.grade(score)
+
+
+def check_answers(answers, questions, choices):
+    """Проверяет ключ (варианты с 0) на соответствие сетке; при ошибке выбрасывает ValueError."""
+    if len(answers) != questions:
+        raise ValueError(f"Ключ содержит {len(answers)} ответов, а вопросов {questions}.")
+    if any(answer < 0 or answer >= choices for answer in answers):
+        raise ValueError(f"Номера вариантов должны быть от 1 до {choices}.")
+
+
+def parse_answers(text, questions, choices):
+    """Разбирает ключ вида "2,3,1,3,5" (варианты нумеруются с 1) в список индексов."""
+    try:
+        answers = [int(item) - 1 for item in text.split(",") if item.strip()]
+    except ValueError:
+        raise ValueError("Ключ ответов должен содержать номера вариантов через запятую.")
+    check_answers(answers, questions, choices)
+    return answers
+
+
+def load_profile(path):
+    """Читает профиль из файла; при ошибке выбрасывает ValueError или OSError."""
+    with open(path, "r", encoding="utf-8") as file:
+        try:
+            data = json.load(file)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Файл профиля не является JSON: {e}")
+    return ExamProfile.from_dict(data)
+
+
+def load_template(path):
+    """Шаблон профиля из файла; файл перечитывается, только если он изменился с прошлого раза."""
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _templates.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    template = ExamTemplate(load_profile(path), path)
+    _templates[path] = (stamp, template)
+    return template
+
+
+def list_templates(directory=PROFILES_DIR):
+    """Шаблоны всех профилей каталога, отсортированные по названию. Неверные файлы пропускаются."""
+    templates = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return templates
+    for name in names:
+        if name.lower().endswith(PROFILE_EXTENSION):
+            try:
+                templates.append(load_template(os.path.join(directory, name)))
+            except (OSError, ValueError) as e:
+                print(f"Профиль {name} пропущен: {e}")
+    return sorted(templates, key=lambda template: template.name.lower())
+
+
+def save_profile(profile, directory=PROFILES_DIR):
+    """Сохраняет профиль в файл с именем по названию теста и возвращает его шаблон."""
+    os.makedirs(directory, exist_ok=True)
+    file_name = re.sub(r'[\\/:*?"<>|\s]+', "_", profile.name).strip("_.") or "profile"
+    path = os.path.join(directory, file_name + PROFILE_EXTENSION)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(profile.to_dict(), file, ensure_ascii=False, indent=2)
+    return load_template(path)
@@ -0,0 +1,76 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+
+class FrameBufferPool:
+    """Набор переиспользуемых массивов для промежуточных изображений обработки кадра.
+
+    Функции обработки передают буферы в OpenCV через dst=, поэтому при неизменных настройках и размере кадра
+    новые массивы не создаются. Пул привязан к геометрии (размер кадра, сетка, размер холста): при ее смене
+    старые буферы освобождаются. Пул не потокобезопасен, у каждого потока обработки должен быть свой.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.allocations = 0  # Сколько раз буферы создавались заново
+        self._buffers = {}
+
+    def bind(self, key):
+        """Привязывает пул к текущей геометрии; при ее изменении все буферы сбрасываются."""
+        if key != self.key:
+            self._buffers.clear()
+            self.key = key
+
+    def get(self, name, shape, dtype=np.uint8):
+        """Возвращает буфер с заданным именем, формой и типом, создавая его только при первом обращении."""
+        shape = tuple(shape)
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype)
+            self._buffers[name] = buffer
+            self.allocations += 1
+        return buffer
+
+    def clear(self):
+        self._buffers.clear()
+        self.key = None
+
+
+def pool_buffer(buffers, name, shape, dtype=np.uint8):
+    """Буфер из пула или None, если пул не используется (тогда OpenCV сам создаст результат)."""
+    return None if buffers is None else buffers.get(name, shape, dtype)
+
+
+def measure_allocations(process, frames, warmup=3):
+    """Измеряет выделение памяти при обработке кадров функцией process(frame).
+
+    Для каждого кадра через tracemalloc фиксируется пик временно выделенной памяти и объем памяти,
+    оставшейся занятой после обработки. Возвращает словарь со средними значениями на кадр.
+    """
+    for frame in frames[:warmup]:
+        process(frame)  # Прогрев: буферы пула и кэши создаются до начала измерений
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    peaks, retained, times = [], [], []
+    try:
+        for frame in frames:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            start = time.perf_counter()
+            process(frame)
+            times.append(time.perf_counter() - start)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return {
+        "frames": len(frames),
+        "peak_bytes": float(np.mean(peaks)),  # Сколько памяти выделяется за кадр в пике
+        "retained_bytes": float(np.mean(retained)),  # Сколько остается после кадра (рост кэшей, утечки)
+        "ms": float(np.mean(times)) * 1000,  # Время под трассировкой завышено, важно только сравнение
+    }
@@ -0,0 +1,84 @@
+import time
+
+import cv2
+import numpy as np
+from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtWidgets import QSizePolicy
+
+
+class FrameDisplay:
+    """Показывает BGR-изображения OpenCV в QLabel без перевода в RGB в потоке обработки.
+
+    Изображение один раз уменьшается под размер метки и дополняется альфа-каналом в постоянный буфер.
+    Порядок байтов BGRA совпадает с родным для Qt форматом RGB32: QImage ссылается на буфер без копирования,
+    а QPixmap.fromImage копирует пиксели в свои данные без перевода формата (формат BGR888 Qt переводит
+    в RGB32 сам, и это дороже прежнего пути через RGB). QPixmap владеет своей копией, поэтому буфер можно сразу
+    переписывать следующим кадром.
+    Повторный показ того же изображения при неизменном размере метки пропускается. При fit_to_label=True
+    изображение вписывается в текущий размер метки, иначе уменьшается только до ее максимального размера,
+    а метка, как и раньше, подстраивается под кадр.
+    """
+
+    def __init__(self, label, fit_to_label=False):
+        self.label = label
+        self.fit_to_label = fit_to_label
+        if fit_to_label:
+            # Размер метки задает макет, а не изображение, иначе уменьшенный кадр уменьшал бы и метку
+            label.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
+            label.setMinimumSize(1, 1)
+        self._scaled = None  # Постоянный буфер уменьшенного изображения
+        self._bgra = None  # Постоянный буфер, на который ссылается QImage
+        self._image = None  # Последнее показанное изображение
+        self._size = None  # Размер, в котором оно показано
+        self.shown = 0  # Сколько раз изображение выводилось
+        self.skipped = 0  # Сколько раз вывод пропущен, потому что ничего не изменилось
+        self.total_time = 0.0  # Суммарное время вывода, секунды
+
+    @property
+    def mean_ms(self):
+        """Средняя стоимость вывода одного кадра, мс."""
+        return self.total_time / self.shown * 1000 if self.shown else 0.0
+
+    def show(self, img):
+        """Выводит изображение. Возвращает False, если перерисовка не понадобилась."""
+        size = self._target_size(img)
+        if img is self._image and size == self._size:
+            self.skipped += 1
+            return False
+        start = time.perf_counter()
+        frame = img
+        if size != (img.shape[1], img.shape[0]):
+            self._scaled = _reuse(self._scaled, (size[1], size[0], 3))
+            frame = cv2.resize(img, size, dst=self._scaled, interpolation=cv2.INTER_LINEAR)
+        self._bgra = _reuse(self._bgra, (size[1], size[0], 4))
+        cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=self._bgra)
+        width, height = size
+        image = QImage(self._bgra.data, width, height, self._bgra.strides[0], QImage.Format_RGB32)
+        # Новый QPixmap на каждом кадре: метка держит общую копию прежнего, и запись в него копировала бы данные
+        self.label.setPixmap(QPixmap.fromImage(image))
+        self._image, self._size = img, size
+        self.shown += 1
+        self.total_time += time.perf_counter() - start
+        return True
+
+    def clear(self):
+        self.label.clear()
+        self._image = None
+        self._size = None
+
+    def _target_size(self, img):
+        """Размер вывода: изображение вписывается в доступную область с сохранением пропорций и не увеличивается."""
+        height, width = img.shape[:2]
+        if self.fit_to_label:
+            area = self.label.contentsRect().size()
+        else:
+            area = self.label.maximumSize()
+        if area.width() <= 0 or area.height() <= 0:
+            return width, height
+        scale = min(1.0, area.width() / width, area.height() / height)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _reuse(buffer, shape):
+    # Буфер создается заново только при изменении размера
+    return buffer if buffer is not None and buffer.shape == shape else np.empty(shape, np.uint8)
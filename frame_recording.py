@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Расширение файлов записи; такой источник открывается как ReplayCapture, а не как камера
+RECORDING_EXTENSION = ".frames"
+# Заголовок файла: за ним идут метки времени кадров (float64) и сами кадры без сжатия
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("height", "<u4"),
+    ("width", "<u4"),
+    ("channels", "<u4"),
+    ("capacity", "<u4"),
+    ("written", "<u8"),  # Сколько кадров записано за все время; последние capacity из них хранятся в файле
+])
+HEADER_SIZE = 64
+MAGIC = b"OMRFRAME"
+VERSION = 1
+# Сколько кадров хранит запись по умолчанию: около 30 секунд при 30 кадрах в секунду
+DEFAULT_CAPACITY = 900
+
+
+class FrameRecorder:
+    """Записывает кадры видео в кольцевой файл, отображенный в память.
+
+    Файл создается при первом кадре под его размер и вмещает capacity кадров; когда место заканчивается,
+    новые кадры записываются поверх самых старых. Кадр копируется в файл без сжатия и кодирования, поэтому
+    запись почти ничего не стоит потоку захвата. Запись и закрытие защищены блокировкой: поток захвата пишет,
+    а интерфейс может закрыть запись в любой момент.
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._header = None
+        self._timestamps = None
+        self._frames = None
+        self._written = 0  # Копия счетчика из заголовка, доступная и после закрытия
+        self._closed = False
+
+    @property
+    def written(self):
+        return self._written
+
+    def write(self, frame, timestamp=None):
+        """Добавляет кадр. Возвращает False, если запись закрыта или размер кадра отличается от первого."""
+        with self._lock:
+            if self._closed:
+                return False
+            if self._frames is None:
+                self._create(frame.shape)
+            elif frame.shape != self._frames.shape[1:]:
+                return False
+            written = self._written
+            slot = written % self.capacity
+            self._frames[slot] = frame
+            self._timestamps[slot] = time.perf_counter() if timestamp is None else timestamp
+            # Счетчик увеличивается последним: читатель не увидит недописанный кадр
+            self._header["written"] = self._written = written + 1
+            return True
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for array in (self._header, self._timestamps, self._frames):
+                if array is not None:
+                    array.flush()
+            self._header = self._timestamps = self._frames = None
+
+    def _create(self, shape):
+        height, width = shape[:2]
+        channels = shape[2] if len(shape) == 3 else 1
+        timestamps_offset, frames_offset, size = _layout(height, width, channels, self.capacity)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "wb") as file:
+            file.truncate(size)
+        self._header = np.memmap(self.path, HEADER_DTYPE, "r+", 0, (1,))
+        self._header[0] = (MAGIC, VERSION, height, width, channels, self.capacity, 0)
+        self._timestamps = np.memmap(self.path, np.float64, "r+", timestamps_offset, (self.capacity,))
+        self._frames = np.memmap(self.path, np.uint8, "r+", frames_offset, (self.capacity,) + tuple(shape))
+
+
+class FrameRecording:
+    """Кадры из файла FrameRecorder в порядке записи (от самого старого из сохранившихся)."""
+
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, HEADER_DTYPE, count=1)
+        if len(header) == 0 or header["magic"][0] != MAGIC:
+            raise ValueError(f"{path} не является записью кадров.")
+        header = header[0]
+        height, width, channels = int(header["height"]), int(header["width"]), int(header["channels"])
+        self.capacity = int(header["capacity"])
+        written = int(header["written"])
+        self.count = min(written, self.capacity)
+        self.first = written % self.capacity if written > self.capacity else 0  # Слот самого старого кадра
+        timestamps_offset, frames_offset, _ = _layout(height, width, channels, self.capacity)
+        shape = (self.capacity, height, width) + ((channels,) if channels > 1 else ())
+        self._timestamps = np.memmap(path, np.float64, "r", timestamps_offset, (self.capacity,))
+        self._frames = np.memmap(path, np.uint8, "r", frames_offset, shape)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def frame_size(self):
+        """Размер кадра (ширина, высота)."""
+        return self._frames.shape[2], self._frames.shape[1]
+
+    def frame(self, index):
+        """Кадр с номером index; массив ссылается на файл, для долгого хранения его нужно скопировать."""
+        return self._frames[(self.first + index) % self.capacity]
+
+    def timestamp(self, index):
+        """Время кадра в секундах от первого кадра записи."""
+        first = self._timestamps[self.first]
+        return float(self._timestamps[(self.first + index) % self.capacity] - first)
+
+    def fps(self):
+        """Средняя частота кадров записи."""
+        duration = self.timestamp(self.count - 1) if self.count > 1 else 0.0
+        return (self.count - 1) / duration if duration > 0 else 0.0
+
+
+class ReplayCapture:
+    """Источник кадров из записи с интерфейсом cv2.VideoCapture (grab, retrieve, read, get, release).
+
+    При realtime=True кадры выдаются с теми же интервалами, что и при записи; иначе как можно быстрее.
+    После последнего кадра grab возвращает False и finished становится True (при loop=True запись
+    начинается заново).
+    """
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.recording = FrameRecording(path)
+        self.realtime = realtime
+        self.loop = loop
+        self.finished = False
+        self._position = 0  # Номер следующего кадра
+        self._current = None  # Номер кадра, полученного последним grab
+        self._start = None  # Время выдачи первого кадра при воспроизведении в реальном времени
+
+    def isOpened(self):
+        return self.recording is not None and len(self.recording) > 0
+
+    def grab(self):
+        if self.recording is None:
+            return False
+        if self._position >= len(self.recording):
+            if not self.loop or not len(self.recording):
+                self.finished = True
+                return False
+            self._position = 0
+            self._start = None
+        if self.realtime:
+            now = time.perf_counter()
+            if self._start is None:
+                self._start = now
+            delay = self._start + self.recording.timestamp(self._position) - now
+            if delay > 0:
+                time.sleep(delay)
+        self._current = self._position
+        self._position += 1
+        return True
+
+    def retrieve(self):
+        if self._current is None:
+            return False, None
+        # Копия: кадр уходит в другие потоки, а файл может перезаписываться идущей записью
+        return True, np.array(self.recording.frame(self._current))
+
+    def read(self):
+        return self.retrieve() if self.grab() else (False, None)
+
+    def get(self, prop):
+        if self.recording is None:
+            return 0.0
+        values = {
+            cv2.CAP_PROP_FRAME_COUNT: len(self.recording),
+            cv2.CAP_PROP_POS_FRAMES: self._position,
+            cv2.CAP_PROP_FPS: self.recording.fps(),
+            cv2.CAP_PROP_FRAME_WIDTH: self.recording.frame_size[0],
+            cv2.CAP_PROP_FRAME_HEIGHT: self.recording.frame_size[1],
+        }
+        return float(values.get(prop, 0.0))
+
+    def set(self, prop, value):
+        return False  # Настройки камеры к записи неприменимы
+
+    def release(self):
+        self.recording = None
+
+
+def is_recording(source):
+    return isinstance(source, str) and source.lower().endswith(RECORDING_EXTENSION)
+
+
+def open_capture(source, realtime=True):
+    """Открывает камеру (номер или адрес потока) либо запись кадров, если source - путь к файлу .frames."""
+    if is_recording(source):
+        return ReplayCapture(source, realtime)
+    return cv2.VideoCapture(source)
+
+
+def _layout(height, width, channels, capacity):
+    # Смещения частей файла: заголовок, метки времени, кадры (выровнены по 64 байтам)
+    timestamps_offset = HEADER_SIZE
+    frames_offset = timestamps_offset + ((capacity * 8 + 63) // 64) * 64
+    size = frames_offset + capacity * height * width * channels
+    return timestamps_offset, frames_offset, size
@@ -0,0 +1,95 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# Цвета отметок на изображении бланка (BGR)
+GRID_COLOR = (255, 255, 0)
+CORRECT_COLOR = (10, 255, 10)
+WRONG_COLOR = (10, 10, 255)
+# Прозрачность сетки при наложении на выровненный бланк (1 - непрозрачная, как раньше рисовал drawGrid)
+GRID_ALPHA = 1.0
+
+
+class GridGeometry:
+    """Геометрия сетки бланка, которая зависит только от (вопросы, варианты, размер изображения).
+
+    Считается один раз и переиспользуется на каждом кадре: целевые углы для выравнивания,
+    границы и площади клеток, центры ответов, заготовки кругов и готовое изображение сетки с маской.
+    """
+
+    def __init__(self, questions, choices, image_size):
+        self.questions = questions
+        self.choices = choices
+        self.size = (image_size, image_size)  # Ширина и высота выровненного бланка
+        width, height = self.size
+        self.target = np.float32([[0, 0], [width, 0], [0, height], [width, height]])  # Целевые точки для преобразования
+        # Границы клеток; размер изображения не обязан делиться на количество вопросов и вариантов
+        self.row_edges = np.linspace(0, height, questions + 1).astype(np.intp)
+        self.col_edges = np.linspace(0, width, choices + 1).astype(np.intp)
+        self.cell_areas = np.outer(np.diff(self.row_edges), np.diff(self.col_edges))
+        # Центры клеток
+        self.centers_y = (self.row_edges[:-1] + self.row_edges[1:]) // 2
+        self.centers_x = (self.col_edges[:-1] + self.col_edges[1:]) // 2
+        # Плоские индексы центров клеток (вопросы x варианты) в изображении бланка
+        self.center_pixels = self.centers_y[:, None] * width + self.centers_x[None, :]
+        # Круги отметок не выходят за клетку даже на густых бланках, поэтому их пиксели не нужно обрезать по краям
+        cell = min(height / questions, width / choices)
+        self.answer_disk = _disk_offsets(min(30, int(cell * 0.45)), width)
+        self.correct_disk = _disk_offsets(min(20, int(cell * 0.3)), width)
+        self.grid_image, self.grid_mask = self._render_grid()
+
+    def _render_grid(self):
+        """Рисует сетку один раз: цветное изображение линий и маску их пикселей."""
+        width, height = self.size
+        mask = np.zeros((height, width), np.uint8)
+        for y in self.row_edges:
+            mask[max(0, y - 1):y + 1, :] = 255  # Линии толщиной 2 пикселя, как у drawGrid
+        for x in self.col_edges:
+            mask[:, max(0, x - 1):x + 1] = 255
+        image = np.zeros((height, width, 3), np.uint8)
+        image[mask > 0] = GRID_COLOR
+        return image, mask
+
+    def blend_grid(self, img, alpha=GRID_ALPHA):
+        """Накладывает готовую сетку на изображение вместо рисования линий на каждом кадре."""
+        if alpha < 1:
+            # Смешиваем весь кадр с сеткой, а в изображение переносим только пиксели линий
+            blended = cv2.addWeighted(img, 1 - alpha, self.grid_image, alpha, 0)
+            cv2.copyTo(blended, self.grid_mask, img)
+        else:
+            cv2.copyTo(self.grid_image, self.grid_mask, img)
+        return img
+
+    def draw_answers(self, img, index, grading, correct_answers):
+        """Отмечает выбранные ответы (зеленый - верно, красный - неверно) и правильные ответы для ошибок."""
+        pixels = img.reshape(-1, 3)
+        rows = np.arange(self.questions)
+        grading = np.asarray(grading).astype(bool)
+        centers = self.center_pixels[rows, np.asarray(index)]
+        pixels[(centers[grading, None] + self.answer_disk).ravel()] = CORRECT_COLOR
+        pixels[(centers[~grading, None] + self.answer_disk).ravel()] = WRONG_COLOR
+        # Для неправильных ответов показываем правильный вариант маленьким зеленым кругом
+        wrong = rows[~grading]
+        if len(wrong):
+            correct = self.center_pixels[wrong, np.asarray(correct_answers)[wrong]]
+            pixels[(correct[:, None] + self.correct_disk).ravel()] = CORRECT_COLOR
+        return img
+
+
+def _disk_offsets(radius, width):
+    """Плоские смещения пикселей закрашенного круга относительно центра в изображении шириной width."""
+    dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    inside = dx * dx + dy * dy <= radius * radius
+    return dy[inside] * width + dx[inside]
+
+
+@lru_cache(maxsize=16)
+def get_geometry(questions, choices, image_size):
+    """Возвращает геометрию сетки из кэша, при первом обращении вычисляет ее."""
+    return GridGeometry(questions, choices, image_size)
+
+
+def clear_geometry_cache():
+    """Сбрасывает кэш геометрии, например после изменения настроек сетки."""
+    get_geometry.cache_clear()
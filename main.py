@@ -1,15 +1,55 @@
 import sys
-from PySide6.QtWidgets import QApplication
-from main_window import MainWindow
+import time
+
+# Флаг вывода времени холодного старта: python main.py --startup-time
+STARTUP_TIME_FLAG = "--startup-time"
+
+class StartupTimer:
+    """Разбивка времени холодного старта по этапам.
+
+    Время считается от начала main(); запуск самого интерпретатора в него не входит. Экраны создаются
+    при первом показе, поэтому время их создания выводится отдельно, когда экран открывают.
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.start = self.last = time.perf_counter()
+
+    def mark(self, stage):
+        """Отмечает конец этапа, начавшегося с предыдущей отметки"""
+        now = time.perf_counter()
+        self.record(stage, now - self.last)
+        self.last = now
+
+    def record(self, stage, seconds):
+        if self.enabled:
+            print(f"{stage:<40} {seconds * 1000:8.1f} мс", flush=True)
+
+    def finish(self):
+        self.mark("первая отрисовка меню")
+        self.record("итого до показа меню", self.last - self.start)
+
 
 def main():
+    timer = StartupTimer(STARTUP_TIME_FLAG in sys.argv)
+    # Импорты внутри main, чтобы их время вошло в замер
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+    timer.mark("импорт PySide6")
+    from main_window import MainWindow
+    timer.mark("импорт главного окна")
     app = QApplication(sys.argv)
+    timer.mark("создание QApplication")
     # Загрузка и применение стилей
     with open("style.css", "r") as file:
         app.setStyleSheet(file.read())
-    window = MainWindow()
+    timer.mark("загрузка стилей")
+    window = MainWindow(timer)
+    timer.mark("создание главного окна")
     window.show()
+    # Таймер с нулевой задержкой срабатывает, когда цикл событий уже отрисовал окно
+    QTimer.singleShot(0, timer.finish)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,15 +2,36 @@ from PySide6.QtWidgets import QMainWindow, QPushButton, QVBoxLayout, QWidget, QS
 from PySide6.QtGui import QFont
 from PySide6.QtCore import Qt, QPropertyAnimation
 from PySide6.QtWidgets import QGraphicsDropShadowEffect
-from omr_gui import OMRApp
-from template_download import TemplateDownloadScreen
-from instructions import InstructionsScreen
-from report_screen import ReportScreen  # Импортируем экран отчета
+import time
+
+# Экраны создаются при первом показе, а их модули импортируются там же: OpenCV и matplotlib загружаются
+# только при первом открытии проверки или отчета, и главное меню появляется без них
+
+def _omr_screen(main_window):
+    from omr_gui import OMRApp
+    return OMRApp(main_window)
+
+def _template_download_screen(main_window):
+    from template_download import TemplateDownloadScreen
+    return TemplateDownloadScreen(main_window)
+
+def _instructions_screen(main_window):
+    from instructions import InstructionsScreen
+    return InstructionsScreen(main_window)
+
+def _multi_camera_screen(main_window):
+    from multi_camera_screen import MultiCameraScreen
+    return MultiCameraScreen(main_window)
+
+def _report_screen(main_window):
+    from report_screen import ReportScreen
+    return ReportScreen(main_window)
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, startup_timer=None):
         super().__init__()
         self.setWindowTitle("Сканер тестов")
+        self.startup_timer = startup_timer  # Замер холодного старта (main.py --startup-time)
         # Основной виджет и макет
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -24,7 +45,7 @@ class MainWindow(QMainWindow):
                 background-color: #2E3440;
                 color: #D8DEE9;
             }
-            QWidget#central_widget, QWidget#main_menu, QWidget#omr_screen, QWidget#template_download_screen, QWidget#instructions_screen, QWidget#report_screen {
+            QWidget#central_widget, QWidget#main_menu, QWidget#omr_screen, QWidget#multi_camera_screen, QWidget#template_download_screen, QWidget#instructions_screen, QWidget#report_screen {
                 background-color: #3B4252;
             }
             QLabel {
@@ -74,6 +95,11 @@ class MainWindow(QMainWindow):
         self.start_check_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
         self.start_check_button.clicked.connect(self.show_omr_screen)
         self.main_menu_layout.addWidget(self.start_check_button, alignment=Qt.AlignCenter)
+        # Кнопка "Несколько камер"
+        self.multi_camera_button = QPushButton("Несколько камер")
+        self.multi_camera_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.multi_camera_button.clicked.connect(self.show_multi_camera_screen)
+        self.main_menu_layout.addWidget(self.multi_camera_button, alignment=Qt.AlignCenter)
         # Кнопка "Скачать шаблон бланка"
         self.download_template_button = QPushButton("Скачать шаблон бланка")
         self.download_template_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
@@ -96,22 +122,12 @@ class MainWindow(QMainWindow):
         self.main_menu_layout.addWidget(self.exit_button, alignment=Qt.AlignCenter)
         # Добавление главного меню в стек виджетов
         self.stacked_widget.addWidget(self.main_menu)
-        # Инициализация экранов и добавление их в стек виджетов
-        self.omr_screen = OMRApp(self)
-        self.omr_screen.setObjectName("omr_screen")
-        self.stacked_widget.addWidget(self.omr_screen)
-        # Экран "Скачать шаблон бланка"
-        self.template_download_screen = TemplateDownloadScreen(self)
-        self.template_download_screen.setObjectName("template_download_screen")
-        self.stacked_widget.addWidget(self.template_download_screen)
-        # Экран "Инструкция"
-        self.instructions_screen = InstructionsScreen(self)
-        self.instructions_screen.setObjectName("instructions_screen")
-        self.stacked_widget.addWidget(self.instructions_screen)
-        # Экран "Отчет" (новый экран)
-        self.report_screen = ReportScreen(self)
-        self.report_screen.setObjectName("report_screen")
-        self.stacked_widget.addWidget(self.report_screen)
+        # Экраны создаются при первом показе (см. create_screen)
+        self.omr_screen = None
+        self.multi_camera_screen = None
+        self.template_download_screen = None
+        self.instructions_screen = None
+        self.report_screen = None
         # Маленькая надпись для брендинга "МБОУ СОШ №14"
         self.branding_label = QLabel("МБОУ СОШ №14")
         branding_font = QFont("Arial", 10, QFont.Bold)  # Меньший шрифт для брендинга
@@ -126,20 +142,57 @@ class MainWindow(QMainWindow):
         # Показ главного меню
         self.stacked_widget.setCurrentWidget(self.main_menu)
 
+    def create_screen(self, factory, name):
+        """Создает экран при первом показе и добавляет его в стек виджетов"""
+        start = time.perf_counter()
+        screen = factory(self)
+        screen.setObjectName(name)
+        self.stacked_widget.addWidget(screen)
+        if self.startup_timer is not None:
+            self.startup_timer.record(f"первый показ: {name}", time.perf_counter() - start)
+        return screen
+
     # Методы для перехода между экранами
     def show_omr_screen(self):
+        if self.omr_screen is None:
+            self.omr_screen = self.create_screen(_omr_screen, "omr_screen")
         self.omr_screen.start_camera()
         self.stacked_widget.setCurrentWidget(self.omr_screen)
 
+    def show_multi_camera_screen(self):
+        # Камеры запускаются кнопкой на экране, после выбора источников
+        if self.multi_camera_screen is None:
+            self.multi_camera_screen = self.create_screen(_multi_camera_screen, "multi_camera_screen")
+        self.stacked_widget.setCurrentWidget(self.multi_camera_screen)
+
     def show_template_download_screen(self):
+        if self.template_download_screen is None:
+            self.template_download_screen = self.create_screen(_template_download_screen, "template_download_screen")
         self.stacked_widget.setCurrentWidget(self.template_download_screen)
 
     def show_instructions_screen(self):
+        if self.instructions_screen is None:
+            self.instructions_screen = self.create_screen(_instructions_screen, "instructions_screen")
         self.stacked_widget.setCurrentWidget(self.instructions_screen)
 
     def show_report_screen(self):
+        if self.report_screen is None:
+            self.report_screen = self.create_screen(_report_screen, "report_screen")  # Отчет загружается при создании
+        else:
+            self.report_screen.load_report()  # Добавляет работы, проверенные с прошлого показа
         self.stacked_widget.setCurrentWidget(self.report_screen)
 
     def show_main_menu(self):
-        self.omr_screen.stop_camera()
-        self.stacked_widget.setCurrentWidget(self.main_menu)
\ No newline at end of file
+        if self.omr_screen is not None:
+            self.omr_screen.stop_camera()
+        if self.multi_camera_screen is not None:
+            self.multi_camera_screen.stop_camera()
+        self.stacked_widget.setCurrentWidget(self.main_menu)
+
+    def closeEvent(self, event):
+        # Останавливаем фоновые потоки камеры до закрытия окна
+        if self.omr_screen is not None:
+            self.omr_screen.stop_camera()
+        if self.multi_camera_screen is not None:
+            self.multi_camera_screen.stop_camera()
+        super().closeEvent(event)
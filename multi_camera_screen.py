@@ -0,0 +1,264 @@
+import math
+
+import cv2
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QIcon
+from PySide6.QtWidgets import (QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QHBoxLayout, QGridLayout,
+                               QCheckBox, QMessageBox, QFrame, QComboBox)
+
+from answer_tracking import AnswerStabilizer, FrameSettings, grade_stable_frame
+from exam_profiles import DEFAULT_PROFILE, ExamTemplate, list_templates, parse_answers
+from frame_display import FrameDisplay
+from frame_recording import is_recording
+from grid_geometry import clear_geometry_cache
+from report_store import open_report_store, describe_record, exam_name
+from sheet_identity import identify_sheets
+from sheet_tracking import SheetTracker
+from video_pipeline import MultiSourcePipeline
+
+
+class CameraTile(QFrame):
+    """Плитка одного источника: название, видео, результат и показатели скорости."""
+
+    def __init__(self, title):
+        super().__init__()
+        self.setObjectName("camera_tile")
+        layout = QVBoxLayout(self)
+        self.title_label = QLabel(title)
+        self.title_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.title_label)
+        self.video_label = QLabel()
+        self.video_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.video_label, 1)
+        self.video_display = FrameDisplay(self.video_label, fit_to_label=True)  # Кадр вписывается в плитку
+        self.result_label = QLabel("Результат: N/A")
+        self.result_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.result_label)
+        self.status_label = QLabel()
+        self.status_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.status_label)
+        # Трекер и накопление ответов у каждого источника свои
+        self.stabilizer = AnswerStabilizer()
+        self.tracker = SheetTracker()
+        self.committed_record = None
+
+
+class MultiCameraScreen(QWidget):
+    """Проверка с нескольких камер одновременно: кадры всех камер проверяет общий набор потоков."""
+
+    def __init__(self, main_window):
+        super().__init__()
+        self.main_window = main_window
+        # Профиль теста заполняет поля панели; проверка применяет их при запуске камер
+        self.templates = list_templates() or [ExamTemplate(DEFAULT_PROFILE)]
+        self.template = self.templates[0]
+        profile = self.template.profile
+        self.questions = profile.questions
+        self.choices = profile.choices
+        self.correct_answers = list(profile.answers)
+        self.image_size = profile.image_size
+        self.detect_size = None  # Поиск бланка на уменьшенной копии кадра отключен, как и на главном экране
+        self.id_digits = profile.id_digits
+        self.exam = exam_name(self.questions, self.choices, self.correct_answers)
+        self.tiles = []
+        self.layout = QVBoxLayout(self)
+        # Панель управления: источники, ключ ответов и кнопки
+        self.controls_layout = QHBoxLayout()
+        self.profile_label = QLabel("Профиль:")
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItems([template.name for template in self.templates])
+        self.profile_combo.activated.connect(self.apply_profile)
+        self.sources_label = QLabel("Камеры:")
+        self.sources_entry = QLineEdit("0,1")
+        self.sources_entry.setToolTip("Номера камер или файлы записи .frames через запятую")
+        self.questions_label = QLabel("Вопросов:")
+        self.questions_entry = QLineEdit(str(self.questions))
+        self.choices_label = QLabel("Вариантов:")
+        self.choices_entry = QLineEdit(str(self.choices))
+        self.answers_label = QLabel("Ключ:")
+        self.answers_entry = QLineEdit(",".join(str(answer + 1) for answer in self.correct_answers))
+        self.answers_entry.setToolTip("Правильные варианты через запятую, начиная с 1")
+        self.exam_label = QLabel("Тест:")
+        self.exam_entry = QLineEdit(profile.name if self.template.path else "")
+        self.exam_entry.setPlaceholderText("по ключу")
+        self.id_digits_label = QLabel("Цифр номера:")
+        self.id_digits_entry = QLineEdit(str(self.id_digits))
+        self.id_digits_entry.setToolTip("Цифр в блоке номера ученика, 0 - блока на бланке нет")
+        for widget in (self.profile_label, self.profile_combo, self.sources_label, self.sources_entry, self.questions_label, self.questions_entry,
+                       self.choices_label, self.choices_entry, self.answers_label, self.answers_entry,
+                       self.exam_label, self.exam_entry, self.id_digits_label, self.id_digits_entry):
+            self.controls_layout.addWidget(widget)
+        self.start_button = QPushButton("Запустить")
+        self.start_button.clicked.connect(self.start_cameras)
+        self.controls_layout.addWidget(self.start_button)
+        self.stop_button = QPushButton("Остановить")
+        self.stop_button.clicked.connect(self.stop_camera)
+        self.controls_layout.addWidget(self.stop_button)
+        self.back_button = QPushButton("Назад")
+        self.back_button.setIcon(QIcon("icons/back.png"))
+        self.back_button.clicked.connect(self.go_back)
+        self.controls_layout.addWidget(self.back_button)
+        self.layout.addLayout(self.controls_layout)
+        self.auto_report_checkbox = QCheckBox("Автоматически добавлять в отчет")
+        self.auto_report_checkbox.setChecked(True)
+        self.layout.addWidget(self.auto_report_checkbox)
+        # Повторно отсканированный бланк ученика заменяет его прежний результат по тому же тесту
+        self.qr_checkbox = QCheckBox("Читать номер ученика из QR-кода")
+        self.qr_checkbox.setChecked(profile.qr)
+        self.qr_checkbox.toggled.connect(self.update_frame_settings)
+        self.layout.addWidget(self.qr_checkbox)
+        self.total_label = QLabel()
+        self.total_label.setAlignment(Qt.AlignCenter)
+        self.layout.addWidget(self.total_label)
+        # Плитки камер
+        self.tiles_widget = QWidget()
+        self.tiles_layout = QGridLayout(self.tiles_widget)
+        self.layout.addWidget(self.tiles_widget, 1)
+        self.report_store = open_report_store()
+        self.update_frame_settings()
+        # Без бланка в кадре обработка камеры замедляется до частоты ожидания, освобождая потоки для остальных
+        self.pipeline = MultiSourcePipeline(self.process_frame, self, detected=lambda frame_result: frame_result[1] is not None)
+        self.pipeline.result_ready.connect(self.update_video)
+        self.pipeline.capture_failed.connect(self.capture_failed)
+
+    def start_cameras(self):
+        try:
+            sources = self.parse_sources(self.sources_entry.text())
+            questions = int(self.questions_entry.text())
+            choices = int(self.choices_entry.text())
+            if questions <= 0 or choices <= 0:
+                raise ValueError("Количество вопросов и вариантов должно быть положительным целым числом.")
+            correct_answers = parse_answers(self.answers_entry.text(), questions, choices)
+            id_digits = int(self.id_digits_entry.text() or 0)
+            if id_digits < 0:
+                raise ValueError("Количество цифр в номере ученика не может быть отрицательным.")
+        except ValueError as e:
+            QMessageBox.critical(self, "Ошибка ввода", str(e))
+            return
+        self.stop_camera()
+        if (questions, choices) != (self.questions, self.choices):
+            clear_geometry_cache()  # Геометрия сетки для старых настроек больше не нужна
+        self.questions, self.choices, self.correct_answers = questions, choices, correct_answers
+        self.image_size = self.template.profile.image_size
+        self.id_digits = id_digits
+        self.exam = self.exam_entry.text().strip() or exam_name(questions, choices, correct_answers)
+        self.update_frame_settings()
+        self.create_tiles(sources)
+        self.pipeline.start(sources)
+
+    def apply_profile(self, index):
+        """Заполняет поля панели из профиля; камеры перезапускаются кнопкой "Запустить"."""
+        self.template = self.templates[index]
+        profile = self.template.profile
+        self.questions_entry.setText(str(profile.questions))
+        self.choices_entry.setText(str(profile.choices))
+        self.answers_entry.setText(",".join(str(answer + 1) for answer in profile.answers))
+        self.exam_entry.setText(profile.name if self.template.path else "")
+        self.id_digits_entry.setText(str(profile.id_digits))
+        self.qr_checkbox.setChecked(profile.qr)
+
+    def update_frame_settings(self):
+        """Собирает снимок настроек для потоков обработки; вызывается в потоке интерфейса при каждом их изменении."""
+        self.frame_settings = FrameSettings(self.questions, self.choices, tuple(self.correct_answers), self.image_size,
+                                            self.detect_size, self.id_digits, self.qr_checkbox.isChecked())
+
+    def stop_camera(self):
+        self.pipeline.stop()
+        for tile in self.tiles:
+            tile.video_display.clear()
+            tile.status_label.clear()
+        self.total_label.clear()
+
+    def go_back(self):
+        self.stop_camera()
+        self.main_window.show_main_menu()
+
+    @staticmethod
+    def parse_sources(text):
+        """Разбирает список источников: номера камер и пути к записям .frames."""
+        sources = []
+        for item in text.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            if is_recording(item):
+                sources.append(item)
+            elif item.isdigit():
+                sources.append(int(item))
+            else:
+                raise ValueError(f"Источник '{item}' не является номером камеры или файлом записи.")
+        if not sources:
+            raise ValueError("Укажите хотя бы одну камеру.")
+        return sources
+
+    def create_tiles(self, sources):
+        while self.tiles_layout.count():
+            child = self.tiles_layout.takeAt(0)
+            if child.widget():
+                child.widget().deleteLater()
+        # Плитки располагаются почти квадратной сеткой
+        columns = math.ceil(math.sqrt(len(sources)))
+        self.tiles = []
+        for index, source in enumerate(sources):
+            tile = CameraTile(f"Камера {source}" if isinstance(source, int) else f"Запись {source}")
+            self.tiles_layout.addWidget(tile, index // columns, index % columns)
+            self.tiles.append(tile)
+
+    def process_frame(self, index, img, buffers):
+        """Обрабатывает кадр источника index в одном из общих потоков обработки."""
+        tile = self.tiles[index]
+        settings = self.frame_settings  # Поля и флажки окна меняет поток интерфейса
+        try:
+            imgFinal, result, committed = grade_stable_frame(
+                img, tile.stabilizer, settings.questions, settings.choices, settings.correct_answers,
+                settings.image_size, tile.tracker, settings.detect_size, buffers)
+        except Exception as e:
+            print(f"Ошибка: {e}")
+            imgFinal, result, committed = cv2.resize(img, (settings.image_size, settings.image_size)), None, False
+        if committed and settings.identifies:
+            # Номер читается один раз, с кадра фиксации ответов; без номера результат все равно попадает в отчет
+            try:
+                result.student = identify_sheets(img, [result], settings.id_digits, settings.qr)[0]
+            except Exception as e:
+                print(f"Ошибка чтения номера ученика: {e}")
+        return imgFinal, result, settings, committed, tile.stabilizer.locked
+
+    def update_video(self, index, frame_result):
+        """Показывает результат обработки кадра источника; вызывается в потоке интерфейса."""
+        if index >= len(self.tiles):
+            return
+        tile = self.tiles[index]
+        imgFinal, result, settings, committed, locked = frame_result
+        questions = settings.questions
+        if committed:
+            tile.committed_record = None
+            if self.auto_report_checkbox.isChecked():
+                try:
+                    tile.committed_record = self.report_store.upsert(self.exam, result.student, len(result.index),
+                                                                     result.correct, result.score, result.index,
+                                                                     list(settings.correct_answers))
+                except OSError as e:
+                    QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить отчет: {e}")
+        tile.video_display.show(imgFinal)
+        tile.status_label.setText(self.pipeline.status_text(index))
+        self.update_total()
+        if result is None:
+            tile.result_label.setText(f"Результат: 0/{questions}, 0.00%")
+            return
+        status = ""
+        if locked:
+            status = " (зафиксирован)"
+            if tile.committed_record is not None:
+                status = f" (добавлен в отчет как {describe_record(tile.committed_record)})"
+        tile.result_label.setText(f"Результат: {result.correct}/{questions}, {result.score:.2f}%, "
+                                  f"оценка {self.template.grade(result.score)}{status}")
+
+    def update_total(self):
+        stats = [self.pipeline.stats(index) for index in range(len(self.tiles))]
+        self.total_label.setText(f"Всего: {sum(s['fps'] for s in stats):.1f} кадр/с на "
+                                 f"{len(self.pipeline.worker_threads)} потоках, "
+                                 f"обработано {sum(s['processed'] for s in stats)}")
+
+    def capture_failed(self, index, message):
+        if index < len(self.tiles):
+            self.tiles[index].result_label.setText(message)
@@ -1,20 +1,43 @@
-from PySide6.QtWidgets import QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QGridLayout, QCheckBox, QMessageBox, QHBoxLayout, QScrollArea, QSplitter
-from PySide6.QtGui import QImage, QPixmap, QIcon
-from PySide6.QtCore import QTimer, Qt
-import cv2
+from PySide6.QtWidgets import QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QCheckBox, QMessageBox, QHBoxLayout, QSplitter, QFileDialog, QComboBox
+from PySide6.QtGui import QIcon
+from PySide6.QtCore import Qt
 import os
-from video_processing import process_video_frame
+import time
+import cv2
+from video_processing import process_video_frame, grade_sheet, grade_sheets, render_sheets_overlay, SheetNotFoundError
+from video_pipeline import VideoPipeline
+from answer_tracking import AnswerStabilizer, FrameSettings, grade_stable_frame
+from sheet_tracking import SheetTracker
+from frame_buffers import FrameBufferPool
+from frame_display import FrameDisplay
+from grid_geometry import clear_geometry_cache
+from exam_profiles import DEFAULT_PROFILE, ExamProfile, ExamTemplate, list_templates, save_profile
+from answer_key_editor import AnswerKeyEditor
+from report_store import open_report_store, describe_record, exam_name
+from sheet_identity import grade_identified_sheets, identify_sheets, id_block_filter
+from stage_profiler import StageProfiler, profile_stage
+from frame_recording import RECORDING_EXTENSION
+
+# Каталог, в который сохраняются записи кадров с камеры
+RECORDINGS_DIR = "recordings"
 
 class OMRApp(QWidget):
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
         self.setWindowTitle("Конфигурация OMR сетки и видео")
-        # Значения по умолчанию
-        self.questions = 5
-        self.choices = 5
-        self.correct_answers = [1, 2, 0, 2, 4]
-        self.image_size = 700
+        # Профили тестов из каталога profiles/; значения по умолчанию берутся из первого профиля
+        self.templates = list_templates() or [ExamTemplate(DEFAULT_PROFILE)]
+        self.template = self.templates[0]  # Выбранный профиль; его критерии дают оценку на экране
+        profile = self.template.profile
+        self.questions = profile.questions
+        self.choices = profile.choices
+        self.correct_answers = list(profile.answers)
+        self.image_size = profile.image_size
+        # Длинная сторона уменьшенной копии кадра для поиска бланка (ответы считываются в полном разрешении);
+        # None - бланк ищется на изображении image_size, как раньше
+        self.detect_size = None
+        self.id_digits = profile.id_digits  # Цифр в блоке номера ученика; 0 - блока на бланке нет
         # Основной макет с разделителем
         self.splitter = QSplitter(Qt.Horizontal, self)
         self.main_layout = QHBoxLayout(self)
@@ -23,15 +46,21 @@ class OMRApp(QWidget):
         self.left_layout = QVBoxLayout()
         self.video_widget = QWidget()
         self.video_widget_layout = QVBoxLayout(self.video_widget)
-        self.video_widget_layout.setAlignment(Qt.AlignCenter)
         self.splitter.addWidget(self.video_widget)
         # Метка для отображения результатов
         self.result_label = QLabel("Результат: N/A")
         self.result_label.setAlignment(Qt.AlignCenter)
         self.video_widget_layout.addWidget(self.result_label)
+        # Метка с частотой кадров и загрузкой процессора
+        self.status_label = QLabel()
+        self.status_label.setAlignment(Qt.AlignCenter)
+        self.video_widget_layout.addWidget(self.status_label)
         # Метка для видео
         self.video_label = QLabel()
-        self.video_widget_layout.addWidget(self.video_label)
+        self.video_label.setAlignment(Qt.AlignCenter)
+        # Метка занимает все свободное место, а кадр один раз уменьшается под ее размер
+        self.video_widget_layout.addWidget(self.video_label, 1)
+        self.video_display = FrameDisplay(self.video_label, fit_to_label=True)  # Вывод BGR-кадров без лишних преобразований
         # Правая часть - панель управления
         self.right_widget = QWidget()
         self.right_layout = QVBoxLayout(self.right_widget)
@@ -65,11 +94,59 @@ class OMRApp(QWidget):
         self.report_button.setEnabled(False)  # Активируется только при наличии стоп-кадра
         self.report_button.clicked.connect(self.save_report)
         self.right_layout.addWidget(self.report_button)
+        # Автоматическое добавление в отчет, когда ответы на видео стабилизировались
+        self.auto_report_checkbox = QCheckBox("Автоматически добавлять в отчет")
+        self.right_layout.addWidget(self.auto_report_checkbox)
+        # Проверка всех бланков в кадре (несколько листов на столе или блоков ответов на одном листе);
+        # в этом режиме ответы не накапливаются по кадрам, в отчет бланки добавляются со стоп-кадра
+        self.multi_sheet_checkbox = QCheckBox("Несколько бланков в кадре")
+        self.multi_sheet_checkbox.toggled.connect(self.toggle_multi_sheet)
+        self.right_layout.addWidget(self.multi_sheet_checkbox)
+        # Замер времени этапов обработки: включается на ходу, выключенный почти ничего не стоит
+        self.profiler = StageProfiler()
+        self.profile_checkbox = QCheckBox("Замерять время этапов")
+        self.profile_checkbox.toggled.connect(self.toggle_profiling)
+        self.right_layout.addWidget(self.profile_checkbox)
+        self.profile_overlay_checkbox = QCheckBox("Время этапов на видео")
+        self.profile_overlay_checkbox.setEnabled(False)
+        self.profile_overlay_checkbox.toggled.connect(self.toggle_profile_overlay)
+        self.right_layout.addWidget(self.profile_overlay_checkbox)
+        self.profile_save_button = QPushButton("Сохранить замеры")
+        self.profile_save_button.setEnabled(False)
+        self.profile_save_button.clicked.connect(self.save_profile)
+        self.right_layout.addWidget(self.profile_save_button)
+        # Запись кадров камеры в файл и воспроизведение записи вместо камеры
+        self.record_button = QPushButton("Записать видео")
+        self.record_button.clicked.connect(self.toggle_recording)
+        self.right_layout.addWidget(self.record_button)
+        self.replay_button = QPushButton("Открыть запись")
+        self.replay_button.clicked.connect(self.toggle_replay)
+        self.right_layout.addWidget(self.replay_button)
+        self.replay_path = None  # Воспроизводимая запись; None - кадры идут с камеры
+        # Профиль теста: выбор сразу меняет сетку, ключ, номер ученика и критерии оценок
+        self.profile_label = QLabel("Профиль теста:")
+        self.profile_combo = QComboBox()
+        self.fill_profile_combo()
+        self.profile_combo.activated.connect(self.apply_profile)
+        self.save_exam_button = QPushButton("Сохранить профиль")
+        self.save_exam_button.clicked.connect(self.save_exam_profile)
+        self.right_layout.addWidget(self.profile_label)
+        self.right_layout.addWidget(self.profile_combo)
+        self.right_layout.addWidget(self.save_exam_button)
         # Поля ввода для количества вопросов и вариантов
         self.questions_label = QLabel("Количество вопросов:")
         self.questions_entry = QLineEdit(str(self.questions))
         self.choices_label = QLabel("Количество вариантов:")
         self.choices_entry = QLineEdit(str(self.choices))
+        # Номер ученика: повторная проверка его бланка по тому же тесту заменяет результат, а не добавляет работу
+        self.exam_label = QLabel("Название теста:")
+        self.exam_entry = QLineEdit(profile.name if self.template.path else "")
+        self.exam_entry.setPlaceholderText("по сетке и ключу ответов")
+        self.id_digits_label = QLabel("Цифр в номере ученика (0 - нет):")
+        self.id_digits_entry = QLineEdit(str(self.id_digits))
+        self.qr_checkbox = QCheckBox("Читать номер ученика из QR-кода")
+        self.qr_checkbox.setChecked(profile.qr)
+        self.qr_checkbox.toggled.connect(self.update_frame_settings)
         self.apply_button = QPushButton("Применить")
         self.update_button = QPushButton("Обновить")
         # Добавление элементов управления в макет
@@ -77,22 +154,35 @@ class OMRApp(QWidget):
         self.right_layout.addWidget(self.questions_entry)
         self.right_layout.addWidget(self.choices_label)
         self.right_layout.addWidget(self.choices_entry)
+        self.right_layout.addWidget(self.exam_label)
+        self.right_layout.addWidget(self.exam_entry)
+        self.right_layout.addWidget(self.id_digits_label)
+        self.right_layout.addWidget(self.id_digits_entry)
+        self.right_layout.addWidget(self.qr_checkbox)
         self.right_layout.addWidget(self.apply_button)
         self.right_layout.addWidget(self.update_button)
-        # Область для чекбоксов с прокруткой
-        self.scroll_area = QScrollArea()
-        self.scroll_widget = QWidget()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setWidget(self.scroll_widget)
-        self.right_layout.addWidget(self.scroll_area)
-        self.checkbox_layout = QGridLayout(self.scroll_widget)
-        self.create_checkboxes()
+        # Ключ ответов: таблица рисует только видимые строки, виджеты для клеток не создаются
+        self.key_editor = AnswerKeyEditor()
+        self.key_editor.set_grid(self.questions, self.choices, self.correct_answers)
+        self.right_layout.addWidget(self.key_editor)
         # Добавление панели в разделитель
         self.splitter.addWidget(self.right_widget)
-        # Таймер и состояние камеры
-        self.cap = None
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_video)
+        # Размер кадра больше не задает ширину левой части: свободное место отдается видео
+        self.splitter.setStretchFactor(0, 1)
+        # Накопление ответов по кадрам видео
+        self.stabilizer = AnswerStabilizer()
+        self.tracker = SheetTracker()  # Отслеживание углов бланка между кадрами
+        self.frame_buffers = FrameBufferPool()  # Буферы промежуточных изображений потока обработки
+        self.committed_record = None  # Запись отчета, автоматически добавленная для зафиксированного бланка
+        self.report_store = open_report_store()  # Хранилище результатов; при первом запуске переносит report.txt
+        self.update_frame_settings()
+        # Захват и обработка видео в фоновых потоках
+        # Без бланка в кадре обработка замедляется до частоты ожидания
+        self.pipeline = VideoPipeline(self.process_frame, self, detected=lambda frame_result: frame_result[1] is not None,
+                                      profiler=self.profiler)
+        self.pipeline.result_ready.connect(self.update_video)
+        self.pipeline.capture_failed.connect(self.result_label.setText)
+        self.pipeline.replay_finished.connect(self.replay_finished)
         self.is_paused = False
         self.paused_frame = None
         # Подключение сигналов
@@ -102,15 +192,55 @@ class OMRApp(QWidget):
         self.set_styles()
 
     def start_camera(self):
-        self.cap = cv2.VideoCapture(0)
-        self.cap.set(10, 160)
-        self.timer.start(10)
+        self.tracker.reset()
+        self.stabilizer.reset()
+        self.pipeline.start(self.replay_path if self.replay_path is not None else 0)
+        self.update_pipeline_state()
 
     def stop_camera(self):
-        self.timer.stop()
-        if self.cap is not None:
-            self.cap.release()
-        self.video_label.clear()
+        self.stop_recording()
+        self.pipeline.stop()
+        self.video_display.clear()
+        self.status_label.clear()
+
+    def toggle_recording(self):
+        """Начинает или останавливает запись кадров в файл (хранятся последние DEFAULT_CAPACITY кадров)"""
+        if self.pipeline.recorder is not None:
+            self.stop_recording()
+            return
+        path = os.path.join(RECORDINGS_DIR, time.strftime("session_%Y%m%d_%H%M%S") + RECORDING_EXTENSION)
+        self.pipeline.start_recording(path)
+        self.record_button.setText("Остановить запись")
+
+    def stop_recording(self):
+        recorder = self.pipeline.recorder
+        if recorder is None:
+            return
+        count = self.pipeline.stop_recording()
+        self.record_button.setText("Записать видео")
+        # Файл создается только с первым кадром
+        self.result_label.setText(f"Записано кадров: {count}, файл {recorder.path}" if count else "Кадры не записаны.")
+
+    def toggle_replay(self):
+        """Переключает источник кадров между камерой и файлом записи"""
+        if self.replay_path is not None:
+            self.replay_path = None
+            self.replay_button.setText("Открыть запись")
+            self.record_button.setEnabled(True)
+        else:
+            file_path, _ = QFileDialog.getOpenFileName(self, "Открыть запись", RECORDINGS_DIR,
+                                                       f"Записи кадров (*{RECORDING_EXTENSION})")
+            if not file_path:
+                return
+            self.stop_recording()  # Запись воспроизведения самой себя не нужна
+            self.replay_path = file_path
+            self.replay_button.setText("Вернуться к камере")
+            self.record_button.setEnabled(False)
+        self.start_camera()
+
+    def replay_finished(self):
+        # Последний обработанный кадр остается на экране
+        self.result_label.setText(self.result_label.text() + " (запись закончилась)")
 
     def go_back(self):
         self.stop_camera()
@@ -119,58 +249,74 @@ class OMRApp(QWidget):
     def toggle_pause_video(self):
         """Переключение состояния паузы видеопотока."""
         if self.is_paused:
-            self.timer.start(10)
             self.capture_button.setText("Создать стоп-кадр")
             self.report_button.setEnabled(False)
         else:
-            self.timer.stop()
             self.capture_button.setText("Продолжить видео")
-            success, frame = self.cap.read()
-            if success:
+            frame = self.pipeline.latest_frame()  # Последний кадр, захваченный фоновым потоком
+            if frame is not None:
                 self.paused_frame = frame
                 self.report_button.setEnabled(True)  # Активируем кнопку "Добавить в отчет"
         self.is_paused = not self.is_paused
+        self.update_pipeline_state()
 
     def save_report(self):
-        """Добавляет новый отчет о результатах теста в конец файла report.txt, с последовательной нумерацией."""
+        """Добавляет результат проверки стоп-кадра в отчет с последовательной нумерацией."""
         if self.paused_frame is None:
             QMessageBox.warning(self, "Ошибка", "Стоп-кадр не создан.")
             return
         try:
+            if self.multi_sheet_checkbox.isChecked():
+                # Все бланки стоп-кадра добавляются в порядке их номеров на экране
+                results = grade_identified_sheets(self.paused_frame, self.questions, self.choices, self.correct_answers,
+                                                  self.image_size, detect_size=self.detect_size,
+                                                  id_digits=self.id_digits, qr=self.qr_checkbox.isChecked())
+                works = ", ".join(describe_record(self.append_report(result)) for result in results)
+                QMessageBox.information(self, "Отчет", f"Добавлено бланков: {len(results)}: {works}.")
+                return
             # Обрабатываем стоп-кадр и получаем результаты
-            imgFinal, correct_answers, score = process_video_frame(
+            # Для отчета нужен только подсчет результата, без отрисовки
+            result = grade_sheet(
                 self.paused_frame,
                 self.questions,
                 self.choices,
                 self.correct_answers,
-                self.image_size
+                self.image_size,
+                detect_size=self.detect_size
             )
-            incorrect_answers = self.questions - correct_answers
-            # Подготавливаем текст для нового отчета
-            new_report_text = (
-                f"Всего вопросов: {self.questions}\n"
-                f"Правильных ответов: {correct_answers}\n"
-                f"Неправильных ответов: {incorrect_answers}\n"
-                f"Процент выполнения: {score:.2f}%\n\n"
-            )
-            # Определяем номер следующей работы
-            file_path = "report.txt"
-            work_number = 1
-            # Если файл существует, подсчитываем количество "Работа N" и увеличиваем счетчик
-            if os.path.exists(file_path):
-                with open(file_path, "r", encoding="utf-8") as file:
-                    content = file.read()
-                work_number = content.count("Работа") + 1
-            # Добавляем заголовок для новой записи
-            new_report_text = f"Работа {work_number}\n" + new_report_text
-            # Добавляем новый отчет в конец файла
-            with open(file_path, "a", encoding="utf-8") as file:
-                file.write(new_report_text)
-            QMessageBox.information(self, "Отчет",
-                                   f"Отчет успешно добавлен в файл report.txt как 'Работа {work_number}'.")
+            self.identify(self.paused_frame, result, self.frame_settings)
+            record = self.append_report(result)
+            QMessageBox.information(self, "Отчет", f"Отчет успешно добавлен как {describe_record(record)}.")
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить отчет: {e}")
 
+    def append_report(self, result, correct_answers=None):
+        """Дописывает результат в хранилище отчета и возвращает запись.
+
+        Бланк с прочитанным номером ученика заменяет его прежний результат по тому же тесту.
+        correct_answers - ключ, по которому проверен бланк (по умолчанию текущий).
+        """
+        if correct_answers is None:
+            correct_answers = self.correct_answers
+        # Номер работы определяется по последней записи, файл отчета не перечитывается
+        return self.report_store.upsert(self.exam(), result.student, len(result.index), result.correct, result.score,
+                                        result.index, list(correct_answers))
+
+    def exam(self):
+        """Название теста для отчета: введенное или построенное по сетке и ключу ответов."""
+        return self.exam_entry.text().strip() or exam_name(self.questions, self.choices, self.correct_answers)
+
+    def identify(self, img, result, settings):
+        """Читает номер ученика для бланка result (один раз на бланк, а не на каждом кадре)."""
+        with profile_stage(self.profiler, "identify"):
+            result.student = identify_sheets(img, [result], settings.id_digits, settings.qr)[0]
+
+    def update_frame_settings(self):
+        """Собирает снимок настроек для потока обработки; вызывается в потоке интерфейса при каждом их изменении."""
+        self.frame_settings = FrameSettings(self.questions, self.choices, tuple(self.correct_answers), self.image_size,
+                                            self.detect_size, self.id_digits, self.qr_checkbox.isChecked(),
+                                            self.multi_sheet_checkbox.isChecked())
+
     def apply_settings(self):
         try:
             questions = int(self.questions_entry.text())
@@ -181,7 +327,14 @@ class OMRApp(QWidget):
             if choices <= 0:
                 raise ValueError("Количество вариантов должно быть положительным целым числом.")
             self.choices = choices
-            self.create_checkboxes()
+            id_digits = int(self.id_digits_entry.text() or 0)
+            if id_digits < 0:
+                raise ValueError("Количество цифр в номере ученика не может быть отрицательным.")
+            self.id_digits = id_digits
+            clear_geometry_cache()  # Геометрия сетки для старых настроек больше не нужна
+            self.update_frame_settings()
+            self.stabilizer.reset()
+            self.key_editor.set_grid(self.questions, self.choices, self.correct_answers)
         except ValueError as e:
             QMessageBox.critical(self, "Ошибка ввода", str(e))
 
@@ -192,40 +345,28 @@ class OMRApp(QWidget):
             return
         try:
             # Обрабатываем стоп-кадр и получаем результаты
-            imgFinal, correct_answers, score = process_video_frame(
+            # Для отчета нужен только подсчет результата, без отрисовки
+            result = grade_sheet(
                 self.paused_frame,
                 self.questions,
                 self.choices,
                 self.correct_answers,
-                self.image_size
-            )
-            incorrect_answers = self.questions - correct_answers
-            # Подготавливаем текст для нового отчета
-            work_number = self.main_window.report_screen.report_text.toPlainText().count("Работа") + 1
-            new_report_text = (
-                f"Работа {work_number}\n"
-                f"Всего вопросов: {self.questions}\n"
-                f"Правильных ответов: {correct_answers}\n"
-                f"Неправильных ответов: {incorrect_answers}\n"
-                f"Процент выполнения: {score:.2f}%\n\n"
+                self.image_size,
+                detect_size=self.detect_size
             )
-            # Добавляем новый отчет в текстовое поле отчета
-            current_content = self.main_window.report_screen.report_text.toPlainText()
-            updated_content = current_content + new_report_text
-            self.main_window.report_screen.load_report(updated_content)
-            QMessageBox.information(self, "Отчет", f"Отчет успешно добавлен как 'Работа {work_number}'.")
+            self.identify(self.paused_frame, result, self.frame_settings)
+            record = self.append_report(result)
+            if self.main_window.report_screen is not None:
+                self.main_window.report_screen.load_report()  # Экран отчета показывает новую работу; еще не созданный экран загрузит ее сам
+            QMessageBox.information(self, "Отчет", f"Отчет успешно добавлен как {describe_record(record)}.")
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить отчет: {e}")
 
     def update_correct_answers(self):
         try:
-            self.correct_answers = []
-            for i, row_vars in enumerate(self.checkbox_vars):
-                selected = [j for j, var in enumerate(row_vars) if var.isChecked()]
-                if len(selected) == 1:
-                    self.correct_answers.append(selected[0])
-                else:
-                    raise ValueError(f"Вопрос {i + 1} должен иметь ровно один правильный ответ.")
+            self.correct_answers = self.key_editor.answers()
+            self.update_frame_settings()
+            self.stabilizer.reset()
             QMessageBox.information(self, "Успех", "Настройки успешно обновлены!")
             if self.paused_frame is not None:
                 self.analyze_paused_frame()
@@ -235,41 +376,158 @@ class OMRApp(QWidget):
     def analyze_paused_frame(self):
         if self.paused_frame is not None:
             imgFinal, correct_answers, score = process_video_frame(self.paused_frame, self.questions, self.choices, self.correct_answers, self.image_size)
-            imgRGB = cv2.cvtColor(imgFinal, cv2.COLOR_BGR2RGB)
-            h, w, ch = imgRGB.shape
-            bytes_per_line = ch * w
-            convert_to_Qt_format = QImage(imgRGB.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.video_label.setPixmap(QPixmap.fromImage(convert_to_Qt_format))
-            self.result_label.setText(f"Результат: {correct_answers}/{self.questions}, {score:.2f}%")
-
-    def update_video(self):
+            self.video_display.show(imgFinal)
+            self.result_label.setText(f"Результат: {correct_answers}/{self.questions}, {score:.2f}%, "
+                                      f"оценка {self.template.grade(score)}")
+
+    def process_frame(self, img):
+        """Обрабатывает кадр в фоновом потоке и готовит изображение для показа.
+
+        Настройки берутся только из снимка frame_settings: поля и флажки окна меняет поток интерфейса.
+        """
+        settings = self.frame_settings
+        if settings.multi_sheet:
+            return self.process_sheets(img, settings)
+        try:
+            imgFinal, result, committed = grade_stable_frame(
+                img, self.stabilizer, settings.questions, settings.choices, settings.correct_answers,
+                settings.image_size, self.tracker, settings.detect_size, self.frame_buffers, self.profiler)
+        except Exception as e:
+            print(f"Ошибка: {e}")
+            imgFinal, result, committed = cv2.resize(img, (settings.image_size, settings.image_size)), None, False
+        if committed and settings.identifies:
+            # Кадр фиксации ответов: номер читается с него же; без номера результат все равно попадает в отчет
+            try:
+                self.identify(img, result, settings)
+            except Exception as e:
+                print(f"Ошибка чтения номера ученика: {e}")
+        if self.profiler.enabled and self.profiler.overlay:
+            # Сводка рисуется на копии: зафиксированное изображение бланка используется повторно
+            imgFinal = self.profiler.draw_overlay(imgFinal.copy())
+        # Изображение остается в BGR: перевод в RGB не нужен, QImage принимает порядок каналов OpenCV
+        return imgFinal, result, settings, committed, self.stabilizer.locked
+
+    def toggle_multi_sheet(self, enabled):
+        self.update_frame_settings()
+        # Накопленные ответы одного бланка после смены режима не действительны
+        self.stabilizer.reset()
+        self.tracker.reset()
+
+    def process_sheets(self, img, settings):
+        """Проверяет все бланки кадра; результатом вместо одного бланка служит их список."""
+        try:
+            # Блоки номера ученика на видео не проверяются как бланки, а сам номер читается только со стоп-кадра
+            results = grade_sheets(img, settings.questions, settings.choices, settings.correct_answers,
+                                   settings.image_size, settings.detect_size, self.frame_buffers, self.profiler,
+                                   skip=id_block_filter(settings.id_digits))
+            imgFinal = render_sheets_overlay(img, results, settings.correct_answers, self.profiler)
+        except SheetNotFoundError:
+            imgFinal, results = img, None
+        except ValueError as e:
+            print(f"Ошибка: {e}")  # Ключ короче, чем вопросов в настройках
+            imgFinal, results = img, None
+        if self.profiler.enabled and self.profiler.overlay:
+            imgFinal = self.profiler.draw_overlay(imgFinal.copy())
+        return imgFinal, results, settings, False, False
+
+    def update_video(self, frame_result):
+        """Показывает результат обработки; вызывается в потоке интерфейса."""
+        imgFinal, result, settings, committed, locked = frame_result
+        questions = settings.questions
+        if committed:
+            self.committed_record = None
+            if self.auto_report_checkbox.isChecked():
+                try:
+                    # В отчет идет ключ, по которому бланк проверен, даже если его успели сменить
+                    self.committed_record = self.append_report(result, settings.correct_answers)
+                except OSError as e:
+                    QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить отчет: {e}")
         if not self.video_label.isVisible():
             return
-        success, img = self.cap.read()
-        if success:
-            imgFinal, correct_answers, score = process_video_frame(img, self.questions, self.choices, self.correct_answers, self.image_size)
-            imgRGB = cv2.cvtColor(imgFinal, cv2.COLOR_BGR2RGB)
-            h, w, ch = imgRGB.shape
-            bytes_per_line = ch * w
-            convert_to_Qt_format = QImage(imgRGB.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.video_label.setPixmap(QPixmap.fromImage(convert_to_Qt_format))
-            self.result_label.setText(f"Результат: {correct_answers}/{self.questions}, {score:.2f}%")
-
-    def create_checkboxes(self):
-        while self.checkbox_layout.count():
-            child = self.checkbox_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-        self.checkbox_vars = []
-        for i in range(self.questions):
-            question_label = QLabel(f"Вопрос {i + 1}")
-            self.checkbox_layout.addWidget(question_label, i, 0)
-            row_vars = []
-            for j in range(self.choices):
-                var = QCheckBox()
-                self.checkbox_layout.addWidget(var, i, j + 1)
-                row_vars.append(var)
-            self.checkbox_vars.append(row_vars)
+        # Зафиксированный бланк приходит тем же изображением, поэтому повторно не перерисовывается
+        with profile_stage(self.profiler, "display"):
+            self.video_display.show(imgFinal)
+        self.status_label.setText(self.pipeline.status_text())
+        if result is None:
+            self.result_label.setText(f"Результат: 0/{questions}, 0.00%")
+            return
+        if isinstance(result, list):
+            scores = ", ".join(f"{number}: {sheet.correct}/{questions}" for number, sheet in enumerate(result, 1))
+            self.result_label.setText(f"Бланков: {len(result)} ({scores})")
+            return
+        status = ""
+        if locked:
+            status = " (зафиксирован)"
+            if self.committed_record is not None:
+                status = f" (добавлен в отчет как {describe_record(self.committed_record)})"
+        self.result_label.setText(f"Результат: {result.correct}/{questions}, {result.score:.2f}%, "
+                                  f"оценка {self.template.grade(result.score)}{status}")
+
+    def toggle_profiling(self, enabled):
+        """Включает замер этапов; при каждом включении замеры начинаются заново"""
+        self.profiler.reset()
+        self.profiler.enabled = enabled
+        self.profile_overlay_checkbox.setEnabled(enabled)
+        self.profile_save_button.setEnabled(enabled)
+
+    def toggle_profile_overlay(self, enabled):
+        self.profiler.overlay = enabled
+
+    def save_profile(self):
+        """Сохраняет перцентили времени этапов в CSV или JSON"""
+        file_path, _ = QFileDialog.getSaveFileName(self, "Сохранить замеры", "profile.csv", "CSV (*.csv);;JSON (*.json)")
+        if file_path:
+            try:
+                self.profiler.dump(file_path)
+            except OSError as e:
+                QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить замеры: {e}")
+
+    def update_pipeline_state(self):
+        """Обработка кадров не нужна на паузе и при скрытом видео."""
+        self.pipeline.set_paused(self.is_paused or self.video_label.isHidden())
+
+    def fill_profile_combo(self):
+        self.profile_combo.clear()
+        for template in self.templates:
+            self.profile_combo.addItem(template.name)
+        self.profile_combo.setCurrentIndex(self.templates.index(self.template))
+
+    def apply_profile(self, index):
+        """Переключает проверку на профиль из списка; шаблон уже готов, файлы не перечитываются."""
+        self.template = self.templates[index]
+        profile = self.template.profile
+        self.questions, self.choices = profile.questions, profile.choices
+        self.correct_answers = list(profile.answers)
+        self.image_size = profile.image_size
+        self.id_digits = profile.id_digits
+        self.questions_entry.setText(str(self.questions))
+        self.choices_entry.setText(str(self.choices))
+        self.exam_entry.setText(profile.name if self.template.path else "")
+        self.id_digits_entry.setText(str(self.id_digits))
+        self.qr_checkbox.setChecked(profile.qr)
+        self.key_editor.set_grid(self.questions, self.choices, self.correct_answers)
+        self.update_frame_settings()
+        # Ответы, накопленные по старому ключу и сетке, не действительны
+        self.stabilizer.reset()
+        self.tracker.reset()
+        if self.paused_frame is not None:
+            self.analyze_paused_frame()
+
+    def save_exam_profile(self):
+        """Сохраняет текущие сетку, ключ и настройки номера ученика как профиль с названием теста."""
+        try:
+            profile = ExamProfile(self.exam(), self.questions, self.choices, tuple(self.key_editor.answers()),
+                                  self.template.profile.criteria, self.image_size, self.id_digits,
+                                  self.qr_checkbox.isChecked())
+            template = save_profile(profile)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить профиль: {e}")
+            return
+        self.templates = list_templates() or [template]
+        self.template = next((item for item in self.templates if item.path == template.path), template)
+        self.fill_profile_combo()
+        self.apply_profile(self.templates.index(self.template))
+        QMessageBox.information(self, "Профиль", f"Профиль \"{profile.name}\" сохранен: {template.path}")
 
     def toggle_control_panel(self):
         if self.right_widget.isVisible():
@@ -292,6 +550,7 @@ class OMRApp(QWidget):
         else:
             self.video_label.show()
             self.toggle_video_button.setText("Скрыть видео")
+        self.update_pipeline_state()
 
     def set_styles(self):
         # Здесь добавляем стили через QSS
@@ -336,10 +595,10 @@ class OMRApp(QWidget):
                 font-size: 16px;
                 margin: 10px;
             }
-            QScrollArea {
-                background-color: #f9f9f9;
+            QTableView {
                 border: 1px solid #ddd;
                 border-radius: 8px;
+                gridline-color: #4C566A;
             }
             QSplitter::handle {
                 background-color: #f2dada;
@@ -0,0 +1,178 @@
+import bisect
+
+import numpy as np
+
+from scoring import GRADES, GradeScale, item_statistics
+
+# Количество интервалов гистограммы процентов выполнения (по 10%)
+HISTOGRAM_BINS = 10
+
+
+class ReportAggregates:
+    """Сводные показатели отчета, которые обновляются по мере добавления работ.
+
+    Новая работа обновляет количество оценок, сумму и отсортированный список процентов (для медианы)
+    и гистограмму за время, не зависящее от числа уже учтенных работ. Все оценки пересчитываются
+    только при изменении критериев.
+    """
+
+    def __init__(self, scale=None):
+        self.scale = scale or GradeScale()  # Критерии оценок
+        self.reset()
+
+    def reset(self):
+        self.count = 0  # Сколько работ учтено
+        self.scores = []  # Проценты выполнения в порядке работ
+        self.grades = []  # Оценки в порядке работ
+        self.grade_counts = {grade: 0 for grade in GRADES + (1,)}
+        self.histogram = np.zeros(HISTOGRAM_BINS, np.int64)
+        self.total = 0.0
+        self._sorted = []  # Проценты по возрастанию для медианы
+        # Работы добавляются по порядку проверки, поэтому работы одного дня идут подряд:
+        # для каждого дня хватает даты и номера его первой работы
+        self.days = []  # Даты "ГГГГ-ММ-ДД"; None для работ без времени проверки (импорт из report.txt)
+        self.day_starts = []  # Индекс первой работы каждого дня
+        # Работы разных тестов (классов) перемешаны, поэтому для каждой работы хранится номер ее теста
+        self.exams = []  # Названия тестов в порядке первой работы; None - тест без названия
+        self.work_exams = []  # Номер теста в exams для каждой работы
+        self._exam_ids = {}
+        # Ответы по тестам для показателей вопросов: тест -> {номер работы: ответы}; ключ - последний по тесту
+        self.exam_answers = {}
+        self.exam_keys = {}
+        self.last_exam = None
+
+    def grade(self, score):
+        """Оценка за процент выполнения по текущим критериям."""
+        return self.scale.grade(score)
+
+    def add(self, records):
+        """Учитывает новые записи и возвращает их оценки.
+
+        Запись с полем "replaces" (повторная проверка ученика) заменяет результат прежней работы на ее месте:
+        количество работ не меняется, а работа остается в дне первой проверки.
+        """
+        grades = []
+        for record in records:
+            score = record["score"]
+            grade = self.grade(score)
+            grades.append(grade)
+            if record.get("answers") is not None and record.get("key") is not None:
+                exam = record.get("exam")
+                self.exam_answers.setdefault(exam, {})[record["work"]] = record["answers"]
+                self.exam_keys[exam] = record["key"]
+                self.last_exam = exam
+            if record.get("replaces"):
+                self._replace(record["replaces"] - 1, score, grade)
+                continue
+            self.scores.append(score)
+            self.grades.append(grade)
+            self.grade_counts[grade] += 1
+            self.histogram[_histogram_bin(score)] += 1
+            self.total += score
+            bisect.insort(self._sorted, score)
+            exam_id = self._exam_ids.get(record.get("exam"))
+            if exam_id is None:
+                exam_id = self._exam_ids[record.get("exam")] = len(self.exams)
+                self.exams.append(record.get("exam"))
+            self.work_exams.append(exam_id)
+            day = record["timestamp"][:10] if record.get("timestamp") else None
+            if not self.days or self.days[-1] != day:
+                self.days.append(day)
+                self.day_starts.append(self.count)
+            self.count += 1
+        return grades
+
+    def _replace(self, index, score, grade):
+        old_score, old_grade = self.scores[index], self.grades[index]
+        self.grade_counts[old_grade] -= 1
+        self.histogram[_histogram_bin(old_score)] -= 1
+        self.total -= old_score
+        del self._sorted[bisect.bisect_left(self._sorted, old_score)]
+        self.scores[index], self.grades[index] = score, grade
+        self.grade_counts[grade] += 1
+        self.histogram[_histogram_bin(score)] += 1
+        self.total += score
+        bisect.insort(self._sorted, score)
+
+    def set_scale(self, scale):
+        """Меняет критерии и пересчитывает оценки всех работ. Возвращает True, если критерии изменились."""
+        if scale == self.scale:
+            return False
+        self.scale = scale
+        grades = scale.grades(self.scores)  # Все работы одним бинарным поиском
+        self.grades = grades.tolist()
+        counts = np.bincount(grades, minlength=max(GRADES) + 1)
+        self.grade_counts = {grade: int(counts[grade]) for grade in GRADES + (1,)}
+        return True
+
+    def item_statistics(self, exam):
+        """Показатели вопросов теста exam по последнему ключу этого теста. Возвращает (работ, ItemStatistics)."""
+        key = self.exam_keys[exam]
+        rows = [answers for answers in self.exam_answers[exam].values() if len(answers) == len(key)]
+        return len(rows), item_statistics(np.array(rows, np.intp).reshape(len(rows), len(key)), key)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def median(self):
+        if not self._sorted:
+            return 0.0
+        middle = len(self._sorted) // 2
+        if len(self._sorted) % 2:
+            return self._sorted[middle]
+        return (self._sorted[middle - 1] + self._sorted[middle]) / 2
+
+    def daily_grades(self):
+        """Средняя, минимальная и максимальная оценка за каждый день.
+
+        Оценки по дням не хранятся, а считаются заново по границам дней: после изменения критериев
+        пересчитывать нечего.
+        """
+        grades = np.asarray(self.grades, np.float64)
+        starts = np.asarray(self.day_starts, np.intp)
+        if not len(grades):
+            return [], grades, grades, grades
+        counts = np.diff(np.append(starts, len(grades)))
+        mean = np.add.reduceat(grades, starts) / counts
+        return self.days, mean, np.minimum.reduceat(grades, starts), np.maximum.reduceat(grades, starts)
+
+    def exam_grades(self):
+        """Средняя, минимальная и максимальная оценка по каждому тесту (классу), как daily_grades для дней."""
+        grades = np.asarray(self.grades, np.float64)
+        exams = np.asarray(self.work_exams, np.intp)
+        if not len(grades):
+            return [], grades, grades, grades
+        # Работы упорядочиваются по тесту, после чего тесты, как и дни, становятся непрерывными участками
+        order = np.argsort(exams, kind="stable")
+        counts = np.bincount(exams, minlength=len(self.exams))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        grades = grades[order]
+        mean = np.add.reduceat(grades, starts) / counts
+        return self.exams, mean, np.minimum.reduceat(grades, starts), np.maximum.reduceat(grades, starts)
+
+
+def decimate_minmax(values, buckets):
+    """Прореживает ряд для графика, сохраняя минимум и максимум каждого из buckets интервалов.
+
+    Возвращает индексы оставленных точек по возрастанию и их значения: не больше 2 * buckets точек,
+    причем ни один выброс не теряется. Короткий ряд возвращается целиком.
+    """
+    values = np.asarray(values)
+    if len(values) <= 2 * buckets:
+        return np.arange(len(values)), values
+    starts = np.linspace(0, len(values), buckets, endpoint=False).astype(np.intp)
+    bucket = np.repeat(np.arange(buckets), np.diff(np.append(starts, len(values))))
+    # Первая точка каждого интервала, равная его минимуму (максимуму)
+    lows = np.flatnonzero(values == np.minimum.reduceat(values, starts)[bucket])
+    highs = np.flatnonzero(values == np.maximum.reduceat(values, starts)[bucket])
+    lows = lows[np.unique(bucket[lows], return_index=True)[1]]
+    highs = highs[np.unique(bucket[highs], return_index=True)[1]]
+    indices = np.union1d(lows, highs)
+    return indices, values[indices]
+
+
+def _histogram_bin(score):
+    # 100% попадает в последний интервал 90-100%
+    return min(max(int(score // (100 / HISTOGRAM_BINS)), 0), HISTOGRAM_BINS - 1)
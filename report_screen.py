@@ -1,25 +1,50 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QTextEdit, QPushButton, QHBoxLayout, QLineEdit, QGraphicsView, QGraphicsScene
-from PySide6.QtGui import QImage, QPixmap
-from PySide6.QtCore import Qt
-import os
-import matplotlib.pyplot as plt
-from PySide6.QtGui import QPainter, QColor
-import re
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QTextEdit, QPushButton, QHBoxLayout, QLineEdit
+from PySide6.QtGui import QTextCursor
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+from matplotlib.ticker import MaxNLocator, ScalarFormatter
+from report_store import open_report_store, format_record, merge_records, TEXT_REPORT_PATH
+from report_aggregates import ReportAggregates, HISTOGRAM_BINS, decimate_minmax
+from scoring import parse_criteria, suspicious_items
+
+# До этого количества работ диаграммы показывают каждую работу отдельно. Для большего отчета диаграмма
+# процентов заменяется гистограммой, а график оценок - средними по тестам, по дням или прореженным рядом,
+# поэтому время отрисовки не растет с размером отчета
+CHART_DETAIL_LIMIT = 50
+# Наибольшее количество подписей на оси работ или дней
+CHART_TICKS = 10
+BAR_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
+# Сколько самых трудных вопросов теста показывать в сводке
+HARDEST_QUESTIONS = 3
 
 class ReportScreen(QWidget):
-    def __init__(self, main_window):
+    def __init__(self, main_window, chart_detail_limit=CHART_DETAIL_LIMIT):
         super().__init__()
         self.main_window = main_window
+        self.chart_detail_limit = chart_detail_limit  # Сколько работ показывать на диаграммах поштучно
         self.layout = QHBoxLayout(self)  # Основной горизонтальный layout
         # Левый вертикальный layout для диаграммы и графика
         self.chart_layout = QVBoxLayout()
         self.layout.addLayout(self.chart_layout)
-        # QLabel для диаграммы
-        self.chart_view = QLabel()
+        # Холсты диаграммы и графика оценок создаются один раз, при обновлении меняются только данные.
+        # Поля задаются заранее: автоматическая компоновка измеряла бы все подписи при каждой перерисовке
+        self.chart_figure = Figure(figsize=(6, 4))
+        self.chart_figure.subplots_adjust(left=0.12, right=0.97, top=0.9, bottom=0.18)
+        self.chart_view = FigureCanvasQTAgg(self.chart_figure)
         self.chart_layout.addWidget(self.chart_view)
-        # QLabel для графика оценок
-        self.grade_chart_view = QLabel()
+        self.chart_axes = self.chart_figure.add_subplot()
+        self.chart_bars = None
+        self.grade_figure = Figure(figsize=(6, 4))
+        self.grade_figure.subplots_adjust(left=0.12, right=0.97, top=0.9, bottom=0.18)
+        self.grade_chart_view = FigureCanvasQTAgg(self.grade_figure)
         self.chart_layout.addWidget(self.grade_chart_view)
+        self.grade_axes = self.grade_figure.add_subplot()
+        self.grade_axes.set_ylabel("Оценка")
+        self.grade_axes.tick_params(axis="x", labelrotation=45)
+        self.grade_axes.grid(True)
+        self.grade_line, = self.grade_axes.plot([], [], marker='o', linestyle='-', color='#1f77b4', markersize=8)
+        self.grade_band = None  # Разброс оценок за день: от худшей до лучшей
         # Правый вертикальный layout для отчета, кнопок и критериев
         self.right_layout = QVBoxLayout()
         self.layout.addLayout(self.right_layout)
@@ -30,6 +55,15 @@ class ReportScreen(QWidget):
         self.clear_button = self.create_button("Очистить")
         self.clear_button.clicked.connect(self.clear_report)
         self.right_layout.addWidget(self.clear_button)
+        # Кнопка "Экспорт в TXT" сохраняет отчет в прежнем формате report.txt
+        self.export_button = self.create_button("Экспорт в TXT")
+        self.export_button.clicked.connect(self.export_report)
+        self.right_layout.addWidget(self.export_button)
+        # Сводка по всем работам: количество, средний процент, медиана и распределение оценок
+        self.summary_label = QLabel()
+        self.summary_label.setWordWrap(True)
+        self.summary_label.setFixedWidth(300)
+        self.right_layout.addWidget(self.summary_label)
         # Текстовое поле для отчета
         self.report_text = QTextEdit()
         self.report_text.setReadOnly(True)
@@ -52,6 +86,12 @@ class ReportScreen(QWidget):
         self.update_button = self.create_button("Обновить")
         self.update_button.clicked.connect(self.update_report)
         self.criteria_layout.addWidget(self.update_button)
+        # Хранилище результатов; при первом запуске в него переносится report.txt
+        self.report_store = open_report_store()
+        # Уже прочитанные работы и сводные показатели по ним; из хранилища читаются только новые записи
+        self.records = []
+        self.records_read = 0  # Прочитано записей хранилища; повторные проверки учеников работ не добавляют
+        self.aggregates = ReportAggregates()
         # Загрузка отчета при инициализации
         self.load_report()
 
@@ -63,123 +103,191 @@ class ReportScreen(QWidget):
         return button
 
     def load_report(self):
-        """Загружает отчет из файла 'report.txt' и генерирует диаграмму"""
-        file_path = "report.txt"
-        report_content = ""
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as file:
-                report_content = file.read()
-            self.report_text.setText(report_content)
-            self.generate_chart(report_content)  # Генерация диаграммы выполнения
-            self.generate_grade_chart(report_content)  # Генерация графика оценок
-        else:
-            self.report_text.setText("Отчет не найден.")
+        """Загружает работы из хранилища отчета и генерирует диаграммы с учетом текущих критериев"""
+        if len(self.report_store) == 0:
+            self.reset_report("Отчет не найден.")
+            return
+        self.update_report()
 
     def clear_report(self):
-        """Очищает содержимое файла report.txt и обновляет интерфейс"""
-        file_path = "report.txt"
-        if os.path.exists(file_path):
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.write('')
-            self.report_text.setText('Отчет очищен.')
-            self.chart_view.clear()
-            self.grade_chart_view.clear()
-        else:
-            self.report_text.setText("Отчет не найден.")
+        """Очищает хранилище отчета и обновляет интерфейс"""
+        self.report_store.clear()
+        self.reset_report('Отчет очищен.')
+
+    def reset_report(self, message):
+        self.records = []
+        self.records_read = 0
+        self.aggregates.reset()
+        self.report_text.setText(message)
+        self.summary_label.clear()
+        self.generate_chart()
+        self.generate_grade_chart()
+
+    def export_report(self):
+        """Сохраняет отчет в текстовый файл report.txt"""
+        try:
+            self.report_store.export_text(TEXT_REPORT_PATH)
+            self.report_text.append(f"Отчет сохранен в файл {TEXT_REPORT_PATH}.")
+        except OSError as e:
+            self.report_text.setText(f"Ошибка: {str(e)}")
 
     def update_report(self):
-        """Обновляет отчет и отображаемые графики с учетом введенных критериев"""
+        """Обновляет отчет и отображаемые графики с учетом введенных критериев.
+
+        Из хранилища читаются только работы, добавленные после прошлого обновления; оценки всех работ
+        пересчитываются, только если изменились критерии.
+        """
         try:
-            criteria_5 = self.input_5.text()
-            criteria_4 = self.input_4.text()
-            criteria_3 = self.input_3.text()
-            criteria_2 = self.input_2.text()
-            report_content = self.generate_report(criteria_5, criteria_4, criteria_3, criteria_2)
-            self.report_text.setText(report_content)
-            self.generate_chart(report_content)
-            self.generate_grade_chart(report_content)
+            if len(self.report_store) < self.records_read:
+                # Хранилище очищено в другом месте: учитываем работы заново
+                self.records = []
+                self.records_read = 0
+                self.aggregates.reset()
+            shown = len(self.records)
+            regraded = self.aggregates.set_scale(self.criteria_scale())
+            new_records = self.report_store.read(self.records_read)
+            self.records_read += len(new_records)
+            new_grades = self.aggregates.add(new_records)
+            replaced = merge_records(self.records, new_records)[1]
+            if not self.records:
+                self.reset_report("Отчет не найден.")
+                return
+            if regraded or shown == 0 or replaced:
+                # Повторная проверка ученика меняет работу в середине отчета: текст строится заново
+                self.report_text.setPlainText(self.generate_report(self.records, self.aggregates.grades))
+            elif new_records:
+                # Новые работы дописываются в конец текста без его полной перестройки
+                cursor = self.report_text.textCursor()
+                cursor.movePosition(QTextCursor.End)
+                cursor.insertText(self.generate_report(new_records, new_grades))
+            else:
+                return  # Ничего не изменилось
+            self.update_summary()
+            self.generate_chart()
+            self.generate_grade_chart()
         except Exception as e:
             self.report_text.setText(f"Ошибка: {str(e)}")
 
-    def generate_report(self, criteria_5, criteria_4, criteria_3, criteria_2):
-        """Генерирует текст отчета с учетом введенных критериев"""
-        file_path = "report.txt"
-        if not os.path.exists(file_path):
-            return "Отчет не найден."
-        with open(file_path, 'r', encoding='utf-8') as file:
-            report_content = file.read()
-        work_data = re.findall(r"Работа (\d+).*?Всего вопросов: (\d+).*?Правильных ответов: (\d+)", report_content, re.DOTALL)
-        updated_report = ""
-        for work in work_data:
-            work_number, total_questions, correct_answers = work
-            total_questions = int(total_questions)
-            correct_answers = int(correct_answers)
-            percentage = (correct_answers / total_questions) * 100
-            grade = self.grade_work(percentage, criteria_5, criteria_4, criteria_3, criteria_2)
-            updated_report += f"Работа {work_number}\n"
-            updated_report += f"Всего вопросов: {total_questions}\n"
-            updated_report += f"Правильных ответов: {correct_answers}\n"
-            updated_report += f"Процент выполнения: {percentage:.2f}%\n"
-            updated_report += f"Оценка: {grade}\n\n"
-        return updated_report
-
-    def grade_work(self, percentage, criteria_5, criteria_4, criteria_3, criteria_2):
-        """Оценивает работу в зависимости от процента и критериев"""
-        if percentage >= self.parse_percentage(criteria_5):
-            return "5"
-        elif percentage >= self.parse_percentage(criteria_4):
-            return "4"
-        elif percentage >= self.parse_percentage(criteria_3):
-            return "3"
-        elif percentage >= self.parse_percentage(criteria_2):
-            return "2"
+    def criteria_scale(self):
+        """Критерии оценок 5, 4, 3 и 2 из полей; поля разбираются один раз на обновление, а не для каждой работы"""
+        return parse_criteria(field.text() for field in (self.input_5, self.input_4, self.input_3, self.input_2))
+
+    def update_summary(self):
+        aggregates = self.aggregates
+        counts = ", ".join(f"«{grade}» - {aggregates.grade_counts[grade]}" for grade in (5, 4, 3, 2, 1))
+        self.summary_label.setText(
+            f"Работ: {aggregates.count}\n"
+            f"Средний процент: {aggregates.mean:.2f}%, медиана: {aggregates.median:.2f}%\n"
+            f"Оценки: {counts}"
+            f"{self.item_summary()}"
+        )
+
+    def item_summary(self):
+        """Самые трудные вопросы последнего проверенного теста и вопросы, похожие на ошибку в ключе"""
+        exam = self.aggregates.last_exam
+        if exam not in self.aggregates.exam_keys:
+            return ""  # Работы без сохраненных ответов и ключа (перенесенные из report.txt)
+        works, stats = self.aggregates.item_statistics(exam)
+        if not works:
+            return ""
+        hardest = np.argsort(stats.difficulty, kind="stable")[:HARDEST_QUESTIONS]
+        text = (f"\nТест «{exam or 'без названия'}», работ: {works}\n"
+                f"Труднее всего: " + ", ".join(f"{question + 1} ({stats.difficulty[question]:.0%} верно)"
+                                              for question in hardest))
+        suspicious = suspicious_items(stats)
+        if len(suspicious):
+            text += ("\nПроверьте ключ к вопросам " + ", ".join(str(question + 1) for question in suspicious) +
+                     ": на них чаще отвечают верно слабые ученики")
+        return text
+
+    def generate_report(self, records, grades):
+        """Генерирует текст отчета для работ с уже выставленными оценками"""
+        # Текст работы в прежнем формате, в конце добавляется оценка
+        return "".join(format_record(record)[:-1] + f"Оценка: {grade}\n\n" for record, grade in zip(records, grades))
+
+    def generate_chart(self):
+        """Обновляет диаграмму выполнения работ: по столбцу на работу или гистограмму для большого отчета"""
+        axes = self.chart_axes
+        if self.chart_bars is not None:
+            self.chart_bars.remove()
+        if self.aggregates.count <= self.chart_detail_limit:
+            axes.set_title("Процент выполнения каждой работы")
+            axes.set_xlabel("Работы")
+            axes.set_ylabel("Процент выполнения")
+            positions = np.arange(1, self.aggregates.count + 1)
+            self.chart_bars = axes.bar(positions, self.aggregates.scores, color=BAR_COLORS)
+            axes.set_xticks(positions, [str(position) for position in positions])
+            axes.tick_params(axis="x", labelrotation=45)
         else:
-            return "1"
+            # Гистограмма уже посчитана в сводных показателях: столбцов всегда HISTOGRAM_BINS
+            axes.set_title("Распределение процентов выполнения")
+            axes.set_xlabel("Процент выполнения")
+            axes.set_ylabel("Количество работ")
+            width = 100 // HISTOGRAM_BINS
+            positions = np.arange(HISTOGRAM_BINS)
+            self.chart_bars = axes.bar(positions, self.aggregates.histogram, color=BAR_COLORS)
+            labels = [f"{bin * width}-{bin * width + width - 1}%" for bin in positions]
+            labels[-1] = f"{(HISTOGRAM_BINS - 1) * width}-100%"
+            axes.set_xticks(positions, labels)
+            axes.tick_params(axis="x", labelrotation=0)  # Подписей всего HISTOGRAM_BINS, наклон не нужен
+        axes.relim()
+        axes.autoscale_view()
+        self.chart_view.draw_idle()  # Перерисовка произойдет один раз, когда интерфейс освободится
 
-    def parse_percentage(self, criteria_text):
-        """Парсит текстовый критерий и возвращает минимальный процент для оценки"""
-        try:
-            min_percentage = float(criteria_text.split("-")[0].strip().replace("%", ""))
-            return min_percentage
-        except ValueError:
-            return 0
-
-    def generate_chart(self, report_content):
-        """Генерирует и отображает диаграмму выполнения работ"""
-        percentages = [float(match) for match in re.findall(r"Процент выполнения: (\d+\.\d+)%", report_content)]
-        labels = [str(i + 1) for i in range(len(percentages))]
-        plt.figure(figsize=(6, 4))
-        plt.bar(labels, percentages, color=['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd'])
-        plt.xlabel("Работы")
-        plt.ylabel("Процент выполнения")
-        plt.title("Процент выполнения каждой работы")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig("chart.png")
-        plt.close()
-        self.display_image("chart.png", self.chart_view)
-
-    def generate_grade_chart(self, report_content):
-        """Генерирует и отображает график оценок по работам"""
-        grades = [int(match) for match in re.findall(r"Оценка: (\d)", report_content)]
-        labels = [str(i + 1) for i in range(len(grades))]
-        plt.figure(figsize=(6, 4))
-        plt.plot(labels, grades, marker='o', linestyle='-', color='#1f77b4', markersize=8)
-        plt.xlabel("Работы")
-        plt.ylabel("Оценка")
-        plt.title("Оценка по каждой работе")
-        plt.grid(True)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig("grade_chart.png")
-        plt.close()
-        self.display_image("grade_chart.png", self.grade_chart_view)
-
-    def display_image(self, filepath, label):
-        """Отображает изображение из файла в QLabel"""
-        pixmap = QPixmap(filepath)
-        label.setPixmap(pixmap)
-        label.setScaledContents(True)
+    def generate_grade_chart(self):
+        """Обновляет график оценок: по точке на работу или, для большого отчета, средние по тестам (классам),
+        средние по дням или прореженный ряд"""
+        axes = self.grade_axes
+        aggregates = self.aggregates
+        if self.grade_band is not None:
+            self.grade_band.remove()
+            self.grade_band = None
+        days = aggregates.days
+        exams = aggregates.exams
+        band = None
+        if aggregates.count <= self.chart_detail_limit:
+            axes.set_title("Оценка по каждой работе")
+            axes.set_xlabel("Работы")
+            positions = np.arange(1, aggregates.count + 1)
+            self.grade_line.set_data(positions, aggregates.grades)
+            self.grade_line.set_marker('o')
+            axes.set_xticks(positions, [str(position) for position in positions])
+        elif 1 < len(exams) <= self.chart_detail_limit:
+            # В отчете работы нескольких тестов (классов): средняя оценка по каждому и полоса от худшей до лучшей
+            axes.set_title("Средняя оценка по тестам")
+            axes.set_xlabel("Тесты")
+            exams, mean, low, high = aggregates.exam_grades()
+            band = self.show_groups(mean, low, high, [exam or "без названия" for exam in exams])
+        elif 1 < len(days) <= self.chart_detail_limit:
+            # Средняя оценка за день и полоса от худшей до лучшей оценки этого дня
+            axes.set_title("Средняя оценка по дням")
+            axes.set_xlabel("Дни")
+            days, mean, low, high = aggregates.daily_grades()
+            band = self.show_groups(mean, low, high, [day or "без даты" for day in days])
+        else:
+            # Работы за один день или дней слишком много: ряд прореживается, минимум и максимум каждого участка сохраняются
+            axes.set_title("Оценка по каждой работе (прорежено)")
+            axes.set_xlabel("Работы")
+            indices, grades = decimate_minmax(aggregates.grades, self.chart_detail_limit)
+            self.grade_line.set_data(indices + 1, grades)
+            self.grade_line.set_marker('')
+            axes.xaxis.set_major_locator(MaxNLocator(CHART_TICKS, integer=True))
+            axes.xaxis.set_major_formatter(ScalarFormatter())
+        axes.relim()
+        if band is not None:
+            # relim не учитывает полосу, поэтому она добавляется после: fill_between сам расширяет границы данных
+            self.grade_band = axes.fill_between(*band, color='#1f77b4', alpha=0.2, linewidth=0)
+        axes.autoscale_view()
+        self.grade_chart_view.draw_idle()
+
+    def show_groups(self, mean, low, high, names):
+        """Выводит на графике оценок средние по группам работ; возвращает данные полосы разброса"""
+        positions = np.arange(len(names))
+        self.grade_line.set_data(positions, mean)
+        self.grade_line.set_marker('o')
+        ticks = np.unique(np.linspace(0, len(names) - 1, min(len(names), CHART_TICKS)).round().astype(int))
+        self.grade_axes.set_xticks(ticks, [names[tick] for tick in ticks])
+        return positions, low, high
 
     def go_back(self):
         self.main_window.show_main_menu()
\ No newline at end of file
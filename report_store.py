@@ -0,0 +1,307 @@
+import contextlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: файл блокируется через msvcrt
+    fcntl = None
+    import msvcrt
+
+# Файлы хранилища результатов по умолчанию
+REPORT_PATH = "report.jsonl"
+# Прежний текстовый отчет, который импортируется при первом запуске
+TEXT_REPORT_PATH = "report.txt"
+# Размер одной записи индекса: смещение строки в файле данных (uint64)
+INDEX_ITEM = 8
+
+# Блокировка потоков процесса: экраны приложения пишут в одно хранилище. Между процессами (приложение
+# и пакетная проверка batch_grading --report) запись разделяет блокировка файла .lock рядом с отчетом
+_write_lock = threading.Lock()
+
+
+class ReportStore:
+    """Хранилище результатов проверки: по одной JSON-строке на запись и индекс смещений строк.
+
+    Добавление записи и номер следующей работы не зависят от размера отчета: запись дописывается в конец
+    файла, количество записей равно размеру индекса, деленному на 8, а количество работ хранится в последней
+    записи. Индекс позволяет читать записи начиная с любой, не разбирая файл целиком.
+
+    Файл только дописывается. Повторная проверка работы ученика (upsert) добавляет запись с номером его прежней
+    работы и полем "replaces"; читатели заменяют ею прежний результат (см. merge_records).
+    """
+
+    def __init__(self, path=REPORT_PATH):
+        self.path = path
+        self.index_path = os.path.splitext(path)[0] + ".idx"
+        # Отдельный файл: в Windows заблокированный участок нельзя перезаписать даже своему процессу, а индекс
+        # перезаписывается при восстановлении и очистке
+        self.lock_path = os.path.splitext(path)[0] + ".lock"
+        # Хеш-индекс (тест, ученик) -> номер работы строится при первом upsert и дальше только дополняется
+        self._students = {}
+        self._students_lines = 0  # Сколько записей файла учтено в _students
+
+    def __len__(self):
+        """Количество записей в отчете (вместе с повторными проверками)."""
+        try:
+            return os.path.getsize(self.index_path) // INDEX_ITEM
+        except OSError:
+            return 0
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def append(self, questions, correct, score, answers=None, exam=None, key=None):
+        """Добавляет результат новой работы и возвращает запись с присвоенным номером.
+
+        Ответы ученика answers и ключ key (варианты с 0) сохраняются, чтобы работы можно было проверить заново
+        и посчитать показатели вопросов (см. scoring).
+        """
+        with self._locked():
+            self._repair()
+            works = self._works() + 1
+            record = _new_record(works, works, questions, correct, score, answers, exam, None, key)
+            self._write([record])
+            return record
+
+    def upsert(self, exam, student, questions, correct, score, answers=None, key=None):
+        """Добавляет результат ученика по тесту exam или заменяет его прежний результат по этому тесту.
+
+        Повторное сканирование того же бланка не создает новую работу: запись получает номер прежней работы
+        и поле "replaces". Прежняя работа находится по хеш-индексу за O(1), файл читается только от места,
+        до которого индекс уже построен. Без номера ученика (student=None) работа просто добавляется.
+        """
+        if student is None:
+            return self.append(questions, correct, score, answers, exam, key)
+        with self._locked():
+            self._repair()
+            self._index_students()
+            pair = (exam, student)
+            works = self._works()
+            work = self._students.get(pair)
+            if work is None:
+                works += 1
+                record = _new_record(works, works, questions, correct, score, answers, exam, student, key)
+            else:
+                record = _new_record(work, works, questions, correct, score, answers, exam, student, key)
+                record["replaces"] = work
+            self._write([record])
+            self._students[pair] = record["work"]
+            self._students_lines += 1
+            return record
+
+    def find(self, exam, student):
+        """Номер работы ученика по тесту или None."""
+        with self._locked():
+            self._index_students()
+            return self._students.get((exam, student))
+
+    def read(self, start=0, stop=None):
+        """Возвращает записи с номерами из диапазона [start, stop) (нумерация с нуля)."""
+        count = len(self)
+        stop = count if stop is None else min(stop, count)
+        if start >= stop:
+            return []
+        begin = int(self._offsets(start, start + 1)[0])
+        end = int(self._offsets(stop, stop + 1)[0]) if stop < count else None  # Начало первой ненужной записи
+        with open(self.path, "rb") as file:
+            file.seek(begin)
+            data = file.read(-1 if end is None else end - begin)
+        return [json.loads(line) for line in data.splitlines()[:stop - start]]
+
+    def clear(self):
+        with self._locked():
+            for path in (self.path, self.index_path):
+                open(path, "wb").close()
+            self._students.clear()
+            self._students_lines = 0
+
+    def import_text(self, text_path=TEXT_REPORT_PATH):
+        """Однократно переносит работы из прежнего текстового отчета report.txt. Возвращает их количество."""
+        with open(text_path, "r", encoding="utf-8") as file:
+            content = file.read()
+        works = re.findall(r"Работа (\d+).*?Всего вопросов: (\d+).*?Правильных ответов: (\d+)", content, re.DOTALL)
+        with self._locked():
+            self._repair()
+            first = self._works() + 1
+            records = []
+            for number, (_, questions, correct) in enumerate(works, first):
+                questions, correct = int(questions), int(correct)
+                records.append({
+                    "work": number,
+                    "works": number,
+                    "questions": questions,
+                    "correct": correct,
+                    "incorrect": questions - correct,
+                    "score": round(correct / questions * 100, 2) if questions else 0.0,
+                    "timestamp": None,  # Время проверки в старом отчете не сохранялось
+                    "answers": None,
+                    "key": None,
+                })
+            self._write(records)
+        return len(records)
+
+    def export_text(self, text_path=TEXT_REPORT_PATH):
+        """Сохраняет отчет в прежнем текстовом формате; замененные результаты не выводятся."""
+        with open(text_path, "w", encoding="utf-8") as file:
+            file.write(format_records(merge_records([], self.read())[0]))
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Изменение хранилища: сначала блокировка потоков процесса, затем файла .lock для других процессов."""
+        with _write_lock, open(self.lock_path, "a+b") as file:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_EX)  # Снимается при закрытии файла
+                yield
+                return
+            # msvcrt ждет блокировку около 10 секунд, потом бросает OSError
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _works(self):
+        """Количество работ: хранится в последней записи, поэтому читается одна строка."""
+        count = len(self)
+        if not count:
+            return 0
+        last = self.read(count - 1)[0]
+        # Записи, сделанные до появления повторных проверок, не содержат "works": тогда работ столько же, сколько записей
+        return last.get("works", last["work"])
+
+    def _index_students(self):
+        """Дополняет хеш-индекс учеников записями, добавленными после прошлого обращения (в том числе другими
+        экземплярами хранилища)."""
+        count = len(self)
+        if count < self._students_lines:
+            # Отчет очищен или восстановлен после сбоя: индекс строится заново
+            self._students.clear()
+            self._students_lines = 0
+        for record in self.read(self._students_lines):
+            if record.get("student") is not None:
+                self._students[(record.get("exam"), record["student"])] = record["work"]
+        self._students_lines = count
+
+    def _write(self, records):
+        # Сначала данные, потом индекс: индекс никогда не указывает на недописанную строку
+        with open(self.path, "ab") as file:
+            offsets = []
+            for record in records:
+                offsets.append(file.tell())
+                file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        with open(self.index_path, "ab") as file:
+            file.write(np.asarray(offsets, np.uint64).tobytes())
+
+    def _offsets(self, start, stop):
+        with open(self.index_path, "rb") as file:
+            file.seek(start * INDEX_ITEM)
+            return np.frombuffer(file.read((stop - start) * INDEX_ITEM), np.uint64)
+
+    def _repair(self):
+        """Восстанавливает индекс, если он отстает от файла данных (например, после сбоя во время записи)."""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        count = len(self)
+        if count:
+            last = int(self._offsets(count - 1, count)[0])
+            with open(self.path, "rb") as file:
+                file.seek(last)
+                file.readline()
+                if file.tell() == size:
+                    return
+        elif size == 0:
+            return
+        # Индекс не совпадает с данными: строим его заново по строкам файла
+        offsets = []
+        position = valid = 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                if line.endswith(b"\n"):
+                    offsets.append(position)
+                    valid = position + len(line)
+                position += len(line)
+        with open(self.path, "r+b") as file:
+            file.truncate(valid)  # Недописанная последняя строка отбрасывается
+        with open(self.index_path, "wb") as file:
+            file.write(np.asarray(offsets, np.uint64).tobytes())
+
+
+def _new_record(work, works, questions, correct, score, answers, exam, student, key=None):
+    return {
+        "work": work,
+        "works": works,  # Количество работ в отчете после этой записи
+        "exam": exam,
+        "student": student,
+        "questions": int(questions),
+        "correct": int(correct),
+        "incorrect": int(questions) - int(correct),
+        "score": round(float(score), 2),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "answers": None if answers is None else [int(a) for a in answers],
+        "key": None if key is None else [int(a) for a in key],
+    }
+
+
+def merge_records(works, records):
+    """Добавляет записи к списку работ works, заменяя прежние результаты повторно проверенных учеников.
+
+    Работа с номером N лежит в works[N - 1]. Возвращает список работ и количество замен: замена меняет
+    середину списка, поэтому показанный текст отчета приходится перестраивать.
+    """
+    replaced = 0
+    for record in records:
+        if record.get("replaces"):
+            works[record["replaces"] - 1] = record
+            replaced += 1
+        else:
+            works.append(record)
+    return works, replaced
+
+
+def exam_name(questions, choices, correct_answers):
+    """Название теста по умолчанию: сетка и ключ ответов. Разные тесты одного ученика не заменяют друг друга."""
+    return f"{questions}x{choices}: " + ",".join(str(int(answer) + 1) for answer in correct_answers)
+
+
+def describe_record(record):
+    """Короткое описание добавленной записи для сообщений интерфейса."""
+    text = f"'Работа {record['work']}'"
+    if record.get("student") is not None:
+        text += f" (ученик {record['student']}" + (", прежний результат заменен)" if record.get("replaces") else ")")
+    return text
+
+
+def format_record(record):
+    """Текст одной работы в формате прежнего report.txt."""
+    student = f"Ученик: {record['student']}\n" if record.get("student") is not None else ""
+    return (
+        f"Работа {record['work']}\n"
+        f"{student}"
+        f"Всего вопросов: {record['questions']}\n"
+        f"Правильных ответов: {record['correct']}\n"
+        f"Неправильных ответов: {record['incorrect']}\n"
+        f"Процент выполнения: {record['score']:.2f}%\n\n"
+    )
+
+
+def format_records(records):
+    return "".join(format_record(record) for record in records)
+
+
+def open_report_store(path=REPORT_PATH, text_path=TEXT_REPORT_PATH):
+    """Открывает хранилище; при первом запуске переносит в него работы из report.txt, если он есть."""
+    store = ReportStore(path)
+    if not store.exists():
+        with store._locked():
+            open(store.path, "ab").close()
+            open(store.index_path, "ab").close()
+        if os.path.exists(text_path):
+            store.import_text(text_path)
+    return store
@@ -0,0 +1,156 @@
+"""Проверка и оценка сразу для многих работ: ответы - матрица "работа x вопрос", ключ - вектор.
+
+Каждая операция выполняется для всей матрицы одним вызовом NumPy, поэтому пересчет архива после
+исправления ключа или критериев занимает миллисекунды и на сотнях тысяч работ. Пороги оценок
+разбираются один раз, при создании GradeScale, а не для каждой работы.
+"""
+import bisect
+from dataclasses import dataclass
+
+import numpy as np
+
+# Оценки по убыванию; порогов на один меньше, чем оценок: ниже последнего порога ставится 1
+GRADES = (5, 4, 3, 2)
+# Минимальные проценты для оценок 5, 4, 3 и 2 по умолчанию
+DEFAULT_THRESHOLDS = (90.0, 75.0, 50.0, 0.0)
+# Вопрос без ответа в матрице ответов (работа без сохраненных ответов, импорт из report.txt)
+UNANSWERED = -1
+# Различающая способность, ниже которой вопрос похож на ошибку в ключе, и наименьшее количество ответов
+# на вопрос, с которого это проверяется
+KEY_ERROR_DISCRIMINATION = -0.1
+KEY_ERROR_MIN_ANSWERS = 20
+
+
+class GradeScale:
+    """Критерии оценок: минимальный процент для каждой оценки из GRADES.
+
+    Оценка - первая из 5, 4, 3, 2, порог которой не выше процента, иначе 1. Та же цепочка условий
+    сводится к бинарному поиску по возрастающим границам: граница оценки - наименьший из порогов
+    этой оценки и всех более высоких, поэтому и непоследовательные критерии дают тот же результат.
+    """
+
+    def __init__(self, thresholds=DEFAULT_THRESHOLDS):
+        self.thresholds = tuple(float(threshold) for threshold in thresholds)
+        if len(self.thresholds) != len(GRADES):
+            raise ValueError(f"Критериев должно быть {len(GRADES)}: минимальные проценты для оценок 5, 4, 3 и 2.")
+        self._edges = np.minimum.accumulate(self.thresholds)[::-1].copy()  # Границы оценок 2, 3, 4, 5
+        self._edge_list = self._edges.tolist()
+
+    def grade(self, score):
+        """Оценка одной работы."""
+        return bisect.bisect_right(self._edge_list, score) + 1
+
+    def grades(self, scores):
+        """Оценки всех работ массивом."""
+        return np.searchsorted(self._edges, np.asarray(scores, np.float64), side="right") + 1
+
+    def __eq__(self, other):
+        return isinstance(other, GradeScale) and self.thresholds == other.thresholds
+
+    def __hash__(self):
+        return hash(self.thresholds)
+
+
+def parse_percentage(text):
+    """Минимальный процент из текстового критерия вида "75-89%" или "50%"; нечисловой критерий дает 0."""
+    try:
+        return float(text.split("-")[0].strip().replace("%", ""))
+    except ValueError:
+        return 0
+
+
+def parse_criteria(texts):
+    """Критерии оценок 5, 4, 3 и 2 из текстовых полей."""
+    return GradeScale(parse_percentage(text) for text in texts)
+
+
+@dataclass
+class BatchScores:
+    """Результат проверки матрицы ответов."""
+    correct_matrix: np.ndarray  # (работ, вопросов): True - ответ совпал с ключом
+    correct: np.ndarray  # Правильных ответов в каждой работе
+    scores: np.ndarray  # Процент выполнения каждой работы
+
+
+def score_batch(answers, key):
+    """Проверяет матрицу ответов (варианты с 0, UNANSWERED - нет ответа) по ключу."""
+    answers = np.asarray(answers, np.intp)
+    key = np.asarray(key, np.intp)
+    if answers.ndim != 2 or answers.shape[1] != len(key):
+        raise ValueError(f"Матрица ответов {answers.shape} не соответствует ключу из {len(key)} вопросов.")
+    correct_matrix = answers == key
+    correct = np.count_nonzero(correct_matrix, axis=1)
+    # Та же формула, что и при проверке одного бланка, чтобы проценты совпадали до последнего знака
+    scores = correct / len(key) * 100
+    return BatchScores(correct_matrix, correct, scores)
+
+
+@dataclass
+class ItemStatistics:
+    """Показатели вопросов теста по всем работам."""
+    difficulty: np.ndarray  # Доля правильных ответов на каждый вопрос
+    discrimination: np.ndarray  # Корреляция правильности ответа с баллом за остальные вопросы
+    choice_counts: np.ndarray  # (вопросов, вариантов): сколько раз выбран каждый вариант
+    answered: np.ndarray  # Сколько работ содержат ответ на каждый вопрос
+
+
+def item_statistics(answers, key, choices=None):
+    """Трудность, различающая способность и выбор вариантов для каждого вопроса.
+
+    Отрицательная различающая способность значит, что на вопрос чаще отвечают верно слабые ученики,
+    чем сильные: так обычно выглядит ошибка в ключе. Без choices количество вариантов определяется
+    по наибольшему номеру в ответах и ключе.
+    """
+    answers = np.asarray(answers, np.intp).reshape(-1, len(key))
+    questions = len(key)
+    if choices is None:
+        choices = int(max(answers.max(initial=0), max(key, default=0))) + 1
+    correct_matrix = score_batch(answers, key).correct_matrix.astype(np.float64)
+    if not len(answers):
+        zeros = np.zeros(questions)
+        return ItemStatistics(zeros, zeros.copy(), np.zeros((questions, choices), np.int64), np.zeros(questions, np.int64))
+    difficulty = correct_matrix.mean(axis=0)
+    # Балл за остальные вопросы: вопрос не коррелирует сам с собой
+    rest = correct_matrix.sum(axis=1, keepdims=True) - correct_matrix
+    item = correct_matrix - difficulty
+    rest -= rest.mean(axis=0)
+    covariance = (item * rest).sum(axis=0)
+    spread = np.sqrt((item * item).sum(axis=0) * (rest * rest).sum(axis=0))
+    # Вопрос, на который ответили все или никто, ничего не различает
+    discrimination = np.divide(covariance, spread, out=np.zeros(questions), where=spread > 0)
+    valid = (answers >= 0) & (answers < choices)
+    cells = (np.arange(questions) * choices + answers)[valid]
+    choice_counts = np.bincount(cells, minlength=questions * choices).reshape(questions, choices)
+    return ItemStatistics(difficulty, discrimination, choice_counts, choice_counts.sum(axis=1))
+
+
+def suspicious_items(stats, threshold=KEY_ERROR_DISCRIMINATION, min_answers=KEY_ERROR_MIN_ANSWERS):
+    """Номера вопросов (с 0), различающая способность которых похожа на ошибку в ключе, а не на шум.
+
+    Корреляция случайных ответов n учеников разбросана примерно на 1 / sqrt(n), поэтому вопрос отмечается,
+    только если его различающая способность ниже и threshold, и -3 / sqrt(n) (на случайных ответах
+    это бывает примерно в одном вопросе из тысячи), а ответов на него не меньше min_answers.
+    """
+    answered = stats.answered
+    limit = np.minimum(threshold, -3 / np.sqrt(np.maximum(answered, 1)))
+    return np.flatnonzero((answered >= min_answers) & (stats.discrimination < limit))
+
+
+def answer_matrix(records, questions):
+    """Матрица ответов записей отчета с questions вопросами и сохраненными ответами.
+
+    Возвращает номера подходящих записей в списке records и матрицу их ответов.
+    """
+    rows = [index for index, record in enumerate(records)
+            if record.get("answers") is not None and len(record["answers"]) == questions]
+    matrix = np.array([records[index]["answers"] for index in rows], np.intp).reshape(len(rows), questions)
+    return np.asarray(rows, np.intp), matrix
+
+
+def regrade_records(records, key):
+    """Проверяет записи отчета заново по исправленному ключу.
+
+    Возвращает номера пересчитанных записей (с сохраненными ответами на len(key) вопросов) и их результаты.
+    """
+    rows, matrix = answer_matrix(records, len(key))
+    return rows, score_batch(matrix, key)
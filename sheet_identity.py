@@ -0,0 +1,151 @@
+"""Номер ученика на бланке: QR-код или блок закрашиваемых цифр рядом с таблицей ответов.
+
+Блок номера - отдельная таблица в рамке: по строке на каждую цифру номера и 10 столбцов с цифрами 0..9,
+в каждой строке закрашивается одна клетка. QR-код содержит номер ученика целиком и распознается
+детектором OpenCV без обращения к сети. Номер читается один раз для бланка (при фиксации ответов
+или со стоп-кадра), а не на каждом кадре видео.
+"""
+import cv2
+import numpy as np
+
+import utils
+from grid_geometry import get_geometry
+from video_processing import SheetNotFoundError, find_all_corners, grade_region, grade_sheets, prepare_gray
+
+# Столбцов в блоке номера: цифры 0..9
+ID_CHOICES = 10
+# Размер выровненного блока номера
+ID_IMAGE_SIZE = 400
+# Длинная сторона уменьшенной копии кадра для поиска блока номера. Клетки блока мельче клеток таблицы ответов,
+# и на копии в 320 точек кружки сливаются с рамкой; номер читается один раз на бланк, поэтому копия крупнее
+ID_DETECT_SIZE = 640
+# Минимальный относительный отрыв закрашенной цифры от следующей в каждой строке блока; номер читается
+# с одного кадра, без накопления, поэтому порог ниже, чем у AnswerStabilizer
+ID_MIN_CONFIDENCE = 0.35
+# Допустимое отличие пропорций блока от столбцов / строк (модуль натурального логарифма отношения)
+ID_ASPECT_TOLERANCE = 0.25
+# Номер относится к бланку, если его центр не дальше этой доли диагонали бланка от центра бланка
+ID_MAX_DISTANCE = 1.5
+
+
+def read_qr_codes(img, detector=None):
+    """Распознает все QR-коды на кадре. Возвращает список (центр кода на кадре, текст)."""
+    detector = detector or cv2.QRCodeDetector()
+    try:
+        found, texts, points, _ = detector.detectAndDecodeMulti(img)
+    except cv2.error:
+        return []  # Детектор отказывается работать с вырожденными кадрами
+    if not found:
+        return []
+    return [(corners.reshape(-1, 2).mean(axis=0), text.strip()) for text, corners in zip(texts, points) if text.strip()]
+
+
+def read_id_blocks(img, digits, results=(), image_size=ID_IMAGE_SIZE, detect_size=ID_DETECT_SIZE):
+    """Находит и читает блоки номера из digits строк. Возвращает список (центр блока на кадре, номер).
+
+    Кандидаты - четырехугольники с пропорциями блока (см. is_id_block), которые не пересекаются с уже
+    найденными бланками results. Блок, в котором хотя бы одна строка закрашена неуверенно, пропускается:
+    неверный номер хуже непрочитанного.
+    """
+    imgGray, imgDetect = prepare_gray(img, digits, ID_CHOICES, image_size, detect_size, None, None)
+    try:
+        regions = find_all_corners(imgDetect, digits, ID_CHOICES)
+    except SheetNotFoundError:
+        return []
+    scale = np.float32([img.shape[1] / imgDetect.shape[1], img.shape[0] / imgDetect.shape[0]])
+    sheets = [result.corners[[0, 1, 3, 2]] for result in results]  # Контуры бланков по часовой стрелке
+    blocks = []
+    for corners in regions:
+        if not is_id_block(corners, digits):
+            continue
+        center = corners.mean(axis=0) * scale
+        if any(_inside(sheet, center) or _inside(corners[[0, 1, 3, 2]] * scale, sheet.mean(axis=0))
+               for sheet in sheets):
+            continue  # Сам бланк ответов или лист, на котором он лежит
+        # grade_region уточняет углы по кадру в полном разрешении; доли закрашивания считаются заново ниже
+        result = grade_region(img, imgGray, imgDetect, corners, digits, ID_CHOICES, [0] * digits, image_size)
+        fill = _digit_fill(imgGray, result, digits, image_size)
+        top2 = np.sort(fill, axis=1)[:, -2:]
+        confidence = (top2[:, 1] - top2[:, 0]) / np.maximum(top2[:, 1], 1e-6)
+        if confidence.min() >= ID_MIN_CONFIDENCE:
+            blocks.append((center, "".join(str(int(digit)) for digit in np.argmax(fill, axis=1))))
+    return blocks
+
+
+def _digit_fill(imgGray, result, digits, image_size):
+    """Доли закрашивания клеток блока номера.
+
+    Клетки блока мельче клеток таблицы ответов, поэтому рамка блока заметно добавляет закрашивания крайним
+    клеткам, а неравномерное освещение - пустым кружкам. Порог выбирается по самому блоку (метод Оцу),
+    а полоса рамки стирается перед подсчетом.
+    """
+    geometry = get_geometry(digits, ID_CHOICES, image_size)
+    imgWarp = cv2.warpPerspective(imgGray, result.matrix, result.size)
+    imgThresh = cv2.threshold(imgWarp, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    margin = max(1, int(min(np.diff(geometry.row_edges).min(), np.diff(geometry.col_edges).min()) / 8))
+    imgThresh[:margin] = imgThresh[-margin:] = 0
+    imgThresh[:, :margin] = imgThresh[:, -margin:] = 0
+    counts, areas = utils.fillMatrix(imgThresh, digits, ID_CHOICES, geometry.row_edges, geometry.col_edges)
+    return counts / areas
+
+
+def is_id_block(corners, digits):
+    """Похож ли четырехугольник (углы в порядке reorder) на блок номера из digits строк.
+
+    Клетки блока квадратные, поэтому ширина относится к высоте как 10 к digits. Таблица ответов должна
+    отличаться от блока номера пропорциями, иначе их не различить.
+    """
+    corners = np.float32(corners).reshape(4, 2)
+    width = (np.linalg.norm(corners[1] - corners[0]) + np.linalg.norm(corners[3] - corners[2])) / 2
+    height = (np.linalg.norm(corners[2] - corners[0]) + np.linalg.norm(corners[3] - corners[1])) / 2
+    return abs(np.log(width * digits / max(height * ID_CHOICES, 1e-6))) <= ID_ASPECT_TOLERANCE
+
+
+def id_block_filter(digits):
+    """Условие skip для grade_sheets, отбрасывающее блоки номера из digits строк; None, если блоков нет."""
+    return (lambda corners: is_id_block(corners, digits)) if digits else None
+
+
+def grade_identified_sheets(img, questions, choices, correct_answers, image_size, detect_size=None, buffers=None,
+                            profiler=None, id_digits=0, qr=True):
+    """grade_sheets, в котором блоки номера не проверяются как бланки, а номера учеников записаны в результаты."""
+    results = grade_sheets(img, questions, choices, correct_answers, image_size, detect_size, buffers, profiler,
+                           skip=id_block_filter(id_digits))
+    if id_digits or qr:
+        for result, student in zip(results, identify_sheets(img, results, id_digits, qr)):
+            result.student = student
+    return results
+
+
+def identify_sheets(img, results, id_digits=0, qr=True):
+    """Номера учеников для бланков results: список строк (None - номер не найден) в том же порядке.
+
+    Номера ищутся в QR-кодах (qr=True) и в блоках номера из id_digits цифр (0 - блоков нет). Каждый номер
+    достается ближайшему бланку, и каждому бланку - не больше одного номера, поэтому на кадре с несколькими
+    бланками номера не перепутываются; QR-код имеет приоритет над блоком номера того же бланка.
+    """
+    students = [None] * len(results)
+    if not results:
+        return students
+    marks = read_qr_codes(img) if qr else []
+    qr_count = len(marks)
+    if id_digits:
+        marks += read_id_blocks(img, id_digits, results)
+    centers = np.float32([result.corners.mean(axis=0) for result in results])
+    diagonals = np.float32([np.linalg.norm(result.corners[3] - result.corners[0]) for result in results])
+    # Пары (бланк, номер) по возрастанию расстояния; номера из QR-кодов идут раньше блоков
+    pairs = []
+    for mark, (center, _) in enumerate(marks):
+        distances = np.linalg.norm(centers - np.float32(center), axis=1)
+        for sheet in np.flatnonzero(distances <= diagonals * ID_MAX_DISTANCE):
+            pairs.append((mark >= qr_count, distances[sheet], sheet, mark))
+    used = set()
+    for _, _, sheet, mark in sorted(pairs):
+        if students[sheet] is None and mark not in used:
+            students[sheet] = marks[mark][1]
+            used.add(mark)
+    return students
+
+
+def _inside(contour, point):
+    return cv2.pointPolygonTest(np.float32(contour).reshape(-1, 1, 2), (float(point[0]), float(point[1])), False) >= 0
@@ -0,0 +1,118 @@
+import threading
+
+import cv2
+import numpy as np
+
+from stage_profiler import profile_stage
+from video_processing import find_corners, refine_corners
+
+# Порядок обхода углов по периметру (углы хранятся в порядке utils.reorder: ЛВ, ПВ, ЛН, ПН)
+PERIMETER_ORDER = (0, 1, 3, 2)
+
+
+class SheetTracker:
+    """Отслеживает углы бланка между соседними кадрами видео.
+
+    Пока бланк неподвижен или движется медленно, углы уточняются в маленьких окнах вокруг прежних
+    положений и проверяются по контрасту вдоль сторон, а полный поиск контуров выполняется,
+    только когда отслеживание потеряно. Плановый полный поиск (раз в redetect_interval кадров) заодно
+    проверяет, что отслеживаемые углы не ушли от найденных заново.
+
+    Окно и отступ заданы в пикселях изображения image_size; на уменьшенной копии кадра они уменьшаются
+    вместе с ней (параметр scale). На копии угол уточняется не cornerSubPix, а так же, как после полного
+    поиска (refine_corners): на бланке шириной в несколько десятков пикселей в любое окно попадают линии
+    сетки, и cornerSubPix сдвигает угол на 2-3 пикселя копии, больше, чем исправляет уточнение в полном разрешении.
+    """
+
+    def __init__(self, window=10, samples_per_side=24, offset=4, min_contrast=20, min_support=0.75,
+                 redetect_interval=30):
+        self.window = window  # Полуразмер окна уточнения угла, пиксели
+        self.samples_per_side = samples_per_side  # Количество точек проверки на каждой стороне
+        self.offset = offset  # Расстояние от стороны до точек внутри и снаружи бланка
+        self.min_contrast = min_contrast  # Минимальная разница яркости по разные стороны границы
+        self.min_support = min_support  # Доля точек проверки, на которых граница должна быть видна
+        self.redetect_interval = redetect_interval  # Через сколько кадров обязательно выполнять полный поиск
+        self._lock = threading.Lock()
+        self.tracked_frames = 0
+        self.full_detections = 0
+        self.disagreements = 0  # Сколько раз плановый полный поиск нашел углы дальше окна от отслеживаемых
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.corners = None
+            self.age = 0
+
+    def locate(self, imgGray, buffers=None, profiler=None, close_gaps=False, scale=1.0):
+        """Возвращает углы бланка (4 x 1 x 2, float32) на сером изображении или выбрасывает SheetNotFoundError.
+
+        close_gaps передается полному поиску (find_corners), когда изображение - уменьшенная копия кадра;
+        scale - во сколько раз изображение мельче изображения image_size.
+        """
+        window = max(2, round(self.window * scale))
+        offset = max(1, round(self.offset * scale))
+        with self._lock:
+            if self.corners is not None and self.age < self.redetect_interval:
+                with profile_stage(profiler, "track"):
+                    corners = self._track(imgGray, self.corners, window, offset, scale < 1)
+                if corners is not None:
+                    self.corners = corners
+                    self.age += 1
+                    self.tracked_frames += 1
+                    return corners.copy()
+            # Углы прошлого кадра сравниваются с полным поиском, только если отслеживание не было потеряно
+            tracked = self.corners if self.age >= self.redetect_interval else None
+            self.corners = None
+            corners = np.float32(find_corners(imgGray, buffers, profiler, close_gaps))  # Полный поиск; при неудаче исключение передается дальше
+            self.full_detections += 1
+            if tracked is not None and np.abs(corners - tracked).max() > window:
+                self.disagreements += 1
+            self.corners = corners
+            self.age = 0
+            return corners.copy()
+
+    def _track(self, imgGray, corners, window, offset, fit_sides=False):
+        """Уточняет прежние углы и проверяет, что стороны бланка по-прежнему видны на изображении."""
+        if fit_sides:
+            # Углы - пересечения прямых, проведенных по перепадам яркости поперек сторон
+            refined = refine_corners(imgGray, corners.reshape(4, 2), window).reshape(4, 1, 2)
+            if not np.all(np.isfinite(refined)):
+                return None
+        else:
+            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 0.1)
+            refined = cv2.cornerSubPix(imgGray, corners.copy(), (window, window), (-1, -1), criteria)
+        # Угол не может уйти дальше окна поиска: иначе уточнение сошлось к постороннему объекту
+        if np.abs(refined - corners).max() > window:
+            return None
+        if self._edge_support(imgGray, refined.reshape(4, 2), offset) < self.min_support:
+            return None
+        return refined
+
+    def _edge_support(self, imgGray, corners, offset):
+        """Доля точек на сторонах четырехугольника, где яркость внутри и снаружи заметно различается."""
+        quad = corners[list(PERIMETER_ORDER)]
+        starts = quad
+        ends = np.roll(quad, -1, axis=0)
+        t = (np.arange(self.samples_per_side) + 0.5) / self.samples_per_side
+        points = starts[:, None, :] + (ends - starts)[:, None, :] * t[None, :, None]  # 4 x N x 2
+        direction = ends - starts
+        length = np.linalg.norm(direction, axis=1, keepdims=True)
+        if np.any(length < 2 * offset):
+            return 0.0
+        # Нормаль к стороне, направленная от центра четырехугольника
+        normal = np.stack([direction[:, 1], -direction[:, 0]], axis=1) / length
+        center = quad.mean(axis=0)
+        midpoints = (starts + ends) / 2
+        flip = np.sign(np.sum((midpoints - center) * normal, axis=1, keepdims=True))
+        normal = normal * np.where(flip == 0, 1, flip)
+        outside = points + normal[:, None, :] * offset
+        inside = points - normal[:, None, :] * offset
+        height, width = imgGray.shape[:2]
+
+        def sample(pts):
+            x = np.clip(np.rint(pts[..., 0]).astype(np.intp), 0, width - 1)
+            y = np.clip(np.rint(pts[..., 1]).astype(np.intp), 0, height - 1)
+            return imgGray[y, x].astype(np.int16)
+
+        contrast = np.abs(sample(inside) - sample(outside))
+        return float(np.mean(contrast >= self.min_contrast))
@@ -0,0 +1,107 @@
+import contextlib
+import csv
+import json
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# Перцентили, которые выводятся в сводке, на видео и в файлах замеров
+PERCENTILES = (50, 90, 99)
+# Поля строки сводки в порядке столбцов CSV
+SUMMARY_FIELDS = ("stage", "count", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms")
+
+# Общий пустой контекст: выключенный профилировщик не создает объектов на каждом этапе
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class StageProfiler:
+    """Время этапов обработки кадра за последние window замеров каждого этапа.
+
+    Этапы замеряются конструкцией `with profile_stage(profiler, "canny"):`. Пока профилировщик выключен,
+    profile_stage возвращает общий пустой контекст, и замер сводится к проверке флага. Запись замеров
+    защищена блокировкой: этапы замеряются в потоках захвата, обработки и интерфейса одновременно.
+    """
+
+    def __init__(self, window=300, enabled=False):
+        self.window = window  # Сколько последних замеров каждого этапа учитывается в перцентилях
+        self.enabled = enabled
+        self.overlay = False  # Выводить ли сводку поверх видео
+        self._lock = threading.Lock()
+        self._samples = {}  # Этап -> последние замеры, секунды; порядок этапов - порядок первого замера
+
+    def stage(self, name):
+        """Контекст, замеряющий время этапа name."""
+        return _Stage(self, name) if self.enabled else _NULL_STAGE
+
+    def record(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        """Список строк сводки (словари с полями SUMMARY_FIELDS), времена в миллисекундах."""
+        with self._lock:
+            stages = [(name, np.array(samples)) for name, samples in self._samples.items() if samples]
+        rows = []
+        for name, samples in stages:
+            samples = samples * 1000
+            p50, p90, p99 = np.percentile(samples, PERCENTILES)
+            rows.append({"stage": name, "count": len(samples), "mean_ms": float(samples.mean()),
+                         "p50_ms": float(p50), "p90_ms": float(p90), "p99_ms": float(p99),
+                         "max_ms": float(samples.max())})
+        return rows
+
+    def draw_overlay(self, img):
+        """Выводит сводку (p50 и p99 каждого этапа) в левом верхнем углу изображения и возвращает его."""
+        scale = max(0.4, img.shape[1] / 1400)  # Текст читается и на холсте 700 пикселей, и на полном кадре
+        line = int(22 * scale / 0.5)
+        # Шрифты OpenCV не содержат кириллицы, поэтому подписи на латинице
+        lines = ["stage: p50 / p99 ms"] + [f"{row['stage']}: {row['p50_ms']:.2f} / {row['p99_ms']:.2f}" for row in self.summary()]
+        width = max(cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, 1)[0][0] for text in lines)
+        # Темная подложка, чтобы текст читался и на светлом бланке, и на сетке
+        cv2.rectangle(img, (0, 0), (width + 16, len(lines) * line + line // 2), (40, 40, 40), -1)
+        for i, text in enumerate(lines):
+            cv2.putText(img, text, (8, (i + 1) * line), cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), 1, cv2.LINE_AA)
+        return img
+
+    def dump(self, path):
+        """Сохраняет сводку в CSV или JSON, формат определяется расширением файла."""
+        rows = self.summary()
+        if path.lower().endswith(".json"):
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump({"window": self.window, "stages": rows}, file, ensure_ascii=False, indent=2)
+            return
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def profile_stage(profiler, name):
+    """Контекст замера этапа; без профилировщика или при выключенном профилировщике ничего не делает."""
+    return _NULL_STAGE if profiler is None else profiler.stage(name)
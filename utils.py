@@ -1,5 +1,7 @@
 # utils.py
 
+import heapq
+
 import cv2
 import numpy as np
 
@@ -67,23 +69,58 @@ def rectContour(contours):
     rectCon = sorted(rectCon, key=cv2.contourArea, reverse=True)  # Сортируем контуры по площади
     return rectCon
 
+# Функция для поиска самого большого четырехугольного контура
+def biggestQuadrilateral(contours, minArea=50):
+    # Площадь каждого контура считается один раз, мелкие контуры отбрасываются сразу
+    candidates = []
+    for i, cont in enumerate(contours):
+        area = cv2.contourArea(cont)
+        if area > minArea:
+            candidates.append((-area, i))
+    # Частичная сортировка: контуры извлекаются по убыванию площади, пока не встретится четырехугольник
+    heapq.heapify(candidates)
+    while candidates:
+        _, i = heapq.heappop(candidates)
+        peri = cv2.arcLength(contours[i], True)  # Периметр контура
+        approx = cv2.approxPolyDP(contours[i], 0.02 * peri, True)  # Приближенная форма контура
+        if len(approx) == 4:  # Аппроксимация сразу дает углы, повторно ее вычислять не нужно
+            return approx
+    return None
+
+# Функция для поиска всех четырехугольных контуров (несколько бланков в кадре)
+def allQuadrilaterals(contours, minArea=50):
+    # Возвращает список (площадь, углы) по убыванию площади; углы - аппроксимация контура из 4 точек
+    quads = []
+    for cont in contours:
+        area = cv2.contourArea(cont)
+        if area > minArea:
+            peri = cv2.arcLength(cont, True)  # Периметр контура
+            approx = cv2.approxPolyDP(cont, 0.02 * peri, True)  # Приближенная форма контура
+            if len(approx) == 4 and cv2.isContourConvex(approx):  # Бланк, снятый под углом, остается выпуклым
+                quads.append((area, approx))
+    quads.sort(key=lambda quad: quad[0], reverse=True)
+    return quads
+
 # Функция для получения углов прямоугольного контура
 def getCornerPoints(cont):
     peri = cv2.arcLength(cont, True)  # Периметр контура
     approx = cv2.approxPolyDP(cont, 0.02 * peri, True)  # Приближенная форма контура
     return approx
 
-# Функция для разбиения изображения на сетку
-def splitBoxes(img, questions, choices):
-    if img.shape[0] % questions != 0 or img.shape[1] % choices != 0:
-        raise ValueError("Изображение не может быть равномерно разделено на указанную сетку.")
-    rows = np.vsplit(img, questions)  # Разбиваем изображение по строкам
-    boxes = []
-    for r in rows:
-        cols = np.hsplit(r, choices)  # Разбиваем каждую строку на столбцы
-        for box in cols:
-            boxes.append(box)
-    return boxes
+# Функция для подсчета закрашенных пикселей во всех клетках сетки
+def fillMatrix(img, questions, choices, rowEdges=None, colEdges=None, integral=None):
+    # Границы клеток; размер изображения не обязан делиться на количество вопросов и вариантов
+    if rowEdges is None:
+        rowEdges = np.linspace(0, img.shape[0], questions + 1).astype(np.intp)
+    if colEdges is None:
+        colEdges = np.linspace(0, img.shape[1], choices + 1).astype(np.intp)
+    # Интегральное изображение: сумма любой клетки находится по четырем угловым значениям
+    integral = cv2.integral(img, integral, sdepth=cv2.CV_32S)  # integral можно передать как готовый буфер
+    corners = integral[np.ix_(rowEdges, colEdges)]
+    cellSums = corners[1:, 1:] - corners[:-1, 1:] - corners[1:, :-1] + corners[:-1, :-1]
+    counts = cellSums // 255  # Бинарное изображение содержит только значения 0 и 255
+    areas = np.outer(np.diff(rowEdges), np.diff(colEdges))  # Площадь каждой клетки в пикселях
+    return counts, areas
 
 # Функция для рисования сетки на изображении
 def drawGrid(img, questions=5, choices=5):
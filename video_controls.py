@@ -1,10 +1,14 @@
-import os
-
 from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout, QPushButton, QMessageBox
-from PySide6.QtGui import QIcon, QImage, QPixmap
-from PySide6.QtCore import QTimer, Qt
+from PySide6.QtGui import QIcon
+from PySide6.QtCore import Qt
 import cv2
-from video_processing import process_video_frame
+from video_processing import grade_sheet
+from video_pipeline import VideoPipeline
+from answer_tracking import AnswerStabilizer, grade_stable_frame
+from sheet_tracking import SheetTracker
+from frame_buffers import FrameBufferPool
+from frame_display import FrameDisplay
+from report_store import open_report_store
 
 class VideoControls(QWidget):
     def __init__(self, parent):
@@ -13,35 +17,47 @@ class VideoControls(QWidget):
         self.setObjectName("video_controls")
         self.video_widget = QWidget()
         self.video_widget_layout = QVBoxLayout(self.video_widget)
-        self.video_widget_layout.setAlignment(Qt.AlignCenter)
         self.result_label = QLabel("Результат: N/A")
         self.result_label.setAlignment(Qt.AlignCenter)
         self.video_widget_layout.addWidget(self.result_label)
+        # Метка с частотой кадров и загрузкой процессора
+        self.status_label = QLabel()
+        self.status_label.setAlignment(Qt.AlignCenter)
+        self.video_widget_layout.addWidget(self.status_label)
         self.video_label = QLabel()
-        self.video_widget_layout.addWidget(self.video_label)
+        self.video_label.setAlignment(Qt.AlignCenter)
+        # Метка занимает все свободное место, а кадр один раз уменьшается под ее размер
+        self.video_widget_layout.addWidget(self.video_label, 1)
+        self.video_display = FrameDisplay(self.video_label, fit_to_label=True)  # Вывод BGR-кадров без лишних преобразований
         self.toggle_video_button = QPushButton("Скрыть видео")
         self.toggle_video_button.setIcon(QIcon("icons/video.png"))
         self.toggle_video_button.clicked.connect(self.toggle_video_display)
-        self.video_widget_layout.addWidget(self.toggle_video_button)
+        self.video_widget_layout.addWidget(self.toggle_video_button, alignment=Qt.AlignCenter)
         self.capture_button = QPushButton("Создать стоп-кадр")
         self.capture_button.clicked.connect(self.toggle_pause_video)
-        self.video_widget_layout.addWidget(self.capture_button)
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_video)
-        self.cap = None  # Камера не активна по умолчанию
+        self.video_widget_layout.addWidget(self.capture_button, alignment=Qt.AlignCenter)
+        # Накопление ответов по кадрам видео
+        self.stabilizer = AnswerStabilizer()
+        self.tracker = SheetTracker()  # Отслеживание углов бланка между кадрами
+        self.frame_buffers = FrameBufferPool()  # Буферы промежуточных изображений потока обработки
+        self.report_store = open_report_store()  # Хранилище результатов, общее с экраном проверки
+        # Захват и обработка видео в фоновых потоках; камера не активна по умолчанию
+        # Без бланка в кадре обработка замедляется до частоты ожидания
+        self.pipeline = VideoPipeline(self.process_frame, self, detected=lambda frame_result: frame_result[1] is not None)
+        self.pipeline.result_ready.connect(self.update_video)
+        self.pipeline.capture_failed.connect(self.result_label.setText)
         self.is_paused = False
         self.paused_frame = None
 
     def start_camera(self):
-        self.cap = cv2.VideoCapture(0)
-        self.cap.set(10, 160)
-        self.timer.start(10)
+        self.tracker.reset()
+        self.pipeline.start(0)
+        self.update_pipeline_state()
 
     def stop_camera(self):
-        self.timer.stop()
-        if self.cap is not None:
-            self.cap.release()
-        self.video_label.clear()
+        self.pipeline.stop()
+        self.video_display.clear()
+        self.status_label.clear()
 
     def go_back(self):
         self.stop_camera()
@@ -50,70 +66,69 @@ class VideoControls(QWidget):
     def toggle_pause_video(self):
         """Переключение состояния паузы видеопотока."""
         if self.is_paused:
-            self.timer.start(10)
             self.capture_button.setText("Создать стоп-кадр")
             self.report_button.setEnabled(False)
         else:
-            self.timer.stop()
             self.capture_button.setText("Продолжить видео")
-            success, frame = self.cap.read()
-            if success:
+            frame = self.pipeline.latest_frame()  # Последний кадр, захваченный фоновым потоком
+            if frame is not None:
                 self.paused_frame = frame
                 self.report_button.setEnabled(True)  # Активируем кнопку "Добавить в отчет"
         self.is_paused = not self.is_paused
+        self.update_pipeline_state()
 
     def save_report(self):
-        """Добавляет новый отчет о результатах теста в конец файла report.txt, с последовательной нумерацией."""
+        """Добавляет результат проверки стоп-кадра в отчет с последовательной нумерацией."""
         if self.paused_frame is None:
             QMessageBox.warning(self, "Ошибка", "Стоп-кадр не создан.")
             return
         try:
             # Обрабатываем стоп-кадр и получаем результаты
-            imgFinal, correct_answers, score = process_video_frame(
+            # Для отчета нужен только подсчет результата, без отрисовки
+            result = grade_sheet(
                 self.paused_frame,
                 self.parent.questions,
                 self.parent.choices,
                 self.parent.correct_answers,
-                self.parent.image_size
-            )
-            incorrect_answers = self.parent.questions - correct_answers
-            # Подготавливаем текст для нового отчета
-            new_report_text = (
-                f"Всего вопросов: {self.parent.questions}\n"
-                f"Правильных ответов: {correct_answers}\n"
-                f"Неправильных ответов: {incorrect_answers}\n"
-                f"Процент выполнения: {score:.2f}%\n\n"
+                self.parent.image_size,
+                detect_size=self.parent.detect_size
             )
-            # Определяем номер следующей работы
-            file_path = "report.txt"
-            work_number = 1
-            # Если файл существует, подсчитываем количество "Работа N" и увеличиваем счетчик
-            if os.path.exists(file_path):
-                with open(file_path, "r", encoding="utf-8") as file:
-                    content = file.read()
-                work_number = content.count("Работа") + 1
-            # Добавляем заголовок для новой записи
-            new_report_text = f"Работа {work_number}\n" + new_report_text
-            # Добавляем новый отчет в конец файла
-            with open(file_path, "a", encoding="utf-8") as file:
-                file.write(new_report_text)
-            QMessageBox.information(self, "Отчет",
-                                   f"Отчет успешно добавлен в файл report.txt как 'Работа {work_number}'.")
+            # Номер работы определяется по размеру индекса, файл отчета не перечитывается
+            record = self.report_store.append(self.parent.questions, result.correct, result.score, result.index,
+                                              key=self.parent.correct_answers)
+            QMessageBox.information(self, "Отчет", f"Отчет успешно добавлен как 'Работа {record['work']}'.")
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить отчет: {e}")
 
-    def update_video(self):
+    def process_frame(self, img):
+        """Обрабатывает кадр в фоновом потоке и готовит изображение для показа."""
+        questions = self.parent.questions
+        try:
+            imgFinal, result, committed = grade_stable_frame(
+                img, self.stabilizer, questions, self.parent.choices, self.parent.correct_answers, self.parent.image_size, self.tracker,
+                self.parent.detect_size, self.frame_buffers)
+        except Exception as e:
+            print(f"Ошибка: {e}")
+            imgFinal, result = cv2.resize(img, (self.parent.image_size, self.parent.image_size)), None
+        # Изображение остается в BGR: перевод в RGB не нужен, QImage принимает порядок каналов OpenCV
+        return imgFinal, result, questions, self.stabilizer.locked
+
+    def update_video(self, frame_result):
+        """Показывает результат обработки; вызывается в потоке интерфейса."""
         if not self.video_label.isVisible():
             return
-        success, img = self.cap.read()
-        if success:
-            imgFinal, correct_answers, score = process_video_frame(img, self.parent.questions, self.parent.choices, self.parent.correct_answers, self.parent.image_size)
-            imgRGB = cv2.cvtColor(imgFinal, cv2.COLOR_BGR2RGB)
-            h, w, ch = imgRGB.shape
-            bytes_per_line = ch * w
-            convert_to_Qt_format = QImage(imgRGB.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.video_label.setPixmap(QPixmap.fromImage(convert_to_Qt_format))
-            self.result_label.setText(f"Результат: {correct_answers}/{self.parent.questions}, {score:.2f}%")
+        imgFinal, result, questions, locked = frame_result
+        self.video_display.show(imgFinal)  # Зафиксированный бланк повторно не перерисовывается
+        self.status_label.setText(self.pipeline.status_text())
+        if result is None:
+            self.result_label.setText(f"Результат: 0/{questions}, 0.00%")
+        else:
+            status = " (зафиксирован)" if locked else ""
+            self.result_label.setText(f"Результат: {result.correct}/{questions}, {result.score:.2f}%{status}")
+
+    def update_pipeline_state(self):
+        """Обработка кадров не нужна на паузе и при скрытом видео."""
+        self.pipeline.set_paused(self.is_paused or self.video_label.isHidden())
 
     def toggle_video_display(self):
         if self.video_label.isVisible():
@@ -122,6 +137,7 @@ class VideoControls(QWidget):
         else:
             self.video_label.show()
             self.toggle_video_button.setText("Скрыть видео")
+        self.update_pipeline_state()
 
     def set_styles(self):
         # Здесь добавляем стили через QSS
@@ -0,0 +1,542 @@
+import os
+import threading
+import time
+from collections import deque
+
+from PySide6.QtCore import QObject, QThread, Signal
+
+from frame_buffers import FrameBufferPool
+from frame_recording import DEFAULT_CAPACITY, FrameRecorder, open_capture
+from stage_profiler import profile_stage
+
+
+class LatestFrame:
+    """Хранит только самый свежий кадр: новый кадр вытесняет необработанный старый."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+        self._sequence = 0
+        self._closed = False
+
+    def put(self, frame):
+        with self._condition:
+            self._frame = frame
+            self._sequence += 1
+            self._condition.notify_all()
+
+    def get(self, last_sequence, timeout=None):
+        """Ждет кадр новее last_sequence. Возвращает (номер, кадр) или (last_sequence, None) по таймауту."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence != last_sequence or self._closed, timeout)
+            if self._closed or self._sequence == last_sequence:
+                return last_sequence, None
+            return self._sequence, self._frame
+
+    def peek(self):
+        with self._condition:
+            return self._frame
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class FrameRateGovernor:
+    """Задает темп обработки кадров по реальной частоте камеры и времени обработки.
+
+    Пока бланк виден, обрабатывается каждый кадр камеры, если на это хватает доли процессора budget,
+    иначе реже. Если бланка нет idle_after кадров подряд, интервал постепенно растет до 1 / idle_fps,
+    а при появлении бланка сразу возвращается к рабочему.
+    """
+
+    def __init__(self, idle_fps=4.0, idle_after=5, backoff=1.5, budget=0.8, smoothing=0.2, window=2.0):
+        self.idle_fps = idle_fps  # Частота обработки, когда бланка в кадре нет
+        self.idle_after = idle_after  # Сколько кадров без бланка нужно для перехода в режим ожидания
+        self.backoff = backoff  # Во сколько раз растет интервал на каждом кадре без бланка
+        self.budget = budget  # Какую долю одного ядра процессора может занимать обработка
+        self.smoothing = smoothing  # Вес нового замера в скользящих средних
+        self.window = window  # За сколько последних секунд считается частота обработки
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.capture_interval = None  # Среднее время между кадрами камеры, секунды
+            self.process_time = 0.0  # Среднее время обработки кадра, секунды
+            self.interval = 0.0  # Текущий интервал между обрабатываемыми кадрами, секунды
+            self.misses = 0
+            self.paused = False
+            self._last_grab = None
+            self._last_take = None
+            self._processed = deque()  # Время окончания обработки кадров за последние window секунд
+
+    def frame_grabbed(self, now):
+        """Камера выдала кадр. Возвращает True, если его нужно декодировать и отправить на обработку."""
+        with self._lock:
+            if self._last_grab is not None:
+                self.capture_interval = self._average(self.capture_interval, now - self._last_grab)
+            self._last_grab = now
+            interval = 1 / self.idle_fps if self.paused else self.interval
+            # Небольшой допуск, чтобы дрожание камеры не приводило к пропуску каждого второго кадра
+            if self._last_take is not None and now - self._last_take < interval * 0.9:
+                return False
+            self._last_take = now
+            return True
+
+    def frame_processed(self, elapsed, found):
+        """Кадр обработан за elapsed секунд; found - найден ли на нем бланк."""
+        with self._lock:
+            self.process_time = self._average(self.process_time, elapsed)
+            now = time.perf_counter()
+            self._processed.append(now)
+            while now - self._processed[0] > self.window:
+                self._processed.popleft()
+            active = max(self.capture_interval or 0.0, self.process_time / self.budget)
+            if found:
+                self.misses = 0
+                self.interval = active
+                return
+            self.misses += 1
+            if self.misses >= self.idle_after:
+                self.interval = min(1 / self.idle_fps, max(self.interval, active) * self.backoff)
+            else:
+                self.interval = active
+
+    @property
+    def idle(self):
+        return self.misses >= self.idle_after
+
+    def stats(self):
+        """Частота камеры и обработки (кадр/с), доля занятого процессора и режим ожидания."""
+        with self._lock:
+            now = time.perf_counter()
+            fps = sum(now - t <= self.window for t in self._processed) / self.window
+            camera_fps = 1 / self.capture_interval if self.capture_interval else 0.0
+            process_time = self.process_time
+            idle = self.idle
+        return {"camera_fps": camera_fps, "fps": fps, "load": min(1.0, process_time * fps), "idle": idle}
+
+    def _average(self, value, sample):
+        return sample if not value else value + self.smoothing * (sample - value)
+
+
+class CaptureThread(QThread):
+    """Поток захвата: непрерывно читает камеру и кладет нужные обработке кадры в LatestFrame.
+
+    Источником может быть и файл записи (frame_recording.ReplayCapture); когда запись заканчивается,
+    выдается сигнал replay_finished. Если задан recorder, в него записываются все декодированные кадры.
+    """
+    capture_failed = Signal(str)
+    replay_finished = Signal()
+
+    def __init__(self, source, frames, governor=None, profiler=None, realtime=True, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.frames = frames
+        self.governor = governor
+        self.profiler = profiler
+        self.realtime = realtime  # Воспроизводить запись с исходной частотой кадров
+        self.recorder = None  # frame_recording.FrameRecorder или None
+        self._running = True  # Взводится до start(): stop(), вызванный раньше начала run(), не должен теряться
+
+    def run(self):
+        try:
+            cap = open_capture(self.source, self.realtime)
+        except (OSError, ValueError) as e:
+            self.capture_failed.emit(f"Не удалось открыть запись {self.source}: {e}")
+            return
+        if not cap.isOpened():
+            self.capture_failed.emit(f"Не удалось открыть камеру {self.source}.")
+            return
+        cap.set(10, 160)
+        try:
+            while self._running:
+                # Блокирующее чтение выполняется вне потока интерфейса; grab забирает кадр у камеры без декодирования,
+                # поэтому очередь камеры не копит старые кадры, а декодируются только нужные обработке
+                with profile_stage(self.profiler, "grab"):
+                    grabbed = cap.grab()
+                if not grabbed:
+                    if getattr(cap, "finished", False):
+                        self.replay_finished.emit()  # Запись воспроизведена до конца
+                        break
+                    self.msleep(10)
+                    continue
+                now = time.perf_counter()
+                wanted = self.governor is None or self.governor.frame_grabbed(now)
+                recorder = self.recorder
+                # Для записи декодируется каждый кадр, иначе только нужные обработке
+                if not wanted and recorder is None:
+                    continue
+                with profile_stage(self.profiler, "retrieve"):
+                    success, frame = cap.retrieve()
+                if not success:
+                    continue
+                if recorder is not None:
+                    recorder.write(frame, now)
+                if wanted:
+                    self.frames.put(frame)
+        finally:
+            cap.release()
+
+    def stop(self):
+        self._running = False
+
+
+class ProcessingThread(QThread):
+    """Поток обработки: всегда берет самый свежий кадр, промежуточные кадры пропускаются."""
+    result_ready = Signal()
+
+    def __init__(self, frames, process, governor=None, detected=None, profiler=None, parent=None):
+        super().__init__(parent)
+        self.frames = frames
+        self.process = process
+        self.governor = governor
+        self.detected = detected  # Функция, которая по результату обработки определяет, найден ли бланк
+        self.profiler = profiler
+        self.paused = False
+        self._running = True
+        self._lock = threading.Lock()
+        self._result = None
+        self._delivered = True
+
+    def run(self):
+        sequence = 0
+        while self._running:
+            sequence, frame = self.frames.get(sequence, timeout=0.1)
+            if frame is None or self.paused:
+                continue
+            start = time.perf_counter()
+            try:
+                result = self.process(frame)
+            except Exception as e:
+                print(f"Ошибка обработки кадра: {e}")  # Кадр пропускается, поток продолжает работу
+                continue
+            if self.profiler is not None and self.profiler.enabled:
+                self.profiler.record("process", time.perf_counter() - start)  # Вся обработка кадра
+            if self.governor is not None:
+                found = self.detected(result) if self.detected is not None else True
+                self.governor.frame_processed(time.perf_counter() - start, found)
+            with self._lock:
+                self._result = result
+                notify = self._delivered
+                self._delivered = False
+            # Если интерфейс еще не забрал прошлый результат, новый просто заменит его без роста очереди сигналов
+            if notify:
+                self.result_ready.emit()
+
+    def take_result(self):
+        """Забирает последний готовый результат (вызывается из потока интерфейса)."""
+        with self._lock:
+            result, self._result = self._result, None
+            self._delivered = True
+        return result
+
+    def stop(self):
+        self._running = False
+
+
+class VideoPipeline(QObject):
+    """Захват и обработка видео в отдельных потоках; готовые результаты передаются сигналом result_ready.
+
+    Темп обработки задает FrameRateGovernor; detected(result) сообщает ему, есть ли на кадре бланк.
+    profiler (stage_profiler.StageProfiler) получает время захвата, декодирования и обработки кадров.
+    """
+    result_ready = Signal(object)
+    capture_failed = Signal(str)
+    replay_finished = Signal()
+
+    def __init__(self, process, parent=None, detected=None, profiler=None):
+        super().__init__(parent)
+        self.process = process
+        self.detected = detected
+        self.profiler = profiler
+        self.governor = FrameRateGovernor()
+        self.frames = None
+        self.capture_thread = None
+        self.processing_thread = None
+        self.recorder = None
+
+    def start(self, source=0, realtime=True):
+        """Запускает захват с камеры source или воспроизведение файла записи .frames."""
+        self.stop()
+        self.frames = LatestFrame()
+        self.governor.reset()
+        self.capture_thread = CaptureThread(source, self.frames, self.governor, self.profiler, realtime)
+        self.capture_thread.recorder = self.recorder
+        self.capture_thread.capture_failed.connect(self.capture_failed)
+        self.capture_thread.replay_finished.connect(self.replay_finished)
+        self.processing_thread = ProcessingThread(self.frames, self.process, self.governor, self.detected, self.profiler)
+        self.processing_thread.result_ready.connect(self._deliver_result)
+        self.capture_thread.start()
+        self.processing_thread.start()
+
+    def start_recording(self, path, capacity=DEFAULT_CAPACITY):
+        """Начинает запись кадров в кольцевой файл path (последние capacity кадров)."""
+        self.stop_recording()
+        self.recorder = FrameRecorder(path, capacity)
+        if self.capture_thread is not None:
+            self.capture_thread.recorder = self.recorder
+
+    def stop_recording(self):
+        """Останавливает запись и возвращает количество записанных кадров."""
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return 0
+        if self.capture_thread is not None:
+            self.capture_thread.recorder = None
+        recorder.close()  # Кадр, который поток захвата пишет прямо сейчас, дописывается до закрытия
+        return recorder.written
+
+    def stop(self):
+        if self.capture_thread is None:
+            return
+        self.capture_thread.stop()
+        self.processing_thread.stop()
+        self.frames.close()
+        self.capture_thread.wait()
+        self.processing_thread.wait()
+        self.capture_thread = None
+        self.processing_thread = None
+
+    def is_running(self):
+        return self.capture_thread is not None
+
+    def set_paused(self, paused):
+        """Приостанавливает обработку; захват продолжается в режиме ожидания, чтобы стоп-кадр был свежим."""
+        self.governor.paused = paused
+        if self.processing_thread is not None:
+            self.processing_thread.paused = paused
+
+    def status_text(self):
+        """Строка состояния для интерфейса: частота камеры и обработки, загрузка процессора."""
+        stats = self.governor.stats()
+        text = (f"Камера: {stats['camera_fps']:.0f} кадр/с, обработка: {stats['fps']:.1f} кадр/с, "
+                f"загрузка процессора: {stats['load']:.0%}")
+        return text + " (ожидание бланка)" if stats["idle"] else text
+
+    def latest_frame(self):
+        """Возвращает копию последнего захваченного кадра или None."""
+        frame = self.frames.peek() if self.frames is not None else None
+        return None if frame is None else frame.copy()
+
+    def _deliver_result(self):
+        if self.processing_thread is None:
+            return
+        result = self.processing_thread.take_result()
+        if result is not None:
+            self.result_ready.emit(result)
+
+
+class SharedFrames:
+    """Последние кадры нескольких источников и очередь их обработки общим набором потоков.
+
+    У каждого источника хранится только самый свежий кадр, как в LatestFrame. Свободный поток обработки
+    получает кадр того источника, который дольше всех ждал обслуживания, а кадры одного источника
+    никогда не обрабатываются одновременно: камера с высокой частотой не может занять все потоки, а
+    трекер и накопление ответов источника работают с кадрами по порядку.
+    """
+
+    def __init__(self, count):
+        self._condition = threading.Condition()
+        self._frames = [None] * count
+        self._sequence = [0] * count  # Номер последнего кадра источника
+        self._taken = [0] * count  # Номер последнего кадра, взятого в обработку
+        self._busy = [False] * count  # Кадр источника сейчас обрабатывается
+        self._served = [0] * count  # Когда источник обслуживался последний раз (номер выдачи)
+        self._turn = 0
+        self.dropped = [0] * count  # Сколько кадров заменено новыми, не дождавшись обработки
+        self._closed = False
+
+    def __len__(self):
+        return len(self._frames)
+
+    def source(self, index):
+        """Очередь одного источника для CaptureThread (put/peek, как у LatestFrame)."""
+        return _SourceFrames(self, index)
+
+    def put(self, index, frame):
+        with self._condition:
+            if self._sequence[index] != self._taken[index]:
+                self.dropped[index] += 1
+            self._frames[index] = frame
+            self._sequence[index] += 1
+            self._condition.notify_all()
+
+    def take(self, timeout=None):
+        """Ждет кадр любого свободного источника. Возвращает (номер источника, кадр) или (None, None) по таймауту."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._closed or self._ready(), timeout)
+            ready = [] if self._closed else self._ready()
+            if not ready:
+                return None, None
+            index = min(ready, key=self._served.__getitem__)
+            self._busy[index] = True
+            self._taken[index] = self._sequence[index]
+            self._turn += 1
+            self._served[index] = self._turn
+            return index, self._frames[index]
+
+    def done(self, index):
+        """Обработка кадра источника закончена, его следующий кадр можно выдавать."""
+        with self._condition:
+            self._busy[index] = False
+            self._condition.notify_all()
+
+    def peek(self, index):
+        with self._condition:
+            return self._frames[index]
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _ready(self):
+        return [i for i in range(len(self._frames)) if not self._busy[i] and self._sequence[i] != self._taken[i]]
+
+
+class _SourceFrames:
+    # Кадры одного источника в SharedFrames
+    def __init__(self, shared, index):
+        self.shared = shared
+        self.index = index
+
+    def put(self, frame):
+        self.shared.put(self.index, frame)
+
+    def peek(self):
+        return self.shared.peek(self.index)
+
+
+class GradingWorker(QThread):
+    """Поток обработки из общего набора: берет кадры всех источников из SharedFrames."""
+
+    def __init__(self, frames, pipeline, parent=None):
+        super().__init__(parent)
+        self.frames = frames
+        self.pipeline = pipeline
+        self._running = True
+
+    def run(self):
+        pools = {}  # Свой пул буферов для каждого источника: камеры могут отличаться разрешением
+        while self._running:
+            index, frame = self.frames.take(timeout=0.1)
+            if frame is None:
+                continue
+            buffers = pools.get(index)
+            if buffers is None:
+                buffers = pools[index] = FrameBufferPool()
+            start = time.perf_counter()
+            try:
+                result = self.pipeline.process(index, frame, buffers)
+            except Exception as e:
+                # Поток общий для всех источников: ошибка на одном кадре не должна останавливать проверку
+                print(f"Ошибка обработки кадра источника {index}: {e}")
+                continue
+            finally:
+                self.frames.done(index)
+            self.pipeline.frame_processed(index, result, time.perf_counter() - start)
+
+    def stop(self):
+        self._running = False
+
+
+class MultiSourcePipeline(QObject):
+    """Несколько источников кадров (камеры или записи) с общим набором потоков обработки.
+
+    У каждого источника свой поток захвата и свой FrameRateGovernor, кадры обрабатывают workers общих
+    потоков в очередности SharedFrames. process(index, frame, buffers) вызывается в потоке обработки;
+    готовые результаты передаются сигналом result_ready(номер источника, результат).
+    """
+    result_ready = Signal(int, object)
+    capture_failed = Signal(int, str)
+    _processed = Signal(int)
+
+    def __init__(self, process, parent=None, detected=None, workers=None):
+        super().__init__(parent)
+        self.process = process
+        self.detected = detected
+        self.workers = workers
+        self.sources = []
+        self.frames = None
+        self.governors = []
+        self.capture_threads = []
+        self.worker_threads = []
+        self._lock = threading.Lock()
+        self._results = []
+        self._delivered = []
+        self._counts = []  # Сколько кадров каждого источника обработано
+        self._processed.connect(self._deliver_result)
+
+    def start(self, sources, realtime=True):
+        """Запускает захват со всех источников (номера камер или файлы записи .frames)."""
+        self.stop()
+        self.sources = list(sources)
+        count = len(self.sources)
+        self.frames = SharedFrames(count)
+        self.governors = [FrameRateGovernor() for _ in range(count)]
+        self._results = [None] * count
+        self._delivered = [True] * count
+        self._counts = [0] * count
+        for index, source in enumerate(self.sources):
+            thread = CaptureThread(source, self.frames.source(index), self.governors[index], realtime=realtime)
+            thread.capture_failed.connect(lambda message, index=index: self.capture_failed.emit(index, message))
+            self.capture_threads.append(thread)
+        # Один поток оставлен захвату и интерфейсу; больше потоков, чем источников, не нужно:
+        # кадры одного источника обрабатываются по очереди
+        workers = self.workers or max(1, min(count, (os.cpu_count() or 2) - 1))
+        self.worker_threads = [GradingWorker(self.frames, self) for _ in range(workers)]
+        for thread in self.capture_threads + self.worker_threads:
+            thread.start()
+
+    def stop(self):
+        if self.frames is None:
+            return
+        for thread in self.capture_threads + self.worker_threads:
+            thread.stop()
+        self.frames.close()
+        for thread in self.capture_threads + self.worker_threads:
+            thread.wait()
+        self.capture_threads, self.worker_threads = [], []
+        self.frames = None
+
+    def is_running(self):
+        return self.frames is not None
+
+    def frame_processed(self, index, result, elapsed):
+        """Вызывается потоком обработки: сообщает темп источнику и передает результат интерфейсу."""
+        found = self.detected(result) if self.detected is not None else True
+        self.governors[index].frame_processed(elapsed, found)
+        with self._lock:
+            self._results[index] = result
+            self._counts[index] += 1
+            notify = self._delivered[index]
+            self._delivered[index] = False
+        # Как и в ProcessingThread, непрочитанный результат заменяется без роста очереди сигналов
+        if notify:
+            self._processed.emit(index)
+
+    def stats(self, index):
+        """Показатели источника: частота камеры и обработки, загрузка, обработанные и пропущенные кадры."""
+        stats = self.governors[index].stats()
+        with self._lock:
+            stats["processed"] = self._counts[index]
+        stats["dropped"] = self.frames.dropped[index] if self.frames is not None else 0
+        return stats
+
+    def status_text(self, index):
+        stats = self.stats(index)
+        text = (f"Камера: {stats['camera_fps']:.0f} кадр/с, обработка: {stats['fps']:.1f} кадр/с, "
+                f"обработано {stats['processed']}, пропущено {stats['dropped']}")
+        return text + " (ожидание бланка)" if stats["idle"] else text
+
+    def _deliver_result(self, index):
+        if self.frames is None:
+            return
+        with self._lock:
+            result, self._results[index] = self._results[index], None
+            self._delivered[index] = True
+        if result is not None:
+            self.result_ready.emit(index, result)
@@ -1,62 +1,404 @@
+from dataclasses import dataclass
+
 import cv2  # Импортируем библиотеку OpenCV для работы с изображениями и видео
 import numpy as np  # Импортируем библиотеку NumPy для работы с массивами
 import utils  # Импортируем вспомогательные функции из модуля utils
+from grid_geometry import get_geometry, GRID_COLOR, CORRECT_COLOR, WRONG_COLOR  # Геометрия сетки, общая для всех кадров с одинаковыми настройками
+from frame_buffers import pool_buffer  # Переиспользуемые буферы для промежуточных изображений
+from stage_profiler import profile_stage  # Замер времени этапов (без профилировщика ничего не делает)
+
+
+# Минимальная площадь бланка относительно площади кадра
+MIN_SHEET_AREA = 0.02
+# Несколько бланков в кадре: внутренний край рамки, площадь которого больше этой доли внешнего, отбрасывается
+DUPLICATE_SHARE = 0.8
+# Наименьшая доля листа, которую занимает отдельный блок ответов
+MIN_BLOCK_SHARE = 0.05
+# Наибольшее количество бланков, проверяемых на одном кадре
+MAX_SHEETS = 12
+# Стороны бланка как пары индексов углов (углы в порядке reorder: ЛВ, ПВ, ЛН, ПН)
+SHEET_SIDES = ((0, 1), (1, 3), (3, 2), (2, 0))
+
+
+class SheetNotFoundError(Exception):
+    """Бланк не найден на изображении."""
+
+
+@dataclass
+class GradingResult:
+    """Результат проверки бланка без каких-либо отрисовок."""
+    index: np.ndarray  # Выбранный вариант для каждого вопроса
+    pixel_values: np.ndarray  # Количество закрашенных пикселей в каждой клетке (вопросы x варианты)
+    fill_ratios: np.ndarray  # Доля закрашенных пикселей в каждой клетке
+    grading: np.ndarray  # 1 - ответ правильный, 0 - неправильный
+    correct: int  # Количество правильных ответов
+    score: float  # Процент правильных ответов
+    matrix: np.ndarray  # Матрица перспективы из координат исходного кадра в выровненный бланк
+    corners: np.ndarray  # Углы бланка на исходном кадре (4 x 2)
+    size: tuple  # Размер выровненного бланка (ширина, высота)
+    student: str = None  # Номер ученика с бланка (sheet_identity), None - не прочитан
+
+
+def find_corners(imgGray, buffers=None, profiler=None, close_gaps=False):
+    """Находит углы самого большого прямоугольника на сером изображении (в порядке reorder).
+
+    close_gaps закрывает разрывы контуров расширением карты границ: на уменьшенной копии кадра тонкая рамка
+    бланка рвется, и без этого бланк часто не находится.
+    """
+    # Применяем гауссово размытие для улучшения обнаружения контуров
+    with profile_stage(profiler, "blur"):
+        imgBlur = cv2.GaussianBlur(imgGray, (5, 5), 1, dst=pool_buffer(buffers, "blur", imgGray.shape))
+    # Применяем детектор Канни для нахождения контуров
+    with profile_stage(profiler, "canny"):
+        imgCanny = cv2.Canny(imgBlur, 10, 70, edges=pool_buffer(buffers, "canny", imgGray.shape))
+        if close_gaps:
+            imgCanny = cv2.dilate(imgCanny, None, dst=pool_buffer(buffers, "canny_closed", imgGray.shape))
+    # CHAIN_APPROX_SIMPLE хранит только концы прямых участков, поэтому контуры содержат в разы меньше точек
+    with profile_stage(profiler, "contours"):
+        contours, hierarchy = cv2.findContours(imgCanny, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    minArea = imgGray.shape[0] * imgGray.shape[1] * MIN_SHEET_AREA  # Слишком маленькие контуры бланком быть не могут
+    with profile_stage(profiler, "quad"):
+        biggestPoints = utils.biggestQuadrilateral(contours, minArea)  # Углы самого большого четырехугольника
+    if biggestPoints is None:  # Если не удалось найти прямоугольники
+        raise SheetNotFoundError("Не удалось найти достаточное количество контуров.")
+    return utils.reorder(biggestPoints)  # Переносим углы в правильном порядке
+
+
+def find_all_corners(imgGray, questions, choices, buffers=None, profiler=None, max_sheets=MAX_SHEETS):
+    """Находит углы всех бланков на сером изображении; возвращает список массивов 4 x 2 в порядке чтения.
+
+    Ищутся все выпуклые четырехугольники не меньше MIN_SHEET_AREA кадра. Внешний и внутренний край толстой
+    рамки дают два почти одинаковых контура, из них остается внешний. Лист, внутри которого от 2 крупных
+    четырехугольников (не меньше MIN_BLOCK_SHARE листа), но меньше, чем половина клеток сетки, считается листом
+    с несколькими блоками ответов и заменяется этими блоками; клетки сетки бланка так не выглядят: их столько же,
+    сколько вариантов во всех вопросах, и каждая намного меньше бланка.
+    """
+    with profile_stage(profiler, "blur"):
+        imgBlur = cv2.GaussianBlur(imgGray, (5, 5), 1, dst=pool_buffer(buffers, "blur", imgGray.shape))
+    with profile_stage(profiler, "canny"):
+        imgCanny = cv2.Canny(imgBlur, 10, 70, edges=pool_buffer(buffers, "canny", imgGray.shape))
+        # Несколько бланков на кадре мельче одного, и их тонкие рамки на уменьшенной копии рвутся: закрываем разрывы
+        imgCanny = cv2.dilate(imgCanny, None, dst=pool_buffer(buffers, "canny_closed", imgGray.shape))
+    # Нужны и вложенные контуры: блоки ответов лежат внутри контура листа
+    with profile_stage(profiler, "contours"):
+        contours, hierarchy = cv2.findContours(imgCanny, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    minArea = imgGray.shape[0] * imgGray.shape[1] * MIN_SHEET_AREA
+    with profile_stage(profiler, "quad"):
+        regions = []  # [площадь, углы, вложенные регионы]
+        for area, approx in utils.allQuadrilaterals(contours, minArea):
+            center = approx.reshape(4, 2).mean(axis=0)
+            parent = _innermost_region(regions, center)
+            if parent is not None and area > parent[0] * DUPLICATE_SHARE:
+                continue  # Второй край той же рамки
+            region = [area, approx, []]
+            (parent[2] if parent is not None else regions).append(region)
+        sheets = []
+        for area, approx, children in regions:
+            blocks = [child for child in children if child[0] >= area * MIN_BLOCK_SHARE]
+            if 2 <= len(blocks) < questions * choices / 2:
+                sheets.extend(block[1] for block in blocks)
+            else:
+                sheets.append(approx)
+    if not sheets:
+        raise SheetNotFoundError("Не удалось найти достаточное количество контуров.")
+    return _reading_order([np.float32(utils.reorder(points)).reshape(4, 2) for points in sheets])[:max_sheets]
+
+
+def _innermost_region(regions, point):
+    # Самый глубоко вложенный регион, внутри которого лежит точка (регионы упорядочены по убыванию площади)
+    for region in regions:
+        if cv2.pointPolygonTest(region[1], (float(point[0]), float(point[1])), False) >= 0:
+            return _innermost_region(region[2], point) or region
+    return None
+
+
+def _reading_order(corners):
+    """Сортирует бланки по строкам сверху вниз, в строке - слева направо."""
+    corners = sorted(corners, key=lambda points: points[:, 1].mean())
+    rows = []
+    for points in corners:
+        center = points.mean(axis=0)
+        height = np.linalg.norm(points[2] - points[0])
+        # Бланк продолжает строку, если его центр выше середины первого бланка строки по высоте
+        if rows and center[1] - rows[-1][0].mean(axis=0)[1] < height / 2:
+            rows[-1].append(points)
+        else:
+            rows.append([points])
+    return [points for row in rows for points in sorted(row, key=lambda points: points[:, 0].mean())]
+
+
+def _sheet_corners(imgGray, tracker, buffers=None, profiler=None, image_size=None):
+    # С трекером углы уточняются по предыдущему кадру, без трекера выполняется полный поиск.
+    # Этап locate включает и полный поиск, поэтому его время не равно сумме blur, canny, contours и quad.
+    # image_size передается, когда imgGray - уменьшенная копия кадра: на ней закрываются разрывы контуров,
+    # а окна трекера уменьшаются во столько же раз, во сколько копия мельче изображения image_size
+    close_gaps = image_size is not None
+    with profile_stage(profiler, "locate"):
+        if tracker is not None:
+            scale = min(imgGray.shape[:2]) / image_size if close_gaps else 1.0
+            return tracker.locate(imgGray, buffers, profiler, close_gaps, min(scale, 1.0))
+        return find_corners(imgGray, buffers, profiler, close_gaps)
+
+
+def refine_corners(imgGray, corners, radius, samples=32):
+    """Уточняет грубые углы бланка по исходному изображению.
+
+    Вдоль каждой стороны берутся профили яркости поперек нее, на каждом находится самый резкий перепад,
+    через найденные точки устойчиво проводится прямая, а углы получаются пересечением соседних прямых.
+    """
+    t = np.linspace(0.1, 0.9, samples, dtype=np.float32)  # Концы сторон пропускаем: рядом с углами перепад неоднозначен
+    offsets = np.arange(-radius, radius + 1, dtype=np.float32)
+    lines = []
+    for a, b in SHEET_SIDES:
+        direction = corners[b] - corners[a]
+        normal = np.float32([-direction[1], direction[0]]) / max(np.linalg.norm(direction), 1e-6)
+        points = corners[a] + t[:, None] * direction
+        mapX = points[:, 0:1] + offsets[None, :] * normal[0]
+        mapY = points[:, 1:2] + offsets[None, :] * normal[1]
+        profiles = cv2.remap(imgGray, mapX, mapY, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE).astype(np.float32)
+        edge = np.argmax(np.abs(np.diff(profiles, axis=1)), axis=1) + 0.5 - radius  # Положение перепада на профиле
+        edgePoints = points + edge[:, None] * normal
+        lines.append(cv2.fitLine(edgePoints, cv2.DIST_HUBER, 0, 0.01, 0.01).ravel())
+    top, right, bottom, left = lines
+    refined = np.float32([_intersect(top, left), _intersect(top, right), _intersect(bottom, left), _intersect(bottom, right)])
+    # Если уточнение ушло дальше окна поиска, оставляем грубые углы
+    return refined if np.abs(refined - corners).max() <= 2 * radius else corners
+
+
+def _intersect(line1, line2):
+    vx1, vy1, x1, y1 = line1
+    vx2, vy2, x2, y2 = line2
+    det = vx1 * vy2 - vy1 * vx2
+    if abs(det) < 1e-6:
+        return np.float32([np.nan, np.nan])
+    k = ((x2 - x1) * vy2 - (y2 - y1) * vx2) / det
+    return np.float32([x1 + k * vx1, y1 + k * vy1])
+
+
+def detection_size(img, detect_size):
+    """Размер уменьшенной копии кадра для поиска бланка: длинная сторона равна detect_size, пропорции сохраняются."""
+    height, width = img.shape[:2]
+    scale = detect_size / max(height, width)
+    return max(1, round(width * scale)), max(1, round(height * scale))
 
-def process_video_frame(img, questions, choices, correct_answers, image_size):
-    # Изменяем размеры изображения так, чтобы оно подходило под заданное количество вопросов и вариантов
-    new_width = choices * (image_size // choices)
-    new_height = questions * (image_size // questions)
-    img = cv2.resize(img, (new_width, new_height))  # Изменяем размер изображения
-    imgFinal = img.copy()  # Копируем исходное изображение для дальнейшей обработки
-    imgBlank = np.zeros((new_height, new_width, 3), np.uint8)  # Создаем пустое изображение для рисования
-    imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)  # Преобразуем изображение в оттенки серого
-    imgBlur = cv2.GaussianBlur(imgGray, (5, 5), 1)  # Применяем гауссово размытие для улучшения обнаружения контуров
-    imgCanny = cv2.Canny(imgBlur, 10, 70)  # Применяем детектор Канни для нахождения контуров
 
+def locate_sheet(img, image_size, tracker=None, detect_size=None, buffers=None, profiler=None):
+    """Только находит бланк на кадре и возвращает его углы в координатах кадра, без проверки ответов."""
+    with profile_stage(profiler, "prepare"):
+        imgGray = _locate_gray(img, image_size, detect_size, buffers)
+    corners = np.float32(_sheet_corners(imgGray, tracker, buffers, profiler, image_size if detect_size else None)).reshape(4, 2)
+    return corners * np.float32([img.shape[1] / imgGray.shape[1], img.shape[0] / imgGray.shape[0]])
+
+
+def _locate_gray(img, image_size, detect_size, buffers):
+    if detect_size:
+        size = detection_size(img, detect_size)
+        imgResized = cv2.resize(img, size, dst=pool_buffer(buffers, "locate", (size[1], size[0], 3)),
+                                interpolation=cv2.INTER_AREA)
+    else:
+        imgResized = cv2.resize(img, (image_size, image_size), dst=pool_buffer(buffers, "locate", (image_size, image_size, 3)))
+    return cv2.cvtColor(imgResized, cv2.COLOR_BGR2GRAY, dst=pool_buffer(buffers, "locate_gray", imgResized.shape[:2]))
+
+
+def grade_sheet(img, questions, choices, correct_answers, image_size, tracker=None, detect_size=None, buffers=None,
+                profiler=None):
+    """Находит бланк и подсчитывает результат. Ничего не рисует; при ошибке выбрасывает SheetNotFoundError.
+
+    tracker (sheet_tracking.SheetTracker) позволяет не искать бланк заново на каждом кадре видео.
+    detect_size включает многомасштабный режим: бланк ищется на уменьшенной копии кадра (длинная сторона detect_size),
+    а выравнивание берет пиксели прямо из исходного кадра, поэтому мелкие клетки не теряют четкость.
+    buffers (frame_buffers.FrameBufferPool) задает буферы для промежуточных изображений, чтобы в видеопотоке
+    они не создавались заново на каждом кадре. profiler (stage_profiler.StageProfiler) замеряет время этапов.
+    """
+    imgGray, imgDetect = prepare_gray(img, questions, choices, image_size, detect_size, buffers, profiler)
     try:
-        imgContours = img.copy()  # Копируем изображение для рисования контуров
-        contours, hierarchy = cv2.findContours(imgCanny, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)  # Находим контуры на изображении
-        cv2.drawContours(imgContours, contours, -1, (0, 255, 0), 10)  # Рисуем контуры на изображении
-        rectCon = utils.rectContour(contours)  # Фильтруем контуры, оставляя только прямоугольники
-        if len(rectCon) < 1:  # Если не удалось найти прямоугольники, выбрасываем исключение
-            raise Exception("Не удалось найти достаточное количество контуров.")
-
-        biggestPoints = utils.getCornerPoints(rectCon[0])  # Находим углы самого большого прямоугольника
-
-        if biggestPoints.size != 0:  # Если углы найдены
-            biggestPoints = utils.reorder(biggestPoints)  # Переносим углы в правильном порядке
-            cv2.drawContours(imgContours, biggestPoints, -1, (0, 255, 0), 20)  # Рисуем углы на изображении
-            pts1 = np.float32(biggestPoints)  # Преобразуем углы в формат float32 для преобразования перспективы
-            pts2 = np.float32([[0, 0], [new_width, 0], [0, new_height], [new_width, new_height]])  # Целевые точки для преобразования
-            matrix = cv2.getPerspectiveTransform(pts1, pts2)  # Получаем матрицу преобразования перспективы
-            imgWarpColored = cv2.warpPerspective(img, matrix, (new_width, new_height))  # Применяем преобразование перспективы
-
-            imgWarpGray = cv2.cvtColor(imgWarpColored, cv2.COLOR_BGR2GRAY)  # Преобразуем изображение в черно-белое
-            imgThresh = cv2.threshold(imgWarpGray, 170, 255, cv2.THRESH_BINARY_INV)[1]  # Применяем пороговое преобразование для выделения области
-
-            boxes = utils.splitBoxes(imgThresh, questions, choices)  # Разбиваем изображение на отдельные клетки
-            myPixelVal = np.zeros((questions, choices))  # Создаем массив для хранения количества белых пикселей в каждой клетке
-            for i, image in enumerate(boxes):
-                totalPixels = cv2.countNonZero(image)  # Подсчитываем количество белых пикселей в клетке
-                myPixelVal[i // choices][i % choices] = totalPixels  # Заполняем массив пикселей
-
-            myIndex = [np.argmax(row) for row in myPixelVal]  # Находим индекс клетки с максимальным количеством пикселей (выбранный вариант)
-
-            # Оценка правильности ответов
-            grading = [1 if correct_answers[i] == myIndex[i] else 0 for i in range(questions)]
-            score = (sum(grading) / questions) * 100  # Рассчитываем процент правильных ответов
-
-            # Отображаем результаты на изображении
-            utils.showAnswers(imgWarpColored, myIndex, grading, correct_answers, questions, choices)
-            utils.drawGrid(imgWarpColored, questions, choices)  # Рисуем сетку на изображении
-            imgRawDrawings = np.zeros_like(imgWarpColored)  # Создаем пустое изображение для рисования контуров
-            cv2.drawContours(imgRawDrawings, contours, -1, (0, 255, 0), 20)  # Рисуем контуры на изображении
-
-            return imgWarpColored, sum(grading), score  # Возвращаем итоговое изображение, количество правильных ответов и процент
+        biggestPoints = _sheet_corners(imgDetect, tracker, buffers, profiler,
+                                       image_size if imgDetect is not imgGray else None)
+    except SheetNotFoundError:
+        if imgDetect is imgGray:
+            raise
+        # На уменьшенной копии бланк не найден: ищем в полном разрешении. Трекер после неудачи уже сброшен,
+        # а углы в координатах полного кадра ему не передаются, чтобы не смешивать масштабы
+        with profile_stage(profiler, "locate_full"):
+            biggestPoints = find_corners(imgGray, buffers, profiler)
+        imgDetect = imgGray
+    return grade_region(img, imgGray, imgDetect, biggestPoints, questions, choices, correct_answers, image_size,
+                        buffers, profiler)
+
+
+def grade_at_corners(img, corners, questions, choices, correct_answers, image_size, buffers=None, profiler=None):
+    """Подсчитывает ответы бланка с уже известными углами corners (в координатах кадра), без поиска бланка."""
+    with profile_stage(profiler, "prepare"):
+        imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=pool_buffer(buffers, "frame_gray", img.shape[:2]))
+    return grade_region(img, imgGray, imgGray, corners, questions, choices, correct_answers, image_size, buffers,
+                        profiler)
 
+
+def grade_sheets(img, questions, choices, correct_answers, image_size, detect_size=None, buffers=None, profiler=None,
+                 max_sheets=MAX_SHEETS, skip=None):
+    """Проверяет все бланки (или блоки ответов одного листа) на изображении.
+
+    Возвращает список GradingResult в порядке чтения: по строкам сверху вниз, в строке слева направо, поэтому
+    у неподвижно лежащих бланков номера не меняются от кадра к кадру. Если ни одного бланка нет,
+    выбрасывает SheetNotFoundError. Параметры те же, что у grade_sheet; трекер не используется.
+    skip(corners) отбрасывает найденные регионы, которые не являются бланками ответов (например, блоки номера
+    ученика); углы передаются в координатах изображения для поиска.
+    """
+    imgGray, imgDetect = prepare_gray(img, questions, choices, image_size, detect_size, buffers, profiler)
+    with profile_stage(profiler, "locate"):
+        regions = find_all_corners(imgDetect, questions, choices, buffers, profiler, max_sheets)
+        if skip is not None:
+            regions = [corners for corners in regions if not skip(corners)]
+    if not regions:
+        raise SheetNotFoundError("На изображении нет бланков ответов.")
+    pyramid = [imgGray]  # Уровни пирамиды общие для всех бланков кадра
+    return [grade_region(img, imgGray, imgDetect, corners, questions, choices, correct_answers, image_size, buffers,
+                         profiler, pyramid)
+            for corners in regions]
+
+
+def prepare_gray(img, questions, choices, image_size, detect_size, buffers, profiler):
+    """Серое изображение, из которого берутся пиксели бланка, и изображение для поиска бланка."""
+    geometry = get_geometry(questions, choices, image_size)
+    new_width, new_height = geometry.size
+    if buffers is not None:
+        buffers.bind((img.shape, questions, choices, image_size, detect_size))
+    with profile_stage(profiler, "prepare"):
+        if detect_size:
+            # Серый кадр в исходном разрешении
+            imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=pool_buffer(buffers, "gray", img.shape[:2]))
+            size = detection_size(img, detect_size)
+            # Маленькая копия для поиска
+            imgDetect = cv2.resize(imgGray, size, dst=pool_buffer(buffers, "detect", (size[1], size[0])),
+                                   interpolation=cv2.INTER_AREA)
         else:
-            raise Exception("Не удалось найти правильные контуры.")  # Если не удалось найти правильные контуры
+            # Изменяем размер изображения
+            imgResized = cv2.resize(img, (new_width, new_height), dst=pool_buffer(buffers, "resized", (new_height, new_width, 3)))
+            # Преобразуем изображение в оттенки серого
+            imgGray = cv2.cvtColor(imgResized, cv2.COLOR_BGR2GRAY, dst=pool_buffer(buffers, "gray", (new_height, new_width)))
+            imgDetect = imgGray
+    return imgGray, imgDetect
+
+
+def grade_region(img, imgGray, imgDetect, biggestPoints, questions, choices, correct_answers, image_size, buffers=None,
+                 profiler=None, pyramid=None):
+    """Выравнивает бланк с углами biggestPoints (на изображении для поиска) и подсчитывает ответы."""
+    geometry = get_geometry(questions, choices, image_size)  # Целевые углы и границы клеток берутся из кэша
+    new_width, new_height = geometry.size
+    if pyramid is None:
+        pyramid = [imgGray]
+    # Переносим углы с изображения для поиска на изображение, из которого берутся пиксели
+    detectScale = np.float32([imgGray.shape[1] / imgDetect.shape[1], imgGray.shape[0] / imgDetect.shape[0]])
+    pts1 = np.float32(biggestPoints).reshape(4, 2) * detectScale  # Углы в формате float32 для преобразования перспективы
+    if imgDetect is not imgGray:
+        # Углы с маленькой копии неточны на величину ее пикселя: уточняем их по кадру в исходном разрешении
+        with profile_stage(profiler, "refine"):
+            pts1 = refine_corners(imgGray, pts1, radius=int(np.ceil(detectScale.max())) * 2)
+    # Уровень пирамиды, на котором бланк не меньше холста: при сильном уменьшении выравнивание дало бы наложение частот.
+    # Изображение, уменьшенное до image_size, уровней не требует; кадр в исходном разрешении - часто
+    sheetSize = max(np.linalg.norm(pts1[1] - pts1[0]), np.linalg.norm(pts1[2] - pts1[0]))
+    level = 0
+    with profile_stage(profiler, "pyramid"):
+        while sheetSize >= 2 * image_size:
+            level += 1
+            if level == len(pyramid):
+                previous = pyramid[-1]
+                size = ((previous.shape[1] + 1) // 2, (previous.shape[0] + 1) // 2)
+                pyramid.append(cv2.pyrDown(previous, dst=pool_buffer(buffers, f"pyramid{level}", (size[1], size[0])),
+                                           dstsize=size))
+            pts1 /= 2
+            sheetSize /= 2
+    imgGray = pyramid[level]
+    with profile_stage(profiler, "warp"):
+        matrix = cv2.getPerspectiveTransform(pts1, geometry.target)  # Получаем матрицу преобразования перспективы
+        # Выравниваем сразу серое изображение: цветной вариант нужен только для предпросмотра
+        imgWarpGray = cv2.warpPerspective(imgGray, matrix, (new_width, new_height),
+                                          dst=pool_buffer(buffers, "warp", (new_height, new_width)))
+    # Применяем пороговое преобразование для выделения области
+    with profile_stage(profiler, "threshold"):
+        imgThresh = cv2.threshold(imgWarpGray, 170, 255, cv2.THRESH_BINARY_INV,
+                                  dst=pool_buffer(buffers, "thresh", (new_height, new_width)))[1]
 
+    # Матрица закрашенных пикселей (вопросы x варианты) и выбранные варианты считаются без циклов по клеткам
+    with profile_stage(profiler, "fill"):
+        myPixelVal = utils.fillMatrix(imgThresh, questions, choices, geometry.row_edges, geometry.col_edges,
+                                      pool_buffer(buffers, "integral", (new_height + 1, new_width + 1), np.int32))[0]
+        myIndex = np.argmax(myPixelVal, axis=1)  # Индекс клетки с максимальным количеством пикселей (выбранный вариант)
+
+    # Оценка правильности ответов
+    grading = (answer_key(correct_answers, questions) == myIndex).astype(np.uint8)
+    correct = int(grading.sum())
+    score = (correct / questions) * 100  # Рассчитываем процент правильных ответов
+
+    # Переводим матрицу и углы в координаты исходного кадра, чтобы отрисовка не зависела от промежуточного размера
+    scaleX = imgGray.shape[1] / img.shape[1]
+    scaleY = imgGray.shape[0] / img.shape[0]
+    scale = np.array([[scaleX, 0, 0], [0, scaleY, 0], [0, 0, 1]])
+    corners = pts1.reshape(4, 2) / np.float32([scaleX, scaleY])
+    return GradingResult(myIndex, myPixelVal, myPixelVal / geometry.cell_areas, grading, correct, score,
+                         matrix @ scale, corners, (new_width, new_height))
+
+
+def answer_key(correct_answers, questions):
+    """Ключ ответов для первых questions вопросов в виде массива.
+
+    Количество вопросов можно изменить в настройках, не меняя ключ, поэтому лишние ответы ключа отбрасываются;
+    если ответов меньше, чем вопросов, выбрасывается ValueError.
+    """
+    key = np.asarray(correct_answers)[:questions]
+    if len(key) < questions:
+        raise ValueError(f"Ключ содержит {len(key)} ответов, а вопросов {questions}.")
+    return key
+
+
+def render_overlay(img, result, correct_answers, profiler=None):
+    """Строит изображение выровненного бланка с отмеченными ответами и сеткой (только для предпросмотра)."""
+    questions, choices = result.pixel_values.shape
+    geometry = get_geometry(questions, choices, result.size[0])
+    with profile_stage(profiler, "overlay"):
+        imgWarpColored = cv2.warpPerspective(img, result.matrix, result.size)  # Выравниваем исходный цветной кадр
+        geometry.draw_answers(imgWarpColored, result.index, result.grading, correct_answers)  # Центры и круги уже посчитаны
+        geometry.blend_grid(imgWarpColored)  # Накладываем заранее подготовленную сетку
+    return imgWarpColored
+
+
+def render_sheets_overlay(img, results, correct_answers, profiler=None):
+    """Рисует на копии кадра контуры всех бланков, их номера с результатом и отметки ответов.
+
+    Выровненные изображения нескольких бланков в одно окно не помещаются, поэтому отметки переносятся
+    с сетки бланка обратно на кадр через обратную матрицу перспективы.
+    """
+    with profile_stage(profiler, "overlay"):
+        imgOverlay = img.copy()
+        for number, result in enumerate(results, 1):
+            questions, choices = result.pixel_values.shape
+            geometry = get_geometry(questions, choices, result.size[0])
+            corners = result.corners[[0, 1, 3, 2]].astype(np.int32)  # Обход контура по часовой стрелке
+            cv2.polylines(imgOverlay, [corners], True, GRID_COLOR, 2, cv2.LINE_AA)
+            # Выбранные ответы в координатах кадра
+            rows = np.arange(questions)
+            points = np.float32(np.stack([geometry.centers_x[result.index], geometry.centers_y[rows]], axis=1))
+            points = cv2.perspectiveTransform(points[None], np.linalg.inv(result.matrix))[0]
+            radius = max(2, int(np.sqrt(cv2.contourArea(corners) / (questions * choices)) * 0.3))
+            for point, right in zip(points, result.grading):
+                cv2.circle(imgOverlay, (int(point[0]), int(point[1])), radius, CORRECT_COLOR if right else WRONG_COLOR,
+                           cv2.FILLED, cv2.LINE_AA)
+            label = f"{number}: {result.correct}/{questions}"
+            x, y = corners.min(axis=0)
+            cv2.putText(imgOverlay, label, (int(x), max(20, int(y) - 8)), cv2.FONT_HERSHEY_SIMPLEX, 0.7, GRID_COLOR, 2,
+                        cv2.LINE_AA)
+    return imgOverlay
+
+
+def process_video_frame(img, questions, choices, correct_answers, image_size, strict=False):
+    """Проверяет бланк на кадре. При strict=True ошибки не перехватываются, а передаются вызывающему коду."""
+    try:
+        result = grade_sheet(img, questions, choices, correct_answers, image_size)
+        imgWarpColored = render_overlay(img, result, correct_answers)  # Отображаем результаты на изображении
+        return imgWarpColored, result.correct, result.score  # Возвращаем итоговое изображение, количество правильных ответов и процент
     except Exception as e:  # В случае ошибки
+        if strict:  # В пакетном режиме ошибка записывается в результат конкретного файла
+            raise
         print(f"Ошибка: {e}")  # Выводим сообщение об ошибке
-        return img, 0, 0  # Возвращаем исходное изображение и нулевые значения для правильных ответов и процента
+        # Возвращаем исходное изображение и нулевые значения для правильных ответов и процента
+        return cv2.resize(img, (image_size, image_size)), 0, 0